@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, scoped_session, Session as SQLSession
 from sqlalchemy.engine.base import Engine  # added only for type hinting
 from sqlalchemy.sql.schema import Column  # added only for type hinting
 from stream_live_chat_gui.database_model import Base
+from stream_live_chat_gui.dedup_cache import question_text_hash
 from dataclasses import dataclass
 from contextlib import contextmanager
 from dotenv import load_dotenv
@@ -36,6 +37,70 @@ PRIVATE_TESTING = os.getenv("PRIVATE_TESTING")
 LIVE_VIDEO_ID = os.getenv("LIVE_VIDEO_ID")
 QUESTIONS_LIMIT = os.getenv("QUESTIONS_LIMIT")
 QUESTIONS_LIMIT = int(QUESTIONS_LIMIT) if QUESTIONS_LIMIT else 4
+# Bounds (in seconds) applied to the `pollingIntervalMillis` hint returned by the youtube live chat api
+YOUTUBE_POLL_FLOOR_SECONDS = float(os.getenv("YOUTUBE_POLL_FLOOR_SECONDS") or 1.0)
+YOUTUBE_POLL_CEILING_SECONDS = float(os.getenv("YOUTUBE_POLL_CEILING_SECONDS") or 10.0)
+# While questions are open, never wait more than this between polls
+YOUTUBE_POLL_OPEN_QUESTIONS_CEILING_SECONDS = float(
+    os.getenv("YOUTUBE_POLL_OPEN_QUESTIONS_CEILING_SECONDS") or 3.0
+)
+# "yes" makes the live chat polling use the lean http transport (pooled connections, field masks, fast json)
+YOUTUBE_LEAN_TRANSPORT = (os.getenv("YOUTUBE_LEAN_TRANSPORT") or "no").lower() == "yes"
+# Youtube api record/replay: "record" or "replay" (empty to disable), the cassette file lives in resources
+YOUTUBE_CASSETTE_MODE = (os.getenv("YOUTUBE_CASSETTE_MODE") or "").lower()
+YOUTUBE_CASSETTE_FILE = os.getenv("YOUTUBE_CASSETTE_FILE")
+# Replay speed multiplier, i.e. 360 replays a 3 hours stream in 30 seconds
+YOUTUBE_REPLAY_SPEED = float(os.getenv("YOUTUBE_REPLAY_SPEED") or 1.0)
+# Points the youtube client to a stand-in server (i.e. `fake_youtube_api`) instead of googleapis.com/youtube.com,
+# no authentication is done when it's set
+YOUTUBE_API_ROOT_URL = os.getenv("YOUTUBE_API_ROOT_URL")
+# Live video ids of other live chats polled along the main one (co-streams), comma separated
+YOUTUBE_EXTRA_LIVE_VIDEO_IDS = [
+    video_id.strip()
+    for video_id in (os.getenv("YOUTUBE_EXTRA_LIVE_VIDEO_IDS") or "").split(",")
+    if video_id.strip()
+]
+# A stream restarted (Stop/Start) within these minutes resumes the live chat polling where it stopped, 0 disables it
+LIVE_CHAT_RESUME_MAX_AGE_MINUTES = float(
+    os.getenv("LIVE_CHAT_RESUME_MAX_AGE_MINUTES") or 30
+)
+# Max number of message ids and question hashes (each) remembered by the ingestion to drop duplicates early
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE") or 10000)
+# Youtube data api daily quota (units), part of it kept aside for restarts/lookups, and the expected stream length,
+# the live chat polling slows down if needed to make the quota last the whole stream
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA") or 10000)
+YOUTUBE_QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE") or 200)
+SCHEDULED_STREAM_HOURS = float(os.getenv("SCHEDULED_STREAM_HOURS") or 3)
+# Failed live chat polls are retried with jittered exponential backoff (base, max wait in seconds), the poller only
+# stops if it keeps failing for longer than the budget (seconds)
+YOUTUBE_RETRY_BASE_SECONDS = float(os.getenv("YOUTUBE_RETRY_BASE_SECONDS") or 0.5)
+YOUTUBE_RETRY_MAX_SECONDS = float(os.getenv("YOUTUBE_RETRY_MAX_SECONDS") or 30)
+YOUTUBE_RETRY_BUDGET_SECONDS = float(os.getenv("YOUTUBE_RETRY_BUDGET_SECONDS") or 300)
+# Armed mode: the live chat is looked up in the background right after launch (every YOUTUBE_ARMED_POLL_SECONDS
+# until the broadcast is live), so the ingestion begins as soon as Start Stream is clicked
+YOUTUBE_ARMED_MODE = (os.getenv("YOUTUBE_ARMED_MODE") or "no").lower() == "yes"
+YOUTUBE_ARMED_POLL_SECONDS = float(os.getenv("YOUTUBE_ARMED_POLL_SECONDS") or 30)
+# Days a youtube api discovery document stays cached on disk (resources directory)
+DISCOVERY_CACHE_TTL_DAYS = float(os.getenv("DISCOVERY_CACHE_TTL_DAYS") or 7)
+# Twitch irc chat read along the youtube one ("yes"), SERVER/PORT can point to a local stand-in server
+TWITCH_CHAT_ENABLED = (os.getenv("TWITCH_CHAT_ENABLED") or "no").lower() == "yes"
+TWITCH_SERVER = os.getenv("SERVER") or "irc.chat.twitch.tv"
+TWITCH_PORT = int(os.getenv("PORT") or 6667)
+TWITCH_NICKNAME = os.getenv("NICKNAME")
+TWITCH_TOKEN = os.getenv("TOKEN")
+TWITCH_CHANNEL = os.getenv("CHANNEL")
+TWITCH_MSGBUFFSIZE = int(os.getenv("MSGBUFFSIZE") or 4096)
+# Every database write goes through one writer thread (see `ingestion_bus`): max writes queued, max questions
+# waiting to be stored (past it regular questions are dropped, super chats never) and max writes per commit
+INGESTION_BUS_MAX_QUEUED_WRITES = int(os.getenv("INGESTION_BUS_MAX_QUEUED_WRITES") or 1000)
+INGESTION_BUS_MAX_QUEUED_QUESTIONS = int(
+    os.getenv("INGESTION_BUS_MAX_QUEUED_QUESTIONS") or 20000
+)
+INGESTION_BUS_MAX_GROUP_WRITES = int(os.getenv("INGESTION_BUS_MAX_GROUP_WRITES") or 500)
+# A connection waits up to this long (milliseconds) for a lock held by another one instead of failing right away
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS") or 5000)
+# The chat ingestion (pollers and their database writer) runs in its own process ("yes"), see `ingestion_process`
+INGESTION_PROCESS = (os.getenv("INGESTION_PROCESS") or "no").lower() == "yes"
 # Checking that PRIVATE_TESTING envvar is set correctly
 if not PRIVATE_TESTING or not any(
     PRIVATE_TESTING.lower() == valid_option for valid_option in ["yes", "no"]
@@ -132,6 +197,24 @@ class QuestionTuple(NamedTuple):
     question: str
 
 
+class LiveChatStateTuple(NamedTuple):
+    chat_key: str
+    live_chat_id: str
+    page_token: Optional[str]
+    start_time: datetime
+    actual_start_time: Optional[datetime]
+    last_message_id: Optional[str]
+    updated_ts: datetime
+
+
+class NewQuestion(NamedTuple):
+    """A question captured from a live chat, not yet stored in the database"""
+
+    user_name: str
+    question: str
+    is_super_chat: bool = False
+
+
 @dataclass
 class AlchemizedModelColumn:
     column: Column
@@ -227,11 +310,53 @@ def get_engine(db_filename: str = DATABASE_NAME) -> Engine:
     log.debug(f"DB Filepath: {sqlite_filepath}")
 
     engine = create_engine(f"sqlite:///{sqlite_filepath}", echo=False)
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
     # Check if the Database file already exists
     if not os.path.exists(sqlite_filepath):
-        # Create the database and tables
         log.debug("Creating database and tables")
-        Base.metadata.create_all(bind=engine)
+    # Only the missing tables get created, session files made by older versions get the new ones
+    Base.metadata.create_all(bind=engine)
+    migrate_database(engine)
 
     return engine
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL: the GUI reads (tables, counters) don't wait for the writer and the writer doesn't wait for them.
+    busy_timeout: a connection waits for the lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Safe with WAL, a commit no longer waits for an fsync (only a checkpoint does)
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def migrate_database(engine: Engine) -> None:
+    """Adds the columns missing in session files created by older versions (create_all only adds tables)"""
+    question_columns = {
+        column["name"] for column in inspect(engine).get_columns("question")
+    }
+    if "question_hash" in question_columns:
+        return
+
+    log.debug("Adding the question_hash column (and index) to the question table")
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE question ADD COLUMN question_hash TEXT"))
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_question_question_hash ON question (question_hash)"
+            )
+        )
+        questions = connection.execute(text("SELECT id, question FROM question")).fetchall()
+        if questions:
+            connection.execute(
+                text("UPDATE question SET question_hash = :question_hash WHERE id = :id"),
+                [
+                    {"id": question_id, "question_hash": question_text_hash(question)}
+                    for question_id, question in questions
+                ],
+            )
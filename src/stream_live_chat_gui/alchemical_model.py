@@ -2,6 +2,8 @@ from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import QAbstractTableModel, QVariant, QModelIndex, Qt
 from stream_live_chat_gui import AlchemizedModelColumn
 from sqlalchemy.orm import joinedload
+from datetime import datetime
+from typing import Any
 import logging
 
 log = logging.getLogger(__name__)
@@ -12,10 +14,12 @@ log.setLevel(logging.DEBUG)
 class AlchemicalTableModel(QAbstractTableModel):
     """A Qt Table Model that binds to an SQL Alchemy Query"""
 
-    def __init__(self, session, model, relationship, columns):
+    def __init__(self, session, model, relationship, columns, ingestion_bus):
         super().__init__()
         # TODO: session and model might not be needed if just an instance of 'DBInteractions' is passed
         self.session = session()
+        # Edited cells are stored by the database writer, the GUI thread never waits for the database lock
+        self.ingestion_bus = ingestion_bus
         self.relationship = relationship
         self.query = self.session.query(model)
         log.debug(f"Passed columns: {columns}")
@@ -120,19 +124,27 @@ class AlchemicalTableModel(QAbstractTableModel):
 
         return value
 
+    @staticmethod
+    def to_column_value(column: AlchemizedModelColumn, text: str) -> Any:
+        """The text typed in the cell as the column type, raises ValueError if it can't be"""
+        python_type = column.column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(text)
+        return python_type(text)
+
     def setData(self, index, value, role=None) -> bool:
         row = self.results[index.row()]
-        name = self.fields[index.column()].column_name
+        field = self.fields[index.column()]
 
         try:
-            setattr(row, name, value.toString())
-            self.session.commit()
+            column_value = self.to_column_value(field, str(value))
         except Exception as e:
             QMessageBox.critical(None, "SQL Input Error", str(e))
             return False
-        else:
-            self.dataChanged.emit(index, index)
-            return True
+        # The table is refreshed once it's committed (see `AppController.refresh_after_db_writes`)
+        self.ingestion_bus.update_question(row.id, {field.column_name: column_value})
+        self.dataChanged.emit(index, index)
+        return True
 
     def setSorting(self, column, order=Qt.DescendingOrder):
         """Sort table by given column number."""
@@ -0,0 +1,161 @@
+"""
+Classification of the errors raised by the youtube api calls, and the retry policy of the live chat poller.
+
+The poller keeps its authenticated service and page token across errors: transient errors are retried with jittered
+exponential backoff, quota errors with the longest backoff, an expired authorization gets the credentials refreshed
+first. A failure only surfaces (the poller stops) once the retry budget is spent, or straight away if the live chat
+ended or the error is not recoverable.
+"""
+from stream_live_chat_gui import (
+    YOUTUBE_RETRY_BASE_SECONDS,
+    YOUTUBE_RETRY_MAX_SECONDS,
+    YOUTUBE_RETRY_BUDGET_SECONDS,
+)
+from enum import Enum
+from google.auth.exceptions import RefreshError, TransportError
+from googleapiclient.errors import HttpError
+from typing import Callable, Optional
+import http.client
+import json
+import logging
+import random
+import requests
+import socket
+import ssl
+import time
+
+log = logging.getLogger(__name__)
+
+# https://developers.google.com/youtube/v3/live/docs/liveChatMessages/list#errors
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+TRANSIENT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+CHAT_ENDED_REASONS = {"liveChatEnded", "liveChatNotFound", "liveChatDisabled"}
+AUTH_REASONS = {"authError", "unauthorized", "invalidCredentials"}
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Network level errors, the request may not even have reached the api
+TRANSIENT_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    TransportError,
+    http.client.HTTPException,
+    socket.timeout,
+    ssl.SSLError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class ApiErrorKind(Enum):
+    TRANSIENT = "transient"
+    QUOTA = "quota"
+    CHAT_ENDED = "chat_ended"
+    AUTH_EXPIRED = "auth_expired"
+    FATAL = "fatal"
+
+
+class RetryBudgetExhausted(Exception):
+    pass
+
+
+def _error_reasons(content: Optional[bytes]) -> set[str]:
+    """`reason` values out of a google api json error body"""
+    try:
+        error = json.loads(content)["error"]
+        return {detail["reason"] for detail in error.get("errors", [])}
+    except (TypeError, ValueError, KeyError):
+        return set()
+
+
+def _status_and_reasons(error: Exception) -> tuple[Optional[int], set[str]]:
+    if isinstance(error, HttpError):
+        return error.resp.status, _error_reasons(error.content)
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code, _error_reasons(error.response.content)
+    return None, set()
+
+
+def classify_api_error(error: Exception) -> ApiErrorKind:
+    if isinstance(error, RefreshError):
+        # The refresh token itself is no longer valid, a new authorization (browser) is needed
+        return ApiErrorKind.FATAL
+    if isinstance(error, TRANSIENT_EXCEPTIONS):
+        return ApiErrorKind.TRANSIENT
+
+    status, reasons = _status_and_reasons(error)
+    if status is None:
+        return ApiErrorKind.FATAL
+    if reasons & CHAT_ENDED_REASONS:
+        return ApiErrorKind.CHAT_ENDED
+    if reasons & QUOTA_REASONS:
+        return ApiErrorKind.QUOTA
+    if status == 401 or reasons & AUTH_REASONS:
+        return ApiErrorKind.AUTH_EXPIRED
+    if status in TRANSIENT_STATUS_CODES or reasons & TRANSIENT_REASONS:
+        return ApiErrorKind.TRANSIENT
+    return ApiErrorKind.FATAL
+
+
+class ApiRetryPolicy:
+    """
+    Full jitter exponential backoff: the n-th consecutive error waits a random time between 0 and
+    min(max_delay, base * 2^n). The budget is the time allowed since the first error of a streak.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = YOUTUBE_RETRY_BASE_SECONDS,
+        max_delay: float = YOUTUBE_RETRY_MAX_SECONDS,
+        budget_seconds: float = YOUTUBE_RETRY_BUDGET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[float, float], float] = random.uniform,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.clock = clock
+        self.rng = rng
+        self.consecutive_errors = 0
+        self.first_error_at: Optional[float] = None
+        self.last_error_kind: Optional[ApiErrorKind] = None
+
+    def next_delay(self, error: Exception) -> float:
+        """Seconds to wait before retrying after `error`, raises if it shouldn't be retried"""
+        kind = classify_api_error(error)
+        self.last_error_kind = kind
+        if kind in (ApiErrorKind.FATAL, ApiErrorKind.CHAT_ENDED):
+            raise error
+
+        now = self.clock()
+        if self.first_error_at is None:
+            self.first_error_at = now
+        elapsed = now - self.first_error_at
+        if elapsed > self.budget_seconds:
+            raise RetryBudgetExhausted(
+                f"Still failing after {elapsed:.0f}s and {self.consecutive_errors} retries "
+                f"(budget: {self.budget_seconds}s), last error: {error!r}"
+            ) from error
+
+        if kind is ApiErrorKind.QUOTA:
+            # It won't get any better in a few seconds
+            delay = self.max_delay
+        else:
+            delay = self.rng(
+                0, min(self.max_delay, self.base_delay * 2**self.consecutive_errors)
+            )
+        self.consecutive_errors += 1
+        log.warning(
+            f"Api error ({kind.value}), retry #{self.consecutive_errors} in {delay:.2f}s: {error!r}"
+        )
+        return delay
+
+    def recovered(self) -> Optional[float]:
+        """Call after a successful call, returns the seconds it took to recover if there were errors"""
+        if self.first_error_at is None:
+            return None
+        time_to_recovery = self.clock() - self.first_error_at
+        log.info(
+            f"Recovered after {self.consecutive_errors} retries in {time_to_recovery:.2f}s"
+        )
+        self.consecutive_errors = 0
+        self.first_error_at = None
+        return time_to_recovery
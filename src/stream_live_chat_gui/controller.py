@@ -1,28 +1,74 @@
-# from stream_live_chat_gui.twitch_chat import TwitchStreamThreadControl
-from stream_live_chat_gui.youtube_chat import (
-    YoutubeStreamThreadControl,
-    YoutubeLiveChat,
-    UnableToGetVideoId,
-    UnableToGetLiveChatId,
+from stream_live_chat_gui.db_interactions import DBInteractions, DBWrite, DBWriteKind
+from stream_live_chat_gui.ingestion_bus import get_ingestion_bus
+from stream_live_chat_gui.ingestion_process import (
+    IngestionMessage,
+    IngestionProcessControl,
+    IngestionSnapshot,
+    take_ingestion_snapshot,
 )
-from stream_live_chat_gui.db_interactions import DBInteractions
 from stream_live_chat_gui import (
     QuestionTuple,
     YOUTUBER_NAME,
     DATABASE_NAME,
-    YOUTUBE_CHANNEL_ID,
+    YOUTUBE_ARMED_MODE,
+    YOUTUBE_CASSETTE_MODE,
+    TWITCH_CHAT_ENABLED,
+    INGESTION_PROCESS,
+)
+from stream_live_chat_gui.record_files import FileRecording, LiveChatRecordWriter
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QItemSelectionModel,
+    QModelIndex,
+    QObject,
+    QTime,
+    QTimer,
+    Qt,
 )
-from stream_live_chat_gui.record_files import FileRecording
-from PyQt5.QtCore import QItemSelectionModel, QModelIndex, QTime, Qt
 from PyQt5.QtWidgets import QTableView
 from queue import Queue
-from datetime import datetime
+from threading import Thread
 from enum import Enum
+from typing import Any, Callable, Optional
+import importlib
 import logging
+import time
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 DEFAULT_CURRENT_QUESTION_TIMER = QTime(00, 00, 00)
+# The in memory pending questions counters are checked against the database every this many table refreshes (~30s)
+PENDING_COUNTERS_RECONCILE_REFRESHES = 12
+# Pulls googleapiclient, google_auth_oauthlib, google.auth and requests, it's imported lazily (see `preload_module`)
+YOUTUBE_CHAT_MODULE = "stream_live_chat_gui.youtube_chat"
+# Delay so the preload doesn't compete (GIL) with the first paint of the window
+YOUTUBE_CHAT_MODULE_PRELOAD_DELAY_MS = 1000
+# How often the messages of the ingestion process (chat feed, new questions) are read, process mode only
+INGESTION_MESSAGES_POLL_MS = 50
+
+
+def preload_module(module_name: str) -> Thread:
+    """
+    Imports a module in a background thread so it doesn't delay the window showing up. Any later import of the same
+    module waits (python's import lock) for this one to finish instead of importing it twice.
+    """
+
+    def _import():
+        try:
+            importlib.import_module(module_name)
+            log.debug(f"Module: {module_name} preloaded")
+        except Exception:
+            log.exception(f"Unable to preload module: {module_name}")
+
+    preload_thread = Thread(target=_import, name=f"Preload-{module_name}", daemon=True)
+    preload_thread.start()
+    return preload_thread
+
+
+class DBWriteNotifier(QObject):
+    """Hands the writes committed by the database writer (its own thread) over to the GUI thread"""
+
+    committed = pyqtSignal(object)
 
 
 class AutoReplyStatus(Enum):
@@ -38,16 +84,39 @@ class TableType(Enum):
 
 
 class AppController:
-    def __init__(self, model, view, db_filename: str = DATABASE_NAME):
+    def __init__(
+        self,
+        model,
+        view,
+        db_filename: str = DATABASE_NAME,
+        ingestion_process_mode: bool = INGESTION_PROCESS,
+    ):
         self.model = model
         self.view = view
         self.db_filename = db_filename
+        # The chat sources run in their own process (`ingestion_process`) instead of threads of this one
+        self.ingestion_process_mode = ingestion_process_mode
+        self.ingestion_process: Optional[IngestionProcessControl] = None
+        # Set by the ingestion process notifications, the pending table is only refreshed when there's something new
+        self.questions_stored_since_refresh: bool = False
+        # Reads only, every write is queued to the database writer, the GUI never waits for it
         self.db = DBInteractions(db_filename=self.db_filename)
+        self.ingestion_bus = get_ingestion_bus(self.db_filename)
+        self.db_write_notifier = DBWriteNotifier()
+        self.ingestion_bus.add_control_commit_callback(
+            self.db_write_notifier.committed.emit
+        )
+        # Reads that depend on the GUI writes still waiting to be committed (i.e. the next question to reply)
+        self.actions_after_gui_writes: list[Callable[[], None]] = []
+        self.ingestion_bus.add_questions_deleted_callback(
+            self._forward_deleted_questions
+        )
         self.answer_average = None
         self.auto_reply_value: int = 0
         self.current_timer_per_question_id = dict()
         # This avoids a message box being shown multiple times once we know the live chat api thread has failed once
         self.error_message_box_already_shown: bool = False
+        self.refreshes_since_counters_reconcile: int = 0
         # Show camera reset dialog every 25 min
         self.view.camera_reset_timer.start(1500000)
         # Start with no question limit per session
@@ -55,8 +124,11 @@ class AppController:
         self.session_questions_pool_limit = 0
         self.session_questions_absolute_limit = 0
 
-        # Open/Close question control (inter-thread communication)
+        # Open/Close question control (inter-thread communication), one queue per source
         self.open_close_question_control_queue = Queue(maxsize=1)
+        self.twitch_questions_control_queue = Queue(maxsize=1)
+        self.youtube_chat_streamer_thread = None
+        self.twitch_chat_streamer_thread = None
 
         # Setting these ones for the banner display file
         self.answer_average_for_display: str = None
@@ -69,6 +141,9 @@ class AppController:
         self.view.youtube_open_questions.setEnabled(False)
         self.view.add_manual_question_button.setEnabled(False)
         self.record_file: FileRecording = None
+        # Armed mode, the live chat looked up in the background (`LiveChatArmer`) until Start Stream is clicked
+        self.live_chat_armer = None
+        self.live_chat_arming_over: bool = False
         self.reset_pending_questions_pointers()
         self.reset_replied_questions_pointers()
 
@@ -86,9 +161,41 @@ class AppController:
         # Update question related counters (total/pending/replied)
         self.update_question_counters_and_banner()
         self.connect_signals()
+        # The google api client stack is only needed once Start Stream is clicked
+        QTimer.singleShot(
+            YOUTUBE_CHAT_MODULE_PRELOAD_DELAY_MS,
+            lambda: preload_module(YOUTUBE_CHAT_MODULE),
+        )
+        # A cassette (record/replay) sets its own start time, no arming then. The ingestion process looks the live
+        # chat up by itself, no arming either
+        if (
+            YOUTUBE_ARMED_MODE
+            and not YOUTUBE_CASSETTE_MODE
+            and not self.ingestion_process_mode
+        ):
+            QTimer.singleShot(
+                YOUTUBE_CHAT_MODULE_PRELOAD_DELAY_MS, self.arm_youtube_live_chat
+            )
+
+    def arm_youtube_live_chat(self):
+        """Only at launch, after a Stop Stream (i.e. the broadcast ended) nothing keeps looking for a live chat"""
+
+        def _arm():
+            # Lazy import in this thread, the GUI thread doesn't wait for it
+            from stream_live_chat_gui.youtube_chat import LiveChatArmer
+
+            # Start Stream was clicked while importing
+            if self.live_chat_arming_over:
+                return
+            live_chat_armer = LiveChatArmer(self.db_filename)
+            live_chat_armer.daemon = True
+            live_chat_armer.start()
+            self.live_chat_armer = live_chat_armer
+
+        Thread(target=_arm, name="ArmYoutubeLiveChat", daemon=True).start()
 
     def update_question_counters_and_banner(self):
-        number_of_pending_questions: int = self.db.count_all_pending_questions()
+        number_of_pending_questions: int = self.db.counters.pending_questions()
         number_of_replied_questions: int = self.db.count_all_replied_questions()
         # TODO: clean this variable, either make `number_of_replied_questions` a variable instance as well or make all
         # `number_of_pending_questions` references in this method to be `self.number_of_pending_questions`
@@ -129,6 +236,9 @@ class AppController:
         self.view.table_refresh_timer.timeout.connect(
             self.refresh_while_stream_is_active
         )
+        self.view.ingestion_messages_timer.timeout.connect(
+            self.read_ingestion_messages
+        )
         self.view.start_stream_button.clicked.connect(self.stream_timer_control)
 
         self.view.camera_reset_timer.timeout.connect(self.view.camera_reset_dialog.show)
@@ -142,6 +252,7 @@ class AppController:
         )
 
         self.view.add_manual_question_button.clicked.connect(self.add_manual_question)
+        self.db_write_notifier.committed.connect(self.refresh_after_db_writes)
 
         # Reply buttons slot section
         self.view.reply_auto_button.clicked.connect(self.reply_auto)
@@ -165,10 +276,31 @@ class AppController:
         question = self.view.question_manual_input.toPlainText()
         if not question:
             return
-        self.db.add_new_question(user_name=YOUTUBER_NAME, question_msg=question)
+        self.ingestion_bus.add_question(user_name=YOUTUBER_NAME, question_msg=question)
+        self.view.question_manual_input.clear()
+
+    def refresh_after_db_writes(self, writes: list[DBWrite]):
+        """The writes done from the GUI show up once the database writer committed them"""
+        if any(write.kind is DBWriteKind.MARK_REPLIED for write in writes):
+            if self.record_file:
+                self.generate_replied_questions_timestamps_file()
+            self.display_answer_average_time()
+            self.display_wait_average_time()
+            self.display_estimated_by_answer_time()
+        self.view.replied_questions_view.model().refresh()
         self.view.pending_questions_view.model().refresh()
         self.update_question_counters_and_banner()
-        self.view.question_manual_input.clear()
+        if not self.ingestion_bus.control_writes_waiting:
+            actions, self.actions_after_gui_writes = self.actions_after_gui_writes, []
+            for action in actions:
+                action()
+
+    def after_gui_writes(self, action: Callable[[], None]) -> None:
+        """Runs `action` once the GUI writes queued so far are committed (right away if none is waiting)"""
+        if self.ingestion_bus.control_writes_waiting:
+            self.actions_after_gui_writes.append(action)
+        else:
+            action()
 
     def _get_from_gui_and_set_questions_limits(self) -> bool:
         """
@@ -227,6 +359,10 @@ class AppController:
         reset that first. And then get the one before to the latest to display it again as the current
         one. Using `current_timer_per_question_id` to restart the current_question_time
         """
+        # The latest replies have to be committed to be read
+        self.after_gui_writes(self._reschedule_last)
+
+    def _reschedule_last(self):
         if self.db.count_all_replied_questions() < 2:
             return
 
@@ -236,13 +372,11 @@ class AppController:
         current_question_to_reset = latest_replied_questions[0]
         question_to_reschedule = latest_replied_questions[-1]
 
-        self.db.mark_unmark_question_as_replied(
+        self.ingestion_bus.mark_question_as_replied(
             current_question_to_reset.id, replied=False
         )
         self.view.replied_questions_view.clearSelection()
         self.view.pending_questions_view.clearSelection()
-        self.view.replied_questions_view.model().refresh()
-        self.view.pending_questions_view.model().refresh()
         self.view.current_question_text.setText(question_to_reschedule.question)
         # Only needed if something goes wrong
         # log.debug(
@@ -252,7 +386,6 @@ class AppController:
             question_to_reschedule.id, DEFAULT_CURRENT_QUESTION_TIMER
         )
         self.start_current_question_timer(start_timer_at=restart_time)
-        self.update_question_counters_and_banner()
 
     def delete_question(self, table: TableType) -> None:
         if table == TableType.PENDING_QUESTIONS and self.pending_question_id != -1:
@@ -260,21 +393,18 @@ class AppController:
                 f"Deleting pending question id: {self.pending_question_id}, with row index: "
                 f"{self.pending_question_row_index} of pending questions table"
             )
-            self.db.delete_question_with_id(self.pending_question_id)
+            self.ingestion_bus.delete_question(self.pending_question_id)
             self.reset_pending_questions_pointers()
             self.view.pending_questions_view.clearSelection()
-            self.view.pending_questions_view.model().refresh()
 
         elif table == TableType.REPLIED_QUESTIONS and self.replied_question_id != -1:
             log.debug(
                 f"Deleting replied question id: {self.replied_question_id}, with row index: "
                 f"{self.replied_question_row_index} of pending questions table"
             )
-            self.db.delete_question_with_id(self.replied_question_id)
+            self.ingestion_bus.delete_question(self.replied_question_id)
             self.reset_replied_questions_pointers()
             self.view.replied_questions_view.clearSelection()
-            self.view.replied_questions_view.model().refresh()
-        self.update_question_counters_and_banner()
         return
 
     def reply_auto(self):
@@ -282,6 +412,10 @@ class AppController:
         In the event of a super chat, give priority to it but keep on using reply auto normal
         functionality after 1 super chat event.
         """
+        # The pending questions read have to account for the replies/deletes just queued
+        self.after_gui_writes(self._reply_auto)
+
+    def _reply_auto(self):
         if not self.db.count_all_pending_questions():
             self.view.current_question_text.setText("")
             return
@@ -294,7 +428,7 @@ class AppController:
             log.debug(
                 f"Number of pending super chat events: {number_of_pending_super_chats}"
             )
-            self.reply_question(is_super_chat=True)
+            self._reply_question(is_super_chat=True)
             return
 
         self.auto_reply_value += 1
@@ -309,12 +443,16 @@ class AppController:
             or self.auto_reply_value == AutoReplyStatus.DO_NEXT_2.value
         ):
             log.debug(f"Reply auto, regular question: {self.auto_reply_value}")
-            self.reply_question()
+            self._reply_question()
         else:
             log.debug(f"Reply auto, random question: {self.auto_reply_value}")
-            self.reply_question(random=True)
+            self._reply_question(random=True)
 
     def reply_question(self, random=False, is_super_chat=False):
+        # Otherwise a quick second reply would get the question of the first one again
+        self.after_gui_writes(lambda: self._reply_question(random, is_super_chat))
+
+    def _reply_question(self, random=False, is_super_chat=False):
         if (
             not self.db.count_all_pending_questions()
             and not self.db.count_all_pending_questions(is_super_chat=True)
@@ -349,8 +487,26 @@ class AppController:
             question_text = "[SUPER CHAT] " + question_text
 
         self.view.current_question_text.setText(question_text)
-        self.db.mark_unmark_question_as_replied(question.id)
+        # Every earlier GUI write is committed (`after_gui_writes`), this one isn't queued yet
+        replied_questions = self.db.count_all_replied_questions()
+        # The timestamps file, averages, tables and counters follow once it's committed (`refresh_after_db_writes`)
+        self.ingestion_bus.mark_question_as_replied(question.id)
+
+        # `>=1` (`>=2` counting the current one) due to the fact that the current shown question will be present in
+        # the replied_question_table and we need to start counting after the 1st question has been replied (meaning,
+        # when the second question becomes the current question) and all the subsequent ones.
+        if replied_questions >= 1:
+            log.debug(
+                f"For question.id {question.id}, assign current_time: {self.view.current_question_time}"
+            )
+            self.current_timer_per_question_id[
+                question.id
+            ] = self.view.current_question_time
+        self.start_current_question_timer()
+        self.view.replied_questions_view.clearSelection()
+        self.view.pending_questions_view.clearSelection()
 
+    def generate_replied_questions_timestamps_file(self):
         # This synchronizes the replied questions to the actual start time of the live stream
         try:
             # Query for all replied questions (includes schat events)
@@ -361,52 +517,52 @@ class AppController:
         except Exception as e:
             log.exception(f"Generation of questions with timestamps file failed: {e}")
 
-        self.display_answer_average_time()
-        self.display_wait_average_time()
-        self.display_estimated_by_answer_time()
-        # `>2` due to the fact that the current shown question will be present in the replied_question_table
-        # and we need to start counting after the 1st question has been replied (meaning, when the second
-        # question becomes the current question) and all the subsequent ones.
-        if self.db.count_all_replied_questions() >= 2:
-            log.debug(
-                f"For question.id {question.id}, assign current_time: {self.view.current_question_time}"
-            )
-            self.current_timer_per_question_id[
-                question.id
-            ] = self.view.current_question_time
-        self.start_current_question_timer()
-        self.view.replied_questions_view.clearSelection()
-        self.view.pending_questions_view.clearSelection()
-        self.view.replied_questions_view.model().refresh()
-        self.view.pending_questions_view.model().refresh()
-        self.update_question_counters_and_banner()
-
     # https://stackoverflow.com/questions/41327545/how-to-create-a-timer-in-pyqt
     def stream_timer_control(self):
         if self.view.start_stream_button.isChecked():
             log.debug("Starting stream")
             self.view.stream_timer.start(1000)
             self.view.start_stream_button.setText("Stop Stream")
-            self.record_file = FileRecording()
+            # The ingestion process writes the live chat record itself
+            self.record_file = FileRecording(
+                live_chat_writer=not self.ingestion_process_mode
+            )
 
             self.view.youtube_open_questions.setEnabled(True)
             self.view.add_manual_question_button.setEnabled(True)
-            self._start_youtube_live_chat_execution(self.record_file.live_chat_file)
-
-            # It's assumed that the first call to start fetching live chat messages has been succesful,
-            # therefore we instantiate a second client only to get the actual_start_time.
-            # It's suboptimal since it could be done by using the already created client, but this way is simpler
-            actual_start_time = AppController._get_live_stream_actual_start_time()
-
-            self.record_file.set_start_time(actual_start_time)
+            if self.ingestion_process_mode:
+                self._start_ingestion_process()
+            elif self._start_youtube_live_chat_execution(
+                self.record_file.live_chat_writer
+            ):
+                # The client already running in the streamer thread resolves the actual_start_time while looking
+                # for the live_chat_id, the record file gets it from there (no second client needed)
+                record_file = self.record_file
+                start_time_future = (
+                    self.youtube_chat_streamer_thread.actual_start_time_future
+                )
+                start_time_future.add_done_callback(
+                    lambda future: record_file.set_start_time(future.result())
+                )
+                if TWITCH_CHAT_ENABLED:
+                    self._start_twitch_chat_execution(self.record_file.live_chat_writer)
             self.error_message_box_already_shown = False
         else:
+            if self.ingestion_process_mode:
+                self._stop_ingestion_process()
             # Check if the thread is alive first, before joining
-            if self.youtube_chat_streamer_thread.is_alive():
+            elif self.youtube_chat_streamer_thread.is_alive():
                 self.youtube_chat_streamer_thread.join()
             else:
                 log.warning("Unable to join thread, it stopped running, check logs!")
+            if self.twitch_chat_streamer_thread is not None:
+                self.twitch_chat_streamer_thread.join()
+                self.twitch_chat_streamer_thread = None
             log.debug("Stopping stream")
+            # Once the thread is done, whatever is pending in the live chat record gets written
+            self.record_file.close()
+            # Final version of the timestamps file, with every question replied (the last reply stored first)
+            self.after_gui_writes(self.generate_replied_questions_timestamps_file)
             self.view.stream_timer.stop()
             self.view.table_refresh_timer.stop()
             self.view.start_stream_button.setText("Start Stream")
@@ -416,45 +572,164 @@ class AppController:
             self.view.youtube_open_questions.setEnabled(False)
             self.view.add_manual_question_button.setEnabled(False)
 
-    def _start_youtube_live_chat_execution(self, live_chat_record_file: str) -> None:
+    def _start_youtube_live_chat_execution(
+        self, live_chat_record: LiveChatRecordWriter
+    ) -> bool:
+        """Returns whether the live chat streamer thread could be started"""
+        # Lazy import, most likely already done by `preload_module`
+        from stream_live_chat_gui.youtube_chat import (
+            YoutubeStreamThreadControl,
+            UnableToGetVideoId,
+            UnableToGetLiveChatId,
+        )
+
         # TODO: Add a popup display message displaying the error of the try/except block.
         # After that, uncheck the checkbox, reference -> `self.checkbox_confirmed.setCheckState(Qt.Unchecked)`
         # TODO: check if the queue needs to be added a value before or after creating the thread instance
+        start_clicked = time.perf_counter()
+        armed_chat = self.take_armed_live_chat()
         try:
             self.youtube_chat_streamer_thread = YoutubeStreamThreadControl(
                 self.open_close_question_control_queue,
-                live_chat_record_file,
+                live_chat_record,
                 self.db_filename,
+                armed_chat=armed_chat,
             )
 
         except (UnableToGetVideoId, UnableToGetLiveChatId) as error:
             log.debug(f"ERROR: \n{error}")
-            # setCheckState -> Qt.Unchecked triggers (stateChanged), it's disabled here so it doesn't trigger the
-            # button (youtube_open_questions) event
-            self.view.youtube_open_questions.blockSignals(True)
-            self.view.youtube_open_questions.setCheckState(Qt.Unchecked)
-            self.view.youtube_open_questions.blockSignals(False)
-            self.view.youtube_open_questions.setEnabled(False)
-
-            self.view.start_stream_button.setChecked(False)
-            self.view.start_stream_button.setText("Start Stream")
-
-            # RESET TIMER ?
-            self.view.stream_timer.stop()
-            return
+            live_chat_record.close()
+            self._reset_after_failed_start()
+            return False
 
         self.youtube_chat_streamer_thread.daemon = True
         self.youtube_chat_streamer_thread.start()
+        log.info(
+            f"Live chat ingestion started {time.perf_counter() - start_clicked:.2f}s after Start Stream "
+            f"(armed: {armed_chat is not None})"
+        )
 
         # Refresh table view/counters every 2.5 seconds
         self.view.table_refresh_timer.start(2500)
+        return True
+
+    def _reset_after_failed_start(self):
+        # setCheckState -> Qt.Unchecked triggers (stateChanged), it's disabled here so it doesn't trigger the
+        # button (youtube_open_questions) event
+        self.view.youtube_open_questions.blockSignals(True)
+        self.view.youtube_open_questions.setCheckState(Qt.Unchecked)
+        self.view.youtube_open_questions.blockSignals(False)
+        self.view.youtube_open_questions.setEnabled(False)
+
+        self.view.start_stream_button.setChecked(False)
+        self.view.start_stream_button.setText("Start Stream")
+
+        # RESET TIMER ?
+        self.view.stream_timer.stop()
+
+    def _start_ingestion_process(self):
+        """The live chat lookup happens in the child, a failure comes back as a START_FAILED message"""
+        self.ingestion_process = IngestionProcessControl(
+            self.record_file.live_chat_file,
+            db_filename=self.db_filename,
+            twitch_enabled=TWITCH_CHAT_ENABLED,
+        )
+        self.ingestion_process.start()
+        self.questions_stored_since_refresh = False
+        self.view.ingestion_messages_timer.start(INGESTION_MESSAGES_POLL_MS)
+        # Refresh table view/counters every 2.5 seconds
+        self.view.table_refresh_timer.start(2500)
 
-    @staticmethod
-    def _get_live_stream_actual_start_time() -> datetime:
-        yt = YoutubeLiveChat(
-            live_chat_record_file="some_file", channel_id=YOUTUBE_CHANNEL_ID
+    def _stop_ingestion_process(self):
+        self.view.ingestion_messages_timer.stop()
+        ingestion_process, self.ingestion_process = self.ingestion_process, None
+        self.handle_ingestion_messages(ingestion_process.join())
+        # Every question of the stream is stored by now
+        self.db.reload_question_counters()
+        self.view.pending_questions_view.model().refresh()
+        self.update_question_counters_and_banner()
+
+    def _forward_deleted_questions(self, question_hashes: list[str]):
+        """Database writer thread, the chat sources of the ingestion process can take these questions again"""
+        ingestion_process = self.ingestion_process
+        if ingestion_process is not None:
+            ingestion_process.forget_questions(question_hashes)
+
+    def read_ingestion_messages(self):
+        if self.ingestion_process is not None:
+            self.handle_ingestion_messages(self.ingestion_process.receive())
+
+    def handle_ingestion_messages(self, messages: list[tuple[IngestionMessage, Any]]):
+        for message, payload in messages:
+            if message is IngestionMessage.CHAT_TEXT:
+                # std.out is redirected to the GUI live chat feed
+                print(payload, end="")
+            elif message is IngestionMessage.NEW_QUESTIONS:
+                self.questions_stored_since_refresh = True
+            elif message is IngestionMessage.ACTUAL_START_TIME:
+                self.record_file.set_start_time(payload)
+            elif message is IngestionMessage.START_FAILED:
+                log.debug(f"ERROR: \n{payload}")
+                # Stop Stream clicked before the failure came in, it's stopped already
+                if self.view.start_stream_button.isChecked():
+                    self._stop_after_failed_ingestion_process_start()
+
+    def _stop_after_failed_ingestion_process_start(self):
+        self.view.table_refresh_timer.stop()
+        self.view.ingestion_messages_timer.stop()
+        ingestion_process, self.ingestion_process = self.ingestion_process, None
+        ingestion_process.join()
+        self.record_file.close()
+        self._reset_after_failed_start()
+
+    def _start_twitch_chat_execution(self, live_chat_record: LiveChatRecordWriter):
+        """Twitch is an extra source, youtube keeps going if it can't be reached"""
+        from stream_live_chat_gui.twitch_chat import TwitchStreamThreadControl
+
+        try:
+            self.twitch_chat_streamer_thread = TwitchStreamThreadControl(
+                self.twitch_questions_control_queue,
+                live_chat_record,
+                self.db_filename,
+            )
+        except OSError:
+            log.exception("Unable to connect to the twitch chat, only youtube is read")
+            return
+        self.twitch_chat_streamer_thread.daemon = True
+        self.twitch_chat_streamer_thread.start()
+
+    def _signal_questions_control(self, open_questions) -> None:
+        """Open (with the session limit)/close questions value, sent to every chat source running"""
+        if self.ingestion_process_mode:
+            # Questions get closed once the stream is stopped, the process is gone by then
+            if self.ingestion_process is not None:
+                self.ingestion_process.signal_questions_control(open_questions)
+            return
+        if self.youtube_chat_streamer_thread.is_alive():
+            self.open_close_question_control_queue.put(open_questions)
+        if (
+            self.twitch_chat_streamer_thread is not None
+            and self.twitch_chat_streamer_thread.is_alive()
+        ):
+            self.twitch_questions_control_queue.put(open_questions)
+            # It only wakes up on new messages otherwise
+            self.twitch_chat_streamer_thread.wake_up()
+
+    def take_armed_live_chat(self):
+        """The armed live chat if it was found already, the arming is over either way"""
+        self.live_chat_arming_over = True
+        live_chat_armer, self.live_chat_armer = self.live_chat_armer, None
+        if live_chat_armer is None:
+            return None
+        armed_chat = live_chat_armer.take()
+        if armed_chat is None:
+            log.info("Armed mode: the live chat wasn't found yet, looking it up now")
+            return None
+        log.info(
+            f"Armed mode: using the live chat armed {time.monotonic() - live_chat_armer.armed_at:.0f}s ago, "
+            f"time saved: {live_chat_armer.time_saved_seconds:.2f}s"
         )
-        return yt.get_actual_start_time()
+        return armed_chat
 
     def display_stream_timer(self):
         self.view.stream_time = self.view.stream_time.addSecs(1)
@@ -477,13 +752,51 @@ class AppController:
                 f"Youtube stream, {inter_msg}: {self.session_questions_limit=}, "
                 f"with pool: {self.session_questions_pool_limit}"
             )
-            self.open_close_question_control_queue.put(
+            self._signal_questions_control(
                 (True, self.session_questions_absolute_limit)
             )
 
+    @property
+    def youtube_ingestion(self):
+        """The youtube poller thread, or the ingestion process in process mode (same `is_alive`/`broadcast_ended`)"""
+        if self.ingestion_process_mode:
+            return self.ingestion_process
+        return self.youtube_chat_streamer_thread
+
+    def ingestion_snapshot(self) -> Optional[IngestionSnapshot]:
+        if self.ingestion_process_mode:
+            # None until the ingestion process sent its first one
+            return self.ingestion_process.snapshot
+        return take_ingestion_snapshot(
+            self.youtube_chat_streamer_thread,
+            self.twitch_chat_streamer_thread,
+            self.ingestion_bus,
+        )
+
     def refresh_while_stream_is_active(self):
-        self.view.pending_questions_view.model().refresh()
+        if self.ingestion_process_mode:
+            self.read_ingestion_messages()
+            # A start failure was just handled
+            if self.ingestion_process is None:
+                return
+            # The questions are stored by the other process, nothing to refresh if none came in
+            if self.questions_stored_since_refresh:
+                self.questions_stored_since_refresh = False
+                self.db.reload_question_counters()
+                self.view.pending_questions_view.model().refresh()
+        else:
+            self.refreshes_since_counters_reconcile += 1
+            if (
+                self.refreshes_since_counters_reconcile
+                >= PENDING_COUNTERS_RECONCILE_REFRESHES
+            ):
+                self.refreshes_since_counters_reconcile = 0
+                self.db.reconcile_pending_questions_counters()
+            self.view.pending_questions_view.model().refresh()
+
         self.update_question_counters_and_banner()
+        self.display_youtube_quota()
+        self.display_chat_message_rates()
         self._set_questions_limits_from_gui_and_signal_yt_api()
 
         if (
@@ -493,11 +806,19 @@ class AppController:
         ):
             self.view.youtube_open_questions.setCheckState(Qt.Unchecked)
 
+        # The worker stops by itself once the broadcast ends, the stream is stopped as if Stop Stream was clicked
+        if (
+            not self.youtube_ingestion.is_alive()
+            and self.youtube_ingestion.broadcast_ended
+        ):
+            self.stop_stream_after_broadcast_end()
+            return
+
         # Check that the underlying worker in charge of calling the youtube live chat api is alive
         # if not, display a message.
         if (
             not self.error_message_box_already_shown
-            and not self.youtube_chat_streamer_thread.is_alive()
+            and not self.youtube_ingestion.is_alive()
         ):
             self.view.error_message_box.show()
             self.error_message_box_already_shown = True
@@ -515,9 +836,39 @@ class AppController:
 
         return
 
+    def stop_stream_after_broadcast_end(self):
+        log.warning(
+            f"Broadcast ended ({self.youtube_ingestion.broadcast_ended}), stopping the stream"
+        )
+        # setChecked doesn't emit `clicked`, the stop is done here
+        self.view.start_stream_button.setChecked(False)
+        self.stream_timer_control()
+
+    def display_chat_message_rates(self):
+        snapshot = self.ingestion_snapshot()
+        if snapshot is None:
+            return
+        text = f"Msgs/s:\nYT {snapshot.youtube_messages_per_second:.1f}"
+        if snapshot.twitch_messages_per_second is not None:
+            text += f"\nTW {snapshot.twitch_messages_per_second:.1f}"
+        # Only shown once the database writer fell so far behind that questions were dropped
+        if snapshot.dropped_questions:
+            text += f"\nDropped {snapshot.dropped_questions}"
+        self.view.chat_message_rate_label.setText(text)
+
+    def display_youtube_quota(self):
+        snapshot = self.ingestion_snapshot()
+        if snapshot is None or snapshot.quota_text is None:
+            return
+        text = snapshot.quota_text
+        # The poller keeps retrying failed calls, only shown while it does
+        if snapshot.retrying:
+            text += f"\nRetrying ({snapshot.retrying})"
+        self.view.youtube_quota_label.setText(text)
+
     def check_session_question_limit(self):
         return (
-            self.db.count_all_pending_questions()
+            self.db.counters.pending_questions()
             >= self.session_questions_absolute_limit
         )
 
@@ -553,7 +904,7 @@ class AppController:
         )
 
     def display_estimated_by_answer_time(self):
-        number_of_pending_questions = self.db.count_all_pending_questions()
+        number_of_pending_questions = self.db.counters.pending_questions()
         if not number_of_pending_questions or self.answer_average is None:
             return
         self.estimated_by_answer_time_for_display = str(
@@ -630,8 +981,7 @@ class AppController:
         else:
             log.debug("Youtube stream, closing questions")
             self.youtube_questions_open = False
-            if self.youtube_chat_streamer_thread.is_alive():
-                self.open_close_question_control_queue.put(False)
+            self._signal_questions_control(False)
 
             if self.session_questions_pool_limit:
                 # At this point there can be two scenarios:
@@ -655,8 +1005,8 @@ class AppController:
                 )
 
                 if number_of_questions_to_delete:
-                    self.db.get_and_delete_random_number_of_pending_questions(
-                        number_of_questions_to_filter=number_of_questions_to_delete
+                    self.ingestion_bus.trim_pending_questions(
+                        number_of_questions_to_delete
                     )
             # TODO: with changes of commit 4968486 these next values related to questions being set might not be
             # needed anymore.
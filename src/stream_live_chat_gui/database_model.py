@@ -21,6 +21,8 @@ class Question(Base):
         Text(),
         nullable=False,
     )
+    # Hash of the normalized question (see `dedup_cache.question_text_hash`), duplicates are looked up by it
+    question_hash = Column(Text(), nullable=True, index=True)
     user_id = Column(Text(), ForeignKey("user.id"))
     user = relationship("User", back_populates="questions")
     created_ts = Column(
@@ -57,3 +59,25 @@ class User(Base):
 
     def __repr__(self) -> str:
         return "<User(%r, %r)>" % (self.id, self.name)
+
+
+class LiveChatState(Base):
+    """Where the polling of a live chat stopped, so a restart of the stream resumes from there"""
+
+    __tablename__ = "live_chat_state"
+    # "main" or the video id of the extra live chat
+    chat_key = Column(Text(), primary_key=True)
+    live_chat_id = Column(Text(), nullable=False)
+    page_token = Column(Text(), nullable=True)
+    # Messages published before this time are stale (when Start Stream was first clicked)
+    start_time = Column(DateTime(), nullable=False)
+    actual_start_time = Column(DateTime(), nullable=True)
+    last_message_id = Column(Text(), nullable=True)
+    updated_ts = Column(DateTime(), nullable=False)
+
+    def __repr__(self) -> str:
+        return "<LiveChatState(%r, %r, %r)>" % (
+            self.chat_key,
+            self.live_chat_id,
+            self.page_token,
+        )
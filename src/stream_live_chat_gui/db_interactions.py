@@ -3,31 +3,164 @@ from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from stream_live_chat_gui import (
     QuestionTuple,
+    NewQuestion,
+    LiveChatStateTuple,
     get_db_session,
     session_manager,
+    DATABASE_NAME,
+    QUESTIONS_LIMIT,
 )
-from typing import Optional
-from stream_live_chat_gui.database_model import Question, User
+from collections import Counter
+from enum import Enum
+from threading import Lock
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+from stream_live_chat_gui.database_model import LiveChatState, Question, User
+from stream_live_chat_gui.dedup_cache import question_text_hash
+from stream_live_chat_gui.message_classifier import is_limited_user
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
+# Keeps the number of bound parameters of an `IN (...)` clause under sqlite's limit (999)
+SQLITE_IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def chunked(values: list, chunk_size: int = SQLITE_IN_CLAUSE_CHUNK_SIZE):
+    for index in range(0, len(values), chunk_size):
+        yield values[index : index + chunk_size]  # noqa: E203
+
+
+class QuestionCounters:
+    """
+    In memory counters of one session database, shared by every `DBInteractions` using the same file (the GUI and
+    the live chat pollers), so the per message checks don't need to query the database:
+    - questions per user (LIMITED_USERS check)
+    - pending questions, regular and super chats apart (session questions limit)
+    Seeded from the database the first time the file is used, then kept up to date by the `DBInteractions` methods
+    that add, delete or mark questions as replied. The pending ones can be reconciled against the database.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._questions_by_user: Counter = Counter()
+        # Keyed by `is_super_chat`
+        self._pending_questions: Counter = Counter()
+        self.seeded = False
+
+    def seed(
+        self, questions_by_user: dict[str, int], pending_questions: dict[bool, int]
+    ) -> None:
+        with self._lock:
+            self._questions_by_user = Counter(questions_by_user)
+            self._pending_questions = Counter(pending_questions)
+            self.seeded = True
+
+    def questions_asked_by(self, user_name: str) -> int:
+        with self._lock:
+            return self._questions_by_user[user_name]
+
+    def pending_questions(self, is_super_chat: bool = False) -> int:
+        with self._lock:
+            return self._pending_questions[is_super_chat]
+
+    def questions_added(self, questions: Iterable[NewQuestion]) -> None:
+        with self._lock:
+            for question in questions:
+                self._questions_by_user[question.user_name] += 1
+                self._pending_questions[question.is_super_chat] += 1
+
+    def questions_deleted(self, questions: Iterable["DeletedQuestion"]) -> None:
+        with self._lock:
+            for question in questions:
+                self._questions_by_user[question.user_name] -= 1
+                if not question.is_replied:
+                    self._pending_questions[question.is_super_chat] -= 1
+
+    def question_replied(self, is_super_chat: bool, replied: bool = True) -> None:
+        with self._lock:
+            self._pending_questions[is_super_chat] += -1 if replied else 1
+
+    def reconcile_pending_questions(
+        self, pending_questions: dict[bool, int], log_drift: bool = True
+    ) -> bool:
+        """Replaces the pending counters with the database ones, returns whether they had drifted"""
+        with self._lock:
+            drifted = any(
+                self._pending_questions[key] != pending_questions[key]
+                for key in (False, True)
+            )
+            if drifted and log_drift:
+                log.warning(
+                    f"Pending questions counters drifted: {dict(self._pending_questions)}, "
+                    f"database: {pending_questions}"
+                )
+            self._pending_questions = Counter(pending_questions)
+            return drifted
+
+
+class DeletedQuestion(NamedTuple):
+    user_name: str
+    is_super_chat: bool
+    is_replied: bool
+    question_hash: Optional[str]
+
+
+class DBWriteKind(Enum):
+    ADD_QUESTIONS = "add_questions"
+    DELETE_QUESTION = "delete_question"
+    TRIM_PENDING_QUESTIONS = "trim_pending_questions"
+    MARK_REPLIED = "mark_replied"
+    UPDATE_QUESTION = "update_question"
+
+
+class DBWrite(NamedTuple):
+    """A write queued to the database writer (see `ingestion_bus`), applied by `DBInteractions.apply_writes`"""
+
+    kind: DBWriteKind
+    questions: tuple[NewQuestion, ...] = ()
+    # Polling state of each live chat (by chat key) saved along the questions
+    live_chat_states: Optional[dict[str, LiveChatStateTuple]] = None
+    question_id: Optional[int] = None
+    replied: bool = True
+    number_of_questions: int = 0
+    # Question columns set by UPDATE_QUESTION (cells edited in the GUI tables)
+    values: Optional[dict[str, Any]] = None
+
+
+_question_counters: dict[str, QuestionCounters] = dict()
+_question_counters_lock = Lock()
+
+
+def get_question_counters(db_filename: str = None) -> QuestionCounters:
+    with _question_counters_lock:
+        return _question_counters.setdefault(
+            db_filename or DATABASE_NAME, QuestionCounters()
+        )
 
 
 class DBInteractions:
     def __init__(self, db_filename: str = None):
         self.session = get_db_session(db_filename)
+        self.counters = get_question_counters(db_filename)
+        # Called with the hashes of the questions deleted, once committed (see `IngestionBus.add_dedup_cache`)
+        self.on_questions_deleted: Optional[Callable[[list[str]], None]] = None
+        if not self.counters.seeded:
+            self.counters.seed(
+                self.count_questions_grouped_by_user(),
+                self.count_pending_questions_by_type(),
+            )
 
     def add_new_question(
         self, user_name: str, question_msg: str, is_super_chat: bool = False
     ) -> None:
         """Add a new question to the database"""
-        # Check if the question already exists (no matter the user)
+        # Check if the question already exists (no matter the user), through the indexed hash of the question
+        question_hash = question_text_hash(question_msg)
         with session_manager(self.session) as session:
             question = (
-                session.query(Question)
-                .filter(Question.question == question_msg)
-                .one_or_none()
+                session.query(Question.id)
+                .filter(Question.question_hash == question_hash)
+                .first()
             )
 
             if question is not None and not is_super_chat:
@@ -42,7 +175,11 @@ class DBInteractions:
                 log.debug("This is a SUPER CHAT event")
 
             # Create the question if needed
-            question = Question(question=question_msg, is_super_chat=is_super_chat)
+            question = Question(
+                question=question_msg,
+                question_hash=question_hash,
+                is_super_chat=is_super_chat,
+            )
 
             # Check if the user making the question already exists
             user = session.query(User).filter(User.name == user_name).one_or_none()
@@ -55,13 +192,154 @@ class DBInteractions:
             question.user = user
             session.add(question)
 
+        self.counters.questions_added(
+            [NewQuestion(user_name, question_msg, is_super_chat)]
+        )
+
+    def add_new_questions(
+        self,
+        batch: list[NewQuestion],
+        live_chat_state: Optional[LiveChatStateTuple] = None,
+    ) -> int:
+        """
+        Add a whole batch of questions (i.e. one live chat page) to the database in a single transaction.
+        Same rules as `add_new_question`: regular questions already in the table (or repeated in the batch) are
+        discarded, super chats are always added. Returns the number of questions inserted.
+        `live_chat_state` (where the polling is after this page) is saved in the same transaction.
+        """
+        if not batch and live_chat_state is None:
+            return 0
+
+        live_chat_states = [live_chat_state] if live_chat_state is not None else []
+        with session_manager(self.session) as session:
+            questions_to_add = self._insert_new_questions(
+                session, batch, live_chat_states
+            )
+
+        self.counters.questions_added(questions_to_add)
+        return len(questions_to_add)
+
+    def _insert_new_questions(
+        self,
+        session,
+        batch: Iterable[NewQuestion],
+        live_chat_states: Iterable[LiveChatStateTuple],
+    ) -> list[NewQuestion]:
+        """`add_new_questions` within an open transaction, returns the questions inserted"""
+        batch = list(batch)
+        for live_chat_state in live_chat_states:
+            session.merge(LiveChatState(**live_chat_state._asdict()))
+
+        questions_to_add: list[NewQuestion] = []
+        hashes = [question_text_hash(new.question) for new in batch]
+        regular_hashes = list(
+            {
+                question_hash
+                for new, question_hash in zip(batch, hashes)
+                if not new.is_super_chat
+            }
+        )
+        already_stored = set()
+        for hashes_chunk in chunked(regular_hashes):
+            already_stored.update(
+                question_hash
+                for (question_hash,) in session.query(Question.question_hash).filter(
+                    Question.question_hash.in_(hashes_chunk)
+                )
+            )
+
+        hashes_to_add: list[str] = []
+        for new, question_hash in zip(batch, hashes):
+            if not new.is_super_chat:
+                if question_hash in already_stored:
+                    log.debug(
+                        f"DUPLICATED_QUESTION: {new.question} was already in the table"
+                    )
+                    continue
+                already_stored.add(question_hash)
+            questions_to_add.append(new)
+            hashes_to_add.append(question_hash)
+
+        if not questions_to_add:
+            return []
+
+        user_names = list({new.user_name for new in questions_to_add})
+        users_by_name: dict[str, User] = dict()
+        for names_chunk in chunked(user_names):
+            users_by_name.update(
+                (user.name, user)
+                for user in session.query(User).filter(User.name.in_(names_chunk))
+            )
+
+        for new, question_hash in zip(questions_to_add, hashes_to_add):
+            user = users_by_name.get(new.user_name)
+            if user is None:
+                user = User(name=new.user_name)
+                users_by_name[new.user_name] = user
+                session.add(user)
+
+            log.debug(
+                f"Question from user: {new.user_name} question: {new.question}, "
+                f"is_super_chat: {new.is_super_chat}"
+            )
+            question = Question(
+                question=new.question,
+                question_hash=question_hash,
+                is_super_chat=new.is_super_chat,
+            )
+            question.user = user
+            session.add(question)
+
+        log.debug(f"Adding {len(questions_to_add)} out of {len(batch)} questions")
+        return questions_to_add
+
+    def get_live_chat_state(self, chat_key: str) -> Optional[LiveChatStateTuple]:
+        with session_manager(self.session) as session:
+            state = session.query(LiveChatState).get(chat_key)
+            if state is None:
+                return None
+            return LiveChatStateTuple(
+                chat_key=state.chat_key,
+                live_chat_id=state.live_chat_id,
+                page_token=state.page_token,
+                start_time=state.start_time,
+                actual_start_time=state.actual_start_time,
+                last_message_id=state.last_message_id,
+                updated_ts=state.updated_ts,
+            )
+
     def delete_question_with_id(self, question_id: int) -> None:
         with session_manager(self.session) as session:
-            question = (
-                session.query(Question).filter(Question.id == question_id).first()
+            deleted = self._delete_question(session, question_id)
+
+        self._questions_deleted([deleted])
+
+    def _questions_deleted(self, deleted: list[DeletedQuestion]) -> None:
+        self.counters.questions_deleted(deleted)
+        if self.on_questions_deleted is not None:
+            self.on_questions_deleted(
+                [question.question_hash for question in deleted if question.question_hash]
             )
-            log.debug(f"Deleting question: {question.question}, with id: {question_id}")
-            session.delete(question)
+
+    def _delete_question(self, session, question_id: int) -> DeletedQuestion:
+        question = session.query(Question).filter(Question.id == question_id).first()
+        log.debug(f"Deleting question: {question.question}, with id: {question_id}")
+        deleted = DeletedQuestion(
+            question.user.name,
+            question.is_super_chat,
+            question.is_replied,
+            question.question_hash,
+        )
+        session.delete(question)
+        return deleted
+
+    def _update_question(
+        self, session, question_id: int, values: dict[str, Any]
+    ) -> None:
+        question = session.query(Question).filter(Question.id == question_id).first()
+        log.debug(f"Updating question id: {question_id} with: {values}")
+        for column_name, value in values.items():
+            setattr(question, column_name, value)
 
     def get_and_delete_random_number_of_pending_questions(
         self, number_of_questions_to_filter: int
@@ -70,25 +348,40 @@ class DBInteractions:
             f"About to delete {number_of_questions_to_filter} number of pending questions"
         )
         with session_manager(self.session) as session:
-            random_selected_n_questions = (
-                session.query(Question)
-                .filter(
-                    Question.is_replied == False,  # noqa: E712
-                    Question.is_super_chat == False,  # noqa: E712
-                )
-                .order_by(func.random())
-                .limit(number_of_questions_to_filter)
+            deleted = self._delete_random_pending_questions(
+                session, number_of_questions_to_filter
             )
-            questions = [(q.id, q.question) for q in random_selected_n_questions]
-            log.debug(f"Deleting {questions=}")
-            questions_to_be_deleted_ids = [value[0] for value in questions]
 
-            # https://qiita.com/nskydiving/items/eedd5cea88b5afdbfc49
-            # TODO: optimize in the future to use subquery (?)
-            # https://stackoverflow.com/questions/57796891/sqlalchemy-delete-limit-rows
-            session.query(Question).filter(
-                Question.id.in_(questions_to_be_deleted_ids)
-            ).delete(synchronize_session="fetch")
+        self._questions_deleted(deleted)
+
+    def _delete_random_pending_questions(
+        self, session, number_of_questions_to_filter: int
+    ) -> list[DeletedQuestion]:
+        random_selected_n_questions = (
+            session.query(Question)
+            .filter(
+                Question.is_replied == False,  # noqa: E712
+                Question.is_super_chat == False,  # noqa: E712
+            )
+            .order_by(func.random())
+            .limit(number_of_questions_to_filter)
+        )
+        questions = [
+            (q.id, q.question, q.user.name, q.question_hash)
+            for q in random_selected_n_questions
+        ]
+        log.debug(f"Deleting {questions=}")
+        questions_to_be_deleted_ids = [value[0] for value in questions]
+
+        # https://qiita.com/nskydiving/items/eedd5cea88b5afdbfc49
+        # TODO: optimize in the future to use subquery (?)
+        # https://stackoverflow.com/questions/57796891/sqlalchemy-delete-limit-rows
+        session.query(Question).filter(
+            Question.id.in_(questions_to_be_deleted_ids)
+        ).delete(synchronize_session="fetch")
+
+        # Only pending (not replied) regular questions get trimmed
+        return [DeletedQuestion(value[2], False, False, value[3]) for value in questions]
 
     def mark_unmark_question_as_replied(
         self, question_id: int, replied: bool = True
@@ -96,32 +389,98 @@ class DBInteractions:
         """Marks the attribute 'is_replied' of a Question to be True by default when invoked.
         With this same method we can set that attribute to False if necessary.
         i.e. when revisiting a question already marked as replied to be rollbacked"""
+        with session_manager(self.session) as session:
+            was_replied, is_super_chat = self._mark_question_as_replied(
+                session, question_id, replied
+            )
+
+        if was_replied != replied:
+            self.counters.question_replied(is_super_chat, replied)
+
+    def _mark_question_as_replied(
+        self, session, question_id: int, replied: bool
+    ) -> tuple[bool, bool]:
+        """Returns whether the question was replied before, and whether it's a super chat"""
         time_now = datetime.utcnow()
         log.debug(
             f"Mark question with id: {question_id} as replied = {replied}, now: {time_now}"
         )
-        with session_manager(self.session) as session:
-            question = session.query(Question).get(question_id)
-
-            if replied:
-                session.query(Question).filter(Question.id == question_id).update(
-                    {
-                        Question.is_replied: replied,
-                        Question.waited: str(time_now - question.created_ts),
-                    }
-                )
-            else:
-                session.query(Question).filter(Question.id == question_id).update(
-                    {
-                        Question.replied_ts: question.created_ts,
-                        Question.is_replied: replied,
-                        Question.waited: "00:00",
-                    }
-                )
+        question = session.query(Question).get(question_id)
+        # Read before the update, it refreshes the instance
+        was_replied = bool(question.is_replied)
+        is_super_chat = bool(question.is_super_chat)
+
+        if replied:
+            session.query(Question).filter(Question.id == question_id).update(
+                {
+                    Question.is_replied: replied,
+                    Question.waited: str(time_now - question.created_ts),
+                }
+            )
+        else:
+            session.query(Question).filter(Question.id == question_id).update(
+                {
+                    Question.replied_ts: question.created_ts,
+                    Question.is_replied: replied,
+                    Question.waited: "00:00",
+                }
+            )
 
-            log.debug(
-                f"{question.question}'s flag is_replied updated to {question.is_replied}"
+        log.debug(
+            f"{question.question}'s flag is_replied updated to {question.is_replied}"
+        )
+        return was_replied, is_super_chat
+
+    def apply_writes(self, writes: list[DBWrite]) -> int:
+        """
+        Applies the queued writes in a single transaction (group commit). If it fails, the writes are applied one
+        by one so a single bad write (i.e. a question deleted in the meantime) doesn't take the others with it.
+        Returns the number of writes that failed.
+        """
+        try:
+            self._apply_writes_in_one_transaction(writes)
+            return 0
+        except Exception:
+            if len(writes) == 1:
+                log.exception(f"Database write failed: {writes[0]}")
+                return 1
+            log.exception(f"Group commit of {len(writes)} writes failed, one by one")
+        return sum(self.apply_writes([write]) for write in writes)
+
+    def _apply_writes_in_one_transaction(self, writes: list[DBWrite]) -> None:
+        # The in memory counters follow the database only once the transaction is committed
+        counter_updates: list[Callable[[], None]] = []
+        with session_manager(self.session) as session:
+            for write in writes:
+                counter_updates.append(self._apply_write(session, write))
+        for counter_update in counter_updates:
+            counter_update()
+
+    def _apply_write(self, session, write: DBWrite) -> Callable[[], None]:
+        if write.kind is DBWriteKind.ADD_QUESTIONS:
+            added = self._insert_new_questions(
+                session, write.questions, (write.live_chat_states or {}).values()
             )
+            return lambda: self.counters.questions_added(added)
+        if write.kind is DBWriteKind.DELETE_QUESTION:
+            deleted = self._delete_question(session, write.question_id)
+            return lambda: self._questions_deleted([deleted])
+        if write.kind is DBWriteKind.TRIM_PENDING_QUESTIONS:
+            trimmed = self._delete_random_pending_questions(
+                session, write.number_of_questions
+            )
+            return lambda: self._questions_deleted(trimmed)
+        if write.kind is DBWriteKind.MARK_REPLIED:
+            was_replied, is_super_chat = self._mark_question_as_replied(
+                session, write.question_id, write.replied
+            )
+            if was_replied == write.replied:
+                return lambda: None
+            return lambda: self.counters.question_replied(is_super_chat, write.replied)
+        if write.kind is DBWriteKind.UPDATE_QUESTION:
+            self._update_question(session, write.question_id, write.values)
+            return lambda: None
+        raise ValueError(f"Unknown database write: {write.kind}")
 
     def get_all_users(self):
         # Applying here eager loading `.options(joinedload(...))`
@@ -205,6 +564,57 @@ class DBInteractions:
             )
             return replied_questions
 
+    def count_questions_grouped_by_user(self) -> dict[str, int]:
+        with session_manager(self.session) as session:
+            return dict(
+                session.query(User.name, func.count(Question.id))
+                .join(Question)
+                .group_by(User.name)
+                .all()
+            )
+
+    def count_pending_questions_by_type(self) -> dict[bool, int]:
+        """Pending questions from the database, keyed by `is_super_chat`"""
+        with session_manager(self.session) as session:
+            pending_questions = dict(
+                session.query(Question.is_super_chat, func.count(Question.id))
+                .filter(Question.is_replied == False)  # noqa: E712
+                .group_by(Question.is_super_chat)
+                .all()
+            )
+            return {
+                is_super_chat: pending_questions.get(is_super_chat, 0)
+                for is_super_chat in (False, True)
+            }
+
+    def reconcile_pending_questions_counters(self) -> bool:
+        """Catches drift of the in memory pending counters (i.e. rows changed outside of this class)"""
+        return self.counters.reconcile_pending_questions(
+            self.count_pending_questions_by_type()
+        )
+
+    def reload_question_counters(self) -> None:
+        """Another process writes to the same database (see `ingestion_process`), its changes aren't drift"""
+        self.counters.seed(
+            self.count_questions_grouped_by_user(),
+            self.count_pending_questions_by_type(),
+        )
+
+    def has_limited_user_exceeded_question_count(
+        self, user: str, questions_not_stored_yet: int = 0
+    ) -> bool:
+        """`questions_not_stored_yet` accounts for the questions of the user waiting to be stored with the page"""
+        if is_limited_user(user):
+            questions_already_asked_by_user: int = (
+                self.counters.questions_asked_by(user) + questions_not_stored_yet
+            )
+            if questions_already_asked_by_user >= QUESTIONS_LIMIT:
+                log.debug(
+                    f"The user: {user}, has already asked {questions_already_asked_by_user}, questions"
+                )
+                return True
+        return False
+
     def count_questions_asked_by_user(self, user: str) -> int:
         with session_manager(self.session) as session:
             number_of_questions = (
@@ -312,7 +722,5 @@ class DBInteractions:
 
 
 if __name__ == "__main__":
-    from stream_live_chat_gui import DATABASE_NAME
-
     # Section only used for local testing
     db_interactions = DBInteractions(DATABASE_NAME)
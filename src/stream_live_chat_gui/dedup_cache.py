@@ -0,0 +1,101 @@
+"""
+Bounded LRU sets of the live chat message ids and question hashes already seen by the ingestion, so re-delivered
+pages and repeated questions are dropped before reaching the database. The `question_hash` column of the question
+table covers what these sets can't (restarts, evicted entries).
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable, NamedTuple
+import hashlib
+import re
+
+DEFAULT_DEDUP_CACHE_SIZE = 10000
+QUESTION_HASH_DIGEST_SIZE = 16
+PATTERN_FOR_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case and whitespace differences don't make a different question"""
+    return PATTERN_FOR_WHITESPACE.sub(" ", question).strip().casefold()
+
+
+def question_text_hash(question: str) -> str:
+    return hashlib.blake2b(
+        normalize_question(question).encode("utf-8"),
+        digest_size=QUESTION_HASH_DIGEST_SIZE,
+    ).hexdigest()
+
+
+class DedupStats(NamedTuple):
+    message_id_hits: int
+    message_id_misses: int
+    question_hits: int
+    question_misses: int
+    evictions: int
+
+
+class _LRUSet:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.evictions = 0
+
+    def add(self, key: str) -> bool:
+        """Returns whether the key was already there, either way it becomes the most recent one"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+        self._entries[key] = None
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class MessageDedupCache:
+    def __init__(self, max_size: int = DEFAULT_DEDUP_CACHE_SIZE):
+        self._message_ids = _LRUSet(max_size)
+        self._question_hashes = _LRUSet(max_size)
+        # Shared by the chats of the ingestion engine, stats are read from other threads
+        self._lock = Lock()
+        self._message_id_hits = 0
+        self._message_id_misses = 0
+        self._question_hits = 0
+        self._question_misses = 0
+
+    def seen_message_id(self, message_id: str) -> bool:
+        with self._lock:
+            seen = self._message_ids.add(message_id)
+            if seen:
+                self._message_id_hits += 1
+            else:
+                self._message_id_misses += 1
+            return seen
+
+    def seen_question(self, question_hash: str) -> bool:
+        with self._lock:
+            seen = self._question_hashes.add(question_hash)
+            if seen:
+                self._question_hits += 1
+            else:
+                self._question_misses += 1
+            return seen
+
+    def forget_questions(self, question_hashes: Iterable[str]) -> None:
+        """Questions not stored (dropped) or deleted afterwards, they can be asked again"""
+        with self._lock:
+            for question_hash in question_hashes:
+                self._question_hashes.discard(question_hash)
+
+    def stats(self) -> DedupStats:
+        with self._lock:
+            return DedupStats(
+                message_id_hits=self._message_id_hits,
+                message_id_misses=self._message_id_misses,
+                question_hits=self._question_hits,
+                question_misses=self._question_misses,
+                evictions=self._message_ids.evictions + self._question_hashes.evictions,
+            )
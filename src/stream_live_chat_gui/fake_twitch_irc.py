@@ -0,0 +1,319 @@
+"""
+Local stand-in for the twitch irc chat, meant for hardening and load testing `TwitchStreamThreadControl`.
+
+    python -m stream_live_chat_gui.fake_twitch_irc --port 6667 --rate 200 --burst-size 100 --split-ratio 0.2
+
+Then start the application with `SERVER="127.0.0.1"` and `PORT="6667"` in the .env file (TWITCH_CHAT_ENABLED="yes").
+
+It takes CAP/PASS/NICK/JOIN, then pushes PRIVMSG lines (IRCv3 tags: display-name, id, tmi-sent-ts and bits for
+cheers) at the configured rate. Lines go out in packets of up to `burst_size` lines, a part of the packets is split
+in two TCP segments at a random byte (lines, and multi-byte characters, cut in half). A PING is sent every
+`ping_interval_seconds` and the PONGs are counted. Some messages are sent twice with the same id (re-deliveries of
+one of the last `DUPLICATE_WINDOW_LINES` lines, the reader still remembers their ids).
+"""
+from stream_live_chat_gui import CHAT_FILTER_WORD, DEDUP_CACHE_SIZE
+from collections import deque
+from dataclasses import dataclass
+from socket import IPPROTO_TCP, TCP_NODELAY
+from socketserver import BaseRequestHandler, ThreadingTCPServer
+from threading import Lock
+from typing import Optional
+import argparse
+import logging
+import random
+import select
+import time
+
+log = logging.getLogger(__name__)
+
+FAKE_CHANNEL = "fakechannel"
+# Time between two rounds of sending, the lines due since the last round go out in it
+SEND_TICK_SECONDS = 0.01
+# Pause between the two halves of a split packet, so they leave as different TCP segments
+SPLIT_PACKET_PAUSE_SECONDS = 0.002
+LOGIN_TIMEOUT_SECONDS = 10.0
+# Re-deliveries repeat one of the last lines sent, well within the message ids the reader remembers, otherwise an
+# evicted id counts as a new message (negative drops)
+DUPLICATE_WINDOW_LINES = min(1000, DEDUP_CACHE_SIZE // 2)
+WORDS = (
+    "hola que tal cómo estás hoy el stream está genial saludos desde méxico "
+    "pregunta sobre el video de ayer cuándo sale el siguiente gracias por todo"
+).split()
+
+
+@dataclass
+class FakeIrcConfig:
+    # PRIVMSG lines per second
+    rate: float = 200.0
+    # PRIVMSG lines sent in total, None keeps sending until the client disconnects
+    messages: Optional[int] = None
+    # Max lines per packet (single send)
+    burst_size: int = 100
+    # Ratio of packets split in two TCP segments at a random byte
+    split_ratio: float = 0.2
+    # Ratio of messages that carry the CHAT_FILTER_WORD (questions)
+    filter_word_ratio: float = 0.2
+    cheer_ratio: float = 0.005
+    # Ratio of messages sent again with the same id
+    duplicate_ratio: float = 0.01
+    ping_interval_seconds: float = 5.0
+    number_of_users: int = 500
+    filter_word: str = CHAT_FILTER_WORD
+    channel: str = FAKE_CHANNEL
+    seed: int = 0
+
+
+@dataclass
+class FakeIrcStats:
+    connections: int = 0
+    packets_sent: int = 0
+    split_packets: int = 0
+    privmsgs_sent: int = 0
+    duplicates_sent: int = 0
+    questions_sent: int = 0
+    cheers_sent: int = 0
+    pings_sent: int = 0
+    pongs_received: int = 0
+
+    @property
+    def unique_privmsgs_sent(self) -> int:
+        return self.privmsgs_sent - self.duplicates_sent
+
+
+class FakeIrcChat:
+    """Generates the PRIVMSG lines, thread safe (each connection is handled in its own thread)"""
+
+    def __init__(self, config: FakeIrcConfig):
+        self.config = config
+        self.stats = FakeIrcStats()
+        self._random = random.Random(config.seed)
+        self._sent_lines: deque[str] = deque(maxlen=DUPLICATE_WINDOW_LINES)
+        self._message_number = 0
+        self._lock = Lock()
+
+    @property
+    def random(self) -> random.Random:
+        return self._random
+
+    def _text(self) -> str:
+        return " ".join(self._random.choices(WORDS, k=self._random.randint(3, 12)))
+
+    def _privmsg(self) -> str:
+        self._message_number += 1
+        user = f"viewer_{self._random.randrange(self.config.number_of_users):04d}"
+        tags = {
+            "badge-info": "",
+            "display-name": user.capitalize(),
+            "id": f"fake-msg-{self._message_number}",
+            "tmi-sent-ts": str(int(time.time() * 1000)),
+            "user-id": str(self._message_number),
+        }
+        roll = self._random.random()
+        if roll < self.config.cheer_ratio:
+            self.stats.cheers_sent += 1
+            tags["bits"] = "100"
+            text = f"Cheer100 {self.config.filter_word} {self._text()}"
+        elif roll < self.config.cheer_ratio + self.config.filter_word_ratio:
+            self.stats.questions_sent += 1
+            text = f"{self.config.filter_word} {self._text()} {self._message_number}?"
+        else:
+            text = self._text()
+
+        encoded_tags = ";".join(f"{key}={value}" for key, value in tags.items())
+        return (
+            f"@{encoded_tags} :{user}!{user}@{user}.tmi.twitch.tv "
+            f"PRIVMSG #{self.config.channel} :{text}\r\n"
+        )
+
+    def next_lines(self, number_of_lines: int) -> list[str]:
+        with self._lock:
+            if self.config.messages is not None:
+                number_of_lines = min(
+                    number_of_lines, self.config.messages - self.stats.privmsgs_sent
+                )
+            lines = []
+            for _ in range(number_of_lines):
+                if (
+                    self._sent_lines
+                    and self._random.random() < self.config.duplicate_ratio
+                ):
+                    self.stats.duplicates_sent += 1
+                    lines.append(self._random.choice(self._sent_lines))
+                else:
+                    line = self._privmsg()
+                    self._sent_lines.append(line)
+                    lines.append(line)
+            self.stats.privmsgs_sent += len(lines)
+            return lines
+
+    @property
+    def done(self) -> bool:
+        return (
+            self.config.messages is not None
+            and self.stats.privmsgs_sent >= self.config.messages
+        )
+
+
+class FakeTwitchIrcHandler(BaseRequestHandler):
+    # Set by `create_server`
+    fake_irc_chat: FakeIrcChat = None
+
+    def _send_packet(self, lines: list[str]) -> None:
+        chat = self.fake_irc_chat
+        data = "".join(lines).encode("utf-8")
+        chat.stats.packets_sent += 1
+        if len(data) > 1 and chat.random.random() < chat.config.split_ratio:
+            chat.stats.split_packets += 1
+            cut = chat.random.randrange(1, len(data))
+            self.request.sendall(data[:cut])
+            time.sleep(SPLIT_PACKET_PAUSE_SECONDS)
+            self.request.sendall(data[cut:])
+        else:
+            self.request.sendall(data)
+
+    def _log_in(self) -> Optional[str]:
+        """Reads the client lines up to the JOIN, returns the nick (None if the client went away)"""
+        received = b""
+        nick = "justinfan"
+        deadline = time.monotonic() + LOGIN_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([self.request], [], [], 0.1)
+            if not readable:
+                continue
+            data = self.request.recv(4096)
+            if not data:
+                return None
+            received += data
+            *lines, received = received.split(b"\r\n")
+            for line in lines:
+                command, _, parameter = line.decode("utf-8").partition(" ")
+                if command == "CAP":
+                    self.request.sendall(
+                        f":tmi.twitch.tv CAP * ACK {parameter[4:]}\r\n".encode("utf-8")
+                    )
+                elif command == "NICK":
+                    nick = parameter
+                    self.request.sendall(
+                        f":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n".encode("utf-8")
+                    )
+                elif command == "JOIN":
+                    self.request.sendall(
+                        f":{nick}!{nick}@{nick}.tmi.twitch.tv JOIN {parameter}\r\n".encode(
+                            "utf-8"
+                        )
+                    )
+                    return nick
+        return None
+
+    def _read_pongs(self, timeout: float) -> bool:
+        """Waits up to `timeout` for client lines, returns False once the client went away"""
+        readable, _, _ = select.select([self.request], [], [], timeout)
+        if not readable:
+            return True
+        data = self.request.recv(4096)
+        if not data:
+            return False
+        self.fake_irc_chat.stats.pongs_received += data.count(b"PONG")
+        return True
+
+    def handle(self):
+        chat = self.fake_irc_chat
+        chat.stats.connections += 1
+        self.request.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        if self._log_in() is None:
+            log.debug(f"Client: {self.client_address} left before joining")
+            return
+
+        started = last_ping = time.monotonic()
+        lines_due_sent = 0
+        try:
+            while True:
+                now = time.monotonic()
+                if now - last_ping > chat.config.ping_interval_seconds:
+                    last_ping = now
+                    chat.stats.pings_sent += 1
+                    self.request.sendall(b"PING :tmi.twitch.tv\r\n")
+
+                lines_due = int((now - started) * chat.config.rate) - lines_due_sent
+                lines_due_sent += lines_due
+                lines = chat.next_lines(lines_due)
+                for index in range(0, len(lines), chat.config.burst_size):
+                    self._send_packet(lines[index : index + chat.config.burst_size])  # noqa: E203
+
+                if not self._read_pongs(SEND_TICK_SECONDS):
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        log.debug(f"Client: {self.client_address} disconnected, {chat.stats}")
+
+
+def create_server(
+    config: FakeIrcConfig, host: str = "127.0.0.1", port: int = 6667
+) -> ThreadingTCPServer:
+    """`port` 0 takes any free port, see `server.server_address`"""
+    handler = type(
+        "ConfiguredFakeTwitchIrcHandler",
+        (FakeTwitchIrcHandler,),
+        {"fake_irc_chat": FakeIrcChat(config)},
+    )
+    ThreadingTCPServer.allow_reuse_address = True
+    ThreadingTCPServer.daemon_threads = True
+    return ThreadingTCPServer((host, port), handler)
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Shared with the benchmark (`twitch_benchmark`)"""
+    parser.add_argument("--rate", type=float, default=FakeIrcConfig.rate)
+    parser.add_argument("--messages", type=int, default=FakeIrcConfig.messages)
+    parser.add_argument("--burst-size", type=int, default=FakeIrcConfig.burst_size)
+    parser.add_argument("--split-ratio", type=float, default=FakeIrcConfig.split_ratio)
+    parser.add_argument(
+        "--filter-word-ratio", type=float, default=FakeIrcConfig.filter_word_ratio
+    )
+    parser.add_argument("--cheer-ratio", type=float, default=FakeIrcConfig.cheer_ratio)
+    parser.add_argument(
+        "--duplicate-ratio", type=float, default=FakeIrcConfig.duplicate_ratio
+    )
+    parser.add_argument(
+        "--ping-interval-seconds",
+        type=float,
+        default=FakeIrcConfig.ping_interval_seconds,
+    )
+    parser.add_argument("--seed", type=int, default=FakeIrcConfig.seed)
+
+
+def config_from_arguments(args: argparse.Namespace) -> FakeIrcConfig:
+    return FakeIrcConfig(
+        rate=args.rate,
+        messages=args.messages,
+        burst_size=args.burst_size,
+        split_ratio=args.split_ratio,
+        filter_word_ratio=args.filter_word_ratio,
+        cheer_ratio=args.cheer_ratio,
+        duplicate_ratio=args.duplicate_ratio,
+        ping_interval_seconds=args.ping_interval_seconds,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in twitch irc chat")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_arguments(args)
+    server = create_server(config, args.host, args.port)
+    print(f"Fake twitch irc listening on {args.host}:{args.port} with {config}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stats: {server.RequestHandlerClass.fake_irc_chat.stats}")
+
+
+if __name__ == "__main__":
+    main()
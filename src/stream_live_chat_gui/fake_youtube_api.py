@@ -0,0 +1,310 @@
+"""
+Local stand-in for the parts of the YouTube Data API v3 used by `YoutubeLiveChat`, meant for load testing the poller.
+
+    python -m stream_live_chat_gui.fake_youtube_api --port 8765 --rate 500 --filter-word-ratio 0.2
+
+Then start the application with `YOUTUBE_API_ROOT_URL="http://127.0.0.1:8765"` in the .env file.
+
+Implemented endpoints:
+- GET /youtube/v3/videos                 (liveStreamingDetails.activeLiveChatId/actualStartTime)
+- GET /youtube/v3/liveBroadcasts         (one `live` broadcast)
+- GET /youtube/v3/liveChat/messages      (generated chat, nextPageToken and pollingIntervalMillis)
+- GET /channel/<channel_id>/live         (html holding the video id, as scraped by `get_video_id_no_api`)
+- GET /stats                             (served messages and how far behind the poller is)
+
+The page token holds the generation cursor (a timestamp): each call returns the messages "published" between the
+cursor and now, up to `maxResults`. When the poller doesn't keep up the cursor falls behind now, that backlog is
+reported by /stats.
+"""
+from stream_live_chat_gui import CHAT_FILTER_WORD
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import logging
+import random
+import time
+
+log = logging.getLogger(__name__)
+
+FAKE_VIDEO_ID = "fakeVideoId"
+FAKE_LIVE_CHAT_ID = "fakeLiveChatId"
+# Same as the real api: 500 by default, 2000 at most
+DEFAULT_MAX_RESULTS = 500
+MAX_RESULTS_PER_PAGE = 2000
+# Duplicate questions repeat one of the last questions sent, the generator memory stays flat at any rate
+DUPLICATE_WINDOW_QUESTIONS = 1000
+SUPER_CHAT_MESSAGE_TYPE = "superChatEvent"
+TEXT_MESSAGE_TYPE = "textMessageEvent"
+WORDS = (
+    "hola que tal como estas hoy el stream esta genial saludos desde mexico "
+    "pregunta sobre el video de ayer cuando sale el siguiente gracias por todo"
+).split()
+
+
+@dataclass
+class FakeChatConfig:
+    # Messages per second published in the chat (10 to 5000 are sensible values)
+    rate: float = 50.0
+    # Ratio of messages that carry the CHAT_FILTER_WORD (questions)
+    filter_word_ratio: float = 0.2
+    super_chat_ratio: float = 0.005
+    # Ratio of questions repeating an already sent question (duplicate floods)
+    duplicate_ratio: float = 0.1
+    polling_interval_millis: int = 2000
+    number_of_users: int = 500
+    filter_word: str = CHAT_FILTER_WORD
+    seed: int = 0
+
+
+@dataclass
+class FakeChatStats:
+    pages_served: int = 0
+    messages_served: int = 0
+    questions_served: int = 0
+    super_chats_served: int = 0
+    duplicates_served: int = 0
+    # Seconds between now and the cursor of the last page served (messages published but not fetched yet)
+    backlog_seconds: float = 0.0
+    max_backlog_seconds: float = 0.0
+    # Pages that hit maxResults, the poller can't keep up with the chat rate
+    full_pages: int = 0
+
+
+def to_rfc3339(timestamp: float) -> str:
+    # Always with microseconds, same as the real api
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.%fZ"
+    )
+
+
+class FakeLiveChat:
+    """Generates the chat messages, thread safe (the http server handles each request in its own thread)"""
+
+    def __init__(self, config: FakeChatConfig):
+        self.config = config
+        self.stats = FakeChatStats()
+        self.started_at = time.time()
+        self._random = random.Random(config.seed)
+        self._sent_questions: deque[str] = deque(maxlen=DUPLICATE_WINDOW_QUESTIONS)
+        self._message_number = 0
+        self._lock = Lock()
+
+    def _text(self) -> str:
+        return " ".join(self._random.choices(WORDS, k=self._random.randint(3, 12)))
+
+    def _question(self) -> str:
+        if self._sent_questions and self._random.random() < self.config.duplicate_ratio:
+            self.stats.duplicates_served += 1
+            return self._random.choice(self._sent_questions)
+        question = f"{self.config.filter_word} {self._text()} {self._message_number}?"
+        self._sent_questions.append(question)
+        return question
+
+    def _message(self, published_at: float) -> dict:
+        self._message_number += 1
+        user = f"viewer_{self._random.randrange(self.config.number_of_users):04d}"
+        roll = self._random.random()
+        snippet = {"publishedAt": to_rfc3339(published_at)}
+
+        if roll < self.config.super_chat_ratio:
+            self.stats.super_chats_served += 1
+            comment = self._question()
+            snippet.update(
+                type=SUPER_CHAT_MESSAGE_TYPE,
+                displayMessage=comment,
+                superChatDetails={
+                    "userComment": comment,
+                    "currency": "MXN",
+                    "amountDisplayString": "MX$100.00",
+                },
+            )
+        elif roll < self.config.super_chat_ratio + self.config.filter_word_ratio:
+            self.stats.questions_served += 1
+            snippet.update(type=TEXT_MESSAGE_TYPE, displayMessage=self._question())
+        else:
+            snippet.update(type=TEXT_MESSAGE_TYPE, displayMessage=self._text())
+
+        return {
+            "kind": "youtube#liveChatMessage",
+            "id": f"fakeMessage{self._message_number}",
+            "snippet": snippet,
+            "authorDetails": {"displayName": user},
+        }
+
+    def list_messages(self, page_token: str, max_results: int) -> dict:
+        with self._lock:
+            now = time.time()
+            cursor = float(page_token) if page_token else now
+            number_of_messages = min(int((now - cursor) * self.config.rate), max_results)
+            # When capped the cursor only advances up to the last message served
+            new_cursor = (
+                cursor + number_of_messages / self.config.rate
+                if number_of_messages == max_results
+                else now
+            )
+            if number_of_messages == max_results:
+                self.stats.full_pages += 1
+
+            step = (new_cursor - cursor) / number_of_messages if number_of_messages else 0
+            items = [
+                self._message(cursor + step * (index + 1))
+                for index in range(number_of_messages)
+            ]
+
+            self.stats.pages_served += 1
+            self.stats.messages_served += number_of_messages
+            self.stats.backlog_seconds = now - new_cursor
+            self.stats.max_backlog_seconds = max(
+                self.stats.max_backlog_seconds, self.stats.backlog_seconds
+            )
+
+        return {
+            "kind": "youtube#liveChatMessageListResponse",
+            "pollingIntervalMillis": self.config.polling_interval_millis,
+            "nextPageToken": repr(new_cursor),
+            "pageInfo": {"totalResults": len(items), "resultsPerPage": len(items)},
+            "items": items,
+        }
+
+    def video(self) -> dict:
+        return {
+            "kind": "youtube#videoListResponse",
+            "items": [
+                {
+                    "kind": "youtube#video",
+                    "id": FAKE_VIDEO_ID,
+                    "snippet": {"title": "Fake live stream"},
+                    "liveStreamingDetails": {
+                        "actualStartTime": to_rfc3339(self.started_at),
+                        "activeLiveChatId": FAKE_LIVE_CHAT_ID,
+                    },
+                }
+            ],
+        }
+
+    def live_broadcasts(self) -> dict:
+        return {
+            "kind": "youtube#liveBroadcastListResponse",
+            # A next page token is always given, `get_unlisted_video_live_chat_id` stops on empty ones
+            "nextPageToken": "fakeLastPage",
+            "pageInfo": {"totalResults": 1, "resultsPerPage": 1},
+            "items": [
+                {
+                    "kind": "youtube#liveBroadcast",
+                    "id": FAKE_VIDEO_ID,
+                    "snippet": {
+                        "liveChatId": FAKE_LIVE_CHAT_ID,
+                        "actualStartTime": to_rfc3339(self.started_at),
+                    },
+                    "status": {"lifeCycleStatus": "live"},
+                }
+            ],
+        }
+
+    def live_page_html(self) -> str:
+        return (
+            "<html><head></head><body><script>var ytInitialData = "
+            f'{{"videoId":"{FAKE_VIDEO_ID}","broadcastId":"1"}};</script></body></html>'
+        )
+
+
+class FakeYoutubeApiHandler(BaseHTTPRequestHandler):
+    # Set by `create_server`
+    fake_live_chat: FakeLiveChat = None
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: str, content_type: str) -> None:
+        encoded_body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        self._send(status, json.dumps(payload), "application/json; charset=UTF-8")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/youtube/v3/liveChat/messages":
+            max_results = min(
+                int(query.get("maxResults", DEFAULT_MAX_RESULTS)), MAX_RESULTS_PER_PAGE
+            )
+            self._send_json(
+                self.fake_live_chat.list_messages(query.get("pageToken"), max_results)
+            )
+        elif url.path == "/youtube/v3/videos":
+            self._send_json(self.fake_live_chat.video())
+        elif url.path == "/youtube/v3/liveBroadcasts":
+            self._send_json(self.fake_live_chat.live_broadcasts())
+        elif url.path.startswith("/channel/") and url.path.endswith("/live"):
+            self._send(200, self.fake_live_chat.live_page_html(), "text/html")
+        elif url.path == "/stats":
+            self._send_json(asdict(self.fake_live_chat.stats))
+        else:
+            self._send_json({"error": {"code": 404, "message": "Not found"}}, 404)
+
+    def log_message(self, format, *args):
+        log.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(
+    config: FakeChatConfig, host: str = "127.0.0.1", port: int = 8765
+) -> ThreadingHTTPServer:
+    handler = type(
+        "ConfiguredFakeYoutubeApiHandler",
+        (FakeYoutubeApiHandler,),
+        {"fake_live_chat": FakeLiveChat(config)},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in youtube data api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=FakeChatConfig.rate)
+    parser.add_argument(
+        "--filter-word-ratio", type=float, default=FakeChatConfig.filter_word_ratio
+    )
+    parser.add_argument(
+        "--super-chat-ratio", type=float, default=FakeChatConfig.super_chat_ratio
+    )
+    parser.add_argument(
+        "--duplicate-ratio", type=float, default=FakeChatConfig.duplicate_ratio
+    )
+    parser.add_argument(
+        "--polling-interval-millis",
+        type=int,
+        default=FakeChatConfig.polling_interval_millis,
+    )
+    parser.add_argument("--seed", type=int, default=FakeChatConfig.seed)
+    args = parser.parse_args()
+
+    config = FakeChatConfig(
+        rate=args.rate,
+        filter_word_ratio=args.filter_word_ratio,
+        super_chat_ratio=args.super_chat_ratio,
+        duplicate_ratio=args.duplicate_ratio,
+        polling_interval_millis=args.polling_interval_millis,
+        seed=args.seed,
+    )
+    server = create_server(config, args.host, args.port)
+    print(f"Fake youtube api listening on http://{args.host}:{args.port} with {config}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+GUI frame latency benchmark, the chat ingestion in threads of the GUI process vs in its own process
+(INGESTION_PROCESS).
+
+Usage (from the directory holding the .env file and the resources directory):
+    python -m stream_live_chat_gui.gui_latency_benchmark [--seconds 20] [--rate 2000] [--warmup-seconds 5]
+
+For each mode the application runs in a fresh interpreter against the local stand-in youtube api
+(`fake_youtube_api`, one per mode): Start Stream is clicked, questions are opened after the warmup and a precise
+timer ticks every frame (16ms) for `--seconds`. How late each tick fires is the time the event loop was busy with
+something else (the pollers holding the GIL, ORM flushes, table refreshes). Reported per mode: lateness percentiles,
+frames later than `--late-frame-ms` and questions stored. Its own database (gui_latency_benchmark_<mode>) and record
+files are used, inside resources.
+"""
+from stream_live_chat_gui.fake_youtube_api import FakeChatConfig, create_server
+from threading import Thread
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+log = logging.getLogger(__name__)
+
+MODES = ("thread", "process")
+FRAME_MS = 16
+DEFAULT_SECONDS = 20.0
+DEFAULT_WARMUP_SECONDS = 5.0
+DEFAULT_RATE = 2000.0
+DEFAULT_LATE_FRAME_MS = 50.0
+FRAME_LATENCY_MARKER = "FRAME_LATENCY="
+FRAME_LATENCY_SNIPPET = """
+import json
+import sys
+import time
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QApplication
+from stream_live_chat_gui import create_db
+from stream_live_chat_gui.reply_gui import AnswersUi
+from stream_live_chat_gui.controller import AppController
+from stream_live_chat_gui.ingestion_bus import stop_ingestion_buses
+
+create_db()
+gui = QApplication(sys.argv)
+win = AnswersUi()
+controller = AppController(model=None, view=win)
+controller.run()
+pending_questions_before = controller.db.count_all_pending_questions()
+frame_times = []
+frame_timer = QTimer()
+frame_timer.setTimerType(Qt.PreciseTimer)
+frame_timer.timeout.connect(lambda: frame_times.append(time.perf_counter()))
+
+
+def open_questions():
+    # Without any limit the chat sources never get the open questions signal, a limit out of reach instead
+    win.questions_limit_input.setText("100000")
+    win.youtube_open_questions.setChecked(True)
+    frame_timer.start({frame_ms})
+    QTimer.singleShot({seconds_ms}, finish)
+
+
+def finish():
+    frame_timer.stop()
+    # Stop Stream
+    win.start_stream_button.click()
+    stop_ingestion_buses()
+    pending_questions = controller.db.count_all_pending_questions()
+    result = {{
+        "intervals_ms": [
+            (later - earlier) * 1000
+            for earlier, later in zip(frame_times, frame_times[1:])
+        ],
+        "questions_stored": pending_questions - pending_questions_before,
+    }}
+    # sys.stdout is redirected to the GUI live chat feed
+    print(f"{marker}{{json.dumps(result)}}", file=sys.__stdout__)
+    # Otherwise the exit flush hits the deleted feed widget stream (exit code 120)
+    sys.stdout = sys.__stdout__
+    gui.quit()
+
+
+# Start Stream
+win.start_stream_button.click()
+QTimer.singleShot({warmup_ms}, open_questions)
+gui.exec()
+"""
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def measure_frame_latency(mode: str, args: argparse.Namespace) -> dict[str, float]:
+    server = create_server(FakeChatConfig(rate=args.rate), port=0)
+    host, port = server.server_address
+    Thread(target=server.serve_forever, name="FakeYoutubeApi", daemon=True).start()
+
+    environment = dict(os.environ)
+    # No display needed
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    environment.update(
+        {
+            "YOUTUBE_API_ROOT_URL": f"http://{host}:{port}",
+            "INGESTION_PROCESS": "yes" if mode == "process" else "no",
+            "DATABASE_NAME": f"gui_latency_benchmark_{mode}",
+            "BANNER_FILENAME": "gui_latency_benchmark_banner.txt",
+            "LIVE_CHAT_RECORD_FILENAME": f"gui_latency_benchmark_{mode}_live_chat",
+            "ACTUAL_START_TIMESTAMP_ADJUSTED_QUESTIONS_TIMESTAMP_FILENAME": (
+                f"gui_latency_benchmark_{mode}_timestamps"
+            ),
+            # Every run looks the (stand-in) live chat up from scratch
+            "LIVE_CHAT_RESUME_MAX_AGE_MINUTES": "0",
+            "YOUTUBE_ARMED_MODE": "no",
+            "YOUTUBE_CASSETTE_MODE": "",
+            "TWITCH_CHAT_ENABLED": "no",
+        }
+    )
+    snippet = FRAME_LATENCY_SNIPPET.format(
+        frame_ms=FRAME_MS,
+        seconds_ms=int(args.seconds * 1000),
+        warmup_ms=int(args.warmup_seconds * 1000),
+        marker=FRAME_LATENCY_MARKER,
+    )
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-c", snippet],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=environment,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(FRAME_LATENCY_MARKER):
+            result = json.loads(line[len(FRAME_LATENCY_MARKER) :])  # noqa: E203
+            break
+    else:
+        raise RuntimeError(f"No frame latency measurement found in: {completed.stdout}")
+
+    lateness_ms = [max(interval - FRAME_MS, 0.0) for interval in result["intervals_ms"]]
+    return {
+        "frames": len(lateness_ms),
+        "lateness_p50_ms": percentile(lateness_ms, 50),
+        "lateness_p95_ms": percentile(lateness_ms, 95),
+        "lateness_p99_ms": percentile(lateness_ms, 99),
+        "lateness_max_ms": max(lateness_ms, default=0.0),
+        "lateness_mean_ms": statistics.fmean(lateness_ms) if lateness_ms else 0.0,
+        "late_frames": sum(lateness >= args.late_frame_ms for lateness in lateness_ms),
+        "questions_stored": result["questions_stored"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--warmup-seconds", type=float, default=DEFAULT_WARMUP_SECONDS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    parser.add_argument("--late-frame-ms", type=float, default=DEFAULT_LATE_FRAME_MS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        results = measure_frame_latency(mode, args)
+        print(
+            f"Ingestion in {mode} mode ({args.rate:.0f} msgs/s, {args.seconds:.0f}s):"
+        )
+        for name, value in results.items():
+            print(
+                f"  {name}: {value:.2f}"
+                if isinstance(value, float)
+                else f"  {name}: {value}"
+            )
+
+
+if __name__ == "__main__":
+    main()
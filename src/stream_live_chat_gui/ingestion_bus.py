@@ -0,0 +1,336 @@
+"""
+Single writer of a session database. The chat sources (youtube pollers, twitch) and the GUI (manual questions,
+replies, deletes, trims) queue their writes here instead of writing through their own sessions, one thread owns the
+write connection and commits whatever is queued in a single transaction (group commit). Writers never wait for it.
+
+Two queues:
+- control writes (GUI): never dropped nor merged, applied first and in a transaction of their own.
+- question writes (chat sources): bounded. With INGESTION_BUS_MAX_QUEUED_WRITES writes waiting, a new one is merged
+  into the newest queued one (nothing lost, fewer transactions). With INGESTION_BUS_MAX_QUEUED_QUESTIONS questions
+  waiting, new regular questions are dropped (super chats never are) and counted.
+
+Questions queued count for the per user and session limits (`queued_questions_by`, `queued_regular_questions`),
+as if they were already stored. What the GUI reads after its own writes (i.e. the next question to reply) is read
+once they are committed (`control_writes_waiting`, commit callbacks), without waiting for them.
+"""
+from stream_live_chat_gui import (
+    StreamerThreadControl,
+    NewQuestion,
+    LiveChatStateTuple,
+    DATABASE_NAME,
+    INGESTION_BUS_MAX_QUEUED_WRITES,
+    INGESTION_BUS_MAX_QUEUED_QUESTIONS,
+    INGESTION_BUS_MAX_GROUP_WRITES,
+)
+from stream_live_chat_gui.db_interactions import DBInteractions, DBWrite, DBWriteKind
+from stream_live_chat_gui.dedup_cache import MessageDedupCache
+from collections import Counter, deque
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Any, Callable, Iterable, Optional
+import logging
+import time
+import weakref
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionBusStats:
+    submitted_writes: int = 0
+    committed_writes: int = 0
+    # Questions stored (or failed), what the ingestion process notifies the GUI about
+    committed_questions: int = 0
+    # Transactions, each one holds up to INGESTION_BUS_MAX_GROUP_WRITES writes
+    commits: int = 0
+    # Question writes merged into an already queued one (queue full)
+    coalesced_writes: int = 0
+    # Regular questions dropped (too many questions waiting)
+    dropped_questions: int = 0
+    failed_writes: int = 0
+    max_queued_writes: int = 0
+    last_commit_ms: float = 0.0
+    max_commit_ms: float = 0.0
+
+
+class IngestionBus(StreamerThreadControl):
+    def __init__(
+        self,
+        db_filename: str = None,
+        max_queued_writes: int = INGESTION_BUS_MAX_QUEUED_WRITES,
+        max_queued_questions: int = INGESTION_BUS_MAX_QUEUED_QUESTIONS,
+        max_group_writes: int = INGESTION_BUS_MAX_GROUP_WRITES,
+    ):
+        super().__init__(name="IngestionBusWriter")
+        self.daemon = True
+        self.db = DBInteractions(db_filename=db_filename)
+        self.max_queued_writes = max_queued_writes
+        self.max_queued_questions = max_queued_questions
+        self.max_group_writes = max_group_writes
+        self.stats = IngestionBusStats()
+        self._condition = Condition()
+        self._control_writes: deque[DBWrite] = deque()
+        self._question_writes: deque[DBWrite] = deque()
+        # Questions queued (not stored yet), per user and regular ones, for the limits checks
+        self._queued_questions_by_user: Counter = Counter()
+        self._queued_questions = 0
+        self._queued_regular_questions = 0
+        # Control writes submitted/committed so far, every commit takes all the control writes queued
+        self._control_writes_submitted = 0
+        self._control_writes_committed = 0
+        # Called from the writer thread with the control writes of every commit
+        self._control_commit_callbacks: list[Callable[[list[DBWrite]], None]] = []
+        # Duplicates filters of the chat sources, told about the questions deleted so they can be asked again
+        self._dedup_caches: weakref.WeakSet[MessageDedupCache] = weakref.WeakSet()
+        # Called from the writer thread with the hashes of the questions deleted (i.e. to tell another process)
+        self._questions_deleted_callbacks: list[Callable[[list[str]], None]] = []
+        self.db.on_questions_deleted = self._questions_deleted
+
+    def add_control_commit_callback(
+        self, callback: Callable[[list[DBWrite]], None]
+    ) -> None:
+        """`callback` runs in the writer thread, the GUI has to hand it over to its own thread (signal)"""
+        self._control_commit_callbacks.append(callback)
+
+    def add_dedup_cache(self, dedup_cache: MessageDedupCache) -> None:
+        self._dedup_caches.add(dedup_cache)
+
+    def add_questions_deleted_callback(
+        self, callback: Callable[[list[str]], None]
+    ) -> None:
+        self._questions_deleted_callbacks.append(callback)
+
+    def forget_questions(self, question_hashes: list[str]) -> None:
+        for dedup_cache in list(self._dedup_caches):
+            dedup_cache.forget_questions(question_hashes)
+
+    def _questions_deleted(self, question_hashes: list[str]) -> None:
+        if not question_hashes:
+            return
+        self.forget_questions(question_hashes)
+        for callback in self._questions_deleted_callbacks:
+            callback(question_hashes)
+
+    @property
+    def queued_writes(self) -> int:
+        with self._condition:
+            return len(self._control_writes) + len(self._question_writes)
+
+    @property
+    def queued_regular_questions(self) -> int:
+        with self._condition:
+            return self._queued_regular_questions
+
+    def queued_questions_by(self, user_name: str) -> int:
+        with self._condition:
+            return self._queued_questions_by_user[user_name]
+
+    def submit_questions(
+        self,
+        questions: Iterable[NewQuestion],
+        live_chat_state: Optional[LiveChatStateTuple] = None,
+    ) -> tuple[NewQuestion, ...]:
+        """Queues the questions of a chat source (and where its polling is), returns the ones dropped"""
+        questions = tuple(questions)
+        if not questions and live_chat_state is None:
+            return ()
+        live_chat_states = (
+            {live_chat_state.chat_key: live_chat_state} if live_chat_state else {}
+        )
+        with self._condition:
+            questions, dropped = self._drop_excess_questions(questions)
+            if len(self._question_writes) >= self.max_queued_writes:
+                newest = self._question_writes[-1]
+                self._question_writes[-1] = newest._replace(
+                    questions=newest.questions + questions,
+                    live_chat_states={**newest.live_chat_states, **live_chat_states},
+                )
+                self.stats.coalesced_writes += 1
+            else:
+                self._question_writes.append(
+                    DBWrite(
+                        DBWriteKind.ADD_QUESTIONS,
+                        questions=questions,
+                        live_chat_states=live_chat_states,
+                    )
+                )
+            self._questions_queued(questions, 1)
+            self._write_submitted()
+        return dropped
+
+    def _drop_excess_questions(
+        self, questions: tuple[NewQuestion, ...]
+    ) -> tuple[tuple[NewQuestion, ...], tuple[NewQuestion, ...]]:
+        """Returns the questions kept and the ones dropped"""
+        room = self.max_queued_questions - self._queued_questions
+        if len(questions) <= room:
+            return questions, ()
+        kept = []
+        dropped = []
+        for question in questions:
+            if question.is_super_chat or room > 0:
+                kept.append(question)
+                room -= 0 if question.is_super_chat else 1
+            else:
+                dropped.append(question)
+        if not dropped:
+            # Only super chats past the limit
+            return questions, ()
+        self.stats.dropped_questions += len(dropped)
+        log.warning(
+            f"{self._queued_questions} questions waiting to be stored, "
+            f"{len(dropped)} dropped "
+            f"(total dropped: {self.stats.dropped_questions})"
+        )
+        return tuple(kept), tuple(dropped)
+
+    def _questions_queued(self, questions: Iterable[NewQuestion], sign: int) -> None:
+        for question in questions:
+            self._queued_questions_by_user[question.user_name] += sign
+            self._queued_questions += sign
+            if not question.is_super_chat:
+                self._queued_regular_questions += sign
+
+    def submit(self, write: DBWrite) -> None:
+        """Queues a control (GUI) write, never dropped"""
+        with self._condition:
+            self._control_writes.append(write)
+            self._control_writes_submitted += 1
+            self._write_submitted()
+
+    @property
+    def control_writes_waiting(self) -> int:
+        """Control writes submitted but not committed yet, their commit callbacks are still to come"""
+        with self._condition:
+            return self._control_writes_submitted - self._control_writes_committed
+
+    def _write_submitted(self) -> None:
+        self.stats.submitted_writes += 1
+        self.stats.max_queued_writes = max(
+            self.stats.max_queued_writes,
+            len(self._control_writes) + len(self._question_writes),
+        )
+        self._condition.notify()
+
+    def add_question(
+        self, user_name: str, question_msg: str, is_super_chat: bool = False
+    ) -> None:
+        self.submit(
+            DBWrite(
+                DBWriteKind.ADD_QUESTIONS,
+                questions=(NewQuestion(user_name, question_msg, is_super_chat),),
+            )
+        )
+
+    def delete_question(self, question_id: int) -> None:
+        self.submit(DBWrite(DBWriteKind.DELETE_QUESTION, question_id=question_id))
+
+    def trim_pending_questions(self, number_of_questions: int) -> None:
+        self.submit(
+            DBWrite(
+                DBWriteKind.TRIM_PENDING_QUESTIONS,
+                number_of_questions=number_of_questions,
+            )
+        )
+
+    def mark_question_as_replied(self, question_id: int, replied: bool = True) -> None:
+        self.submit(
+            DBWrite(DBWriteKind.MARK_REPLIED, question_id=question_id, replied=replied)
+        )
+
+    def update_question(self, question_id: int, values: dict[str, Any]) -> None:
+        self.submit(
+            DBWrite(DBWriteKind.UPDATE_QUESTION, question_id=question_id, values=values)
+        )
+
+    def join(self, timeout: Optional[float] = None):
+        """Stops the writer once everything queued is stored"""
+        with self._condition:
+            self._stopevent.set()
+            self._condition.notify()
+        super().join(timeout)
+
+    def run(self):
+        """Main control loop"""
+        log.debug(f"{self.name} starts")
+        while True:
+            with self._condition:
+                while (
+                    not self._control_writes
+                    and not self._question_writes
+                    and not self._stopevent.is_set()
+                ):
+                    self._condition.wait()
+                if not self._control_writes and not self._question_writes:
+                    break
+                control_writes = list(self._control_writes)
+                self._control_writes.clear()
+                # Control writes go alone, the GUI reads that depend on them follow their commit callbacks
+                question_writes = (
+                    []
+                    if control_writes
+                    else [
+                        self._question_writes.popleft()
+                        for _ in range(
+                            min(len(self._question_writes), self.max_group_writes)
+                        )
+                    ]
+                )
+            self._commit(control_writes, question_writes)
+        log.debug(f"{self.name} ends, {self.stats}")
+
+    def _commit(
+        self, control_writes: list[DBWrite], question_writes: list[DBWrite]
+    ) -> None:
+        writes = control_writes + question_writes
+        commit_started = time.perf_counter()
+        failed_writes = self.db.apply_writes(writes)
+        commit_ms = (time.perf_counter() - commit_started) * 1000
+
+        with self._condition:
+            # Stored (or failed), the database counters have them already
+            for write in question_writes:
+                self._questions_queued(write.questions, -1)
+            # Before the commit callbacks run, they only see the control writes submitted since as waiting
+            self._control_writes_committed += len(control_writes)
+            self.stats.commits += 1
+            self.stats.committed_writes += len(writes)
+            self.stats.committed_questions += sum(
+                len(write.questions) for write in writes
+            )
+            self.stats.failed_writes += failed_writes
+            self.stats.last_commit_ms = commit_ms
+            self.stats.max_commit_ms = max(self.stats.max_commit_ms, commit_ms)
+
+        if control_writes:
+            for callback in self._control_commit_callbacks:
+                try:
+                    callback(control_writes)
+                except Exception:
+                    # The writer keeps going no matter what
+                    log.exception(f"Commit callback: {callback} failed")
+
+
+_ingestion_buses: dict[str, IngestionBus] = dict()
+_ingestion_buses_lock = Lock()
+
+
+def get_ingestion_bus(db_filename: str = None) -> IngestionBus:
+    """The writer of the database file, started on first use and shared by everything writing to it"""
+    with _ingestion_buses_lock:
+        db_name = db_filename or DATABASE_NAME
+        ingestion_bus = _ingestion_buses.get(db_name)
+        if ingestion_bus is None:
+            ingestion_bus = IngestionBus(db_filename=db_name)
+            ingestion_bus.start()
+            _ingestion_buses[db_name] = ingestion_bus
+        return ingestion_bus
+
+
+def stop_ingestion_buses(timeout: Optional[float] = None) -> None:
+    """On exit, whatever is still queued gets stored"""
+    with _ingestion_buses_lock:
+        ingestion_buses = list(_ingestion_buses.values())
+        _ingestion_buses.clear()
+    for ingestion_bus in ingestion_buses:
+        ingestion_bus.join(timeout)
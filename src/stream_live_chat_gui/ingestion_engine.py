@@ -0,0 +1,233 @@
+"""
+Asyncio engine polling several youtube live chats concurrently (i.e. co-streams: main channel plus guest channels).
+
+Each chat keeps its own page token and poll scheduler (poll interval). The api calls of all the chats run at the same
+time in worker threads (`asyncio.to_thread`), while the fetched pages are processed one at a time in the event loop
+thread, which makes it the only writer into the database shared by the chats.
+A failed api call doesn't stop the chat, it's retried (see `api_errors.ApiRetryPolicy`) with the same page token.
+A chat stops once its broadcast ends (offlineAt, liveChatEnded, no activeLiveChatId), the main one stops the engine.
+"""
+from stream_live_chat_gui.api_errors import (
+    ApiErrorKind,
+    ApiRetryPolicy,
+    classify_api_error,
+)
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from queue import Empty, Queue
+from threading import Event, Lock
+from typing import Optional, TYPE_CHECKING
+import asyncio
+import logging
+import time
+
+if TYPE_CHECKING:
+    from stream_live_chat_gui.youtube_chat import YoutubeLiveChat
+
+log = logging.getLogger(__name__)
+
+MAIN_CHAT_NAME = "main"
+# How often the stop event and the open/close questions queue are checked
+CONTROL_CHECK_SECONDS = 0.2
+STATS_LOG_INTERVAL_SECONDS = 60.0
+# A chat without messages for this long gets its broadcast checked (videos.list, 1 unit), i.e. forgotten reruns
+BROADCAST_IDLE_CHECK_SECONDS = 600.0
+
+
+@dataclass
+class ChatIngestionStats:
+    name: str
+    live_chat_id: Optional[str]
+    pages: int = 0
+    messages: int = 0
+    # Seconds between the newest message of the last page being published and it being processed
+    newest_message_lag: Optional[float] = None
+    last_fetch_seconds: Optional[float] = None
+    last_processing_seconds: Optional[float] = None
+    last_wait: Optional[float] = None
+    # Failed api calls in a row (0 when the last one succeeded), the last error and how long the last recovery took
+    consecutive_errors: int = 0
+    last_error: Optional[str] = None
+    last_recovery_seconds: Optional[float] = None
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def messages_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.messages / elapsed if elapsed > 0 else 0.0
+
+
+class LiveChatIngestionEngine:
+    def __init__(
+        self, chats: dict[str, "YoutubeLiveChat"], questions_control_queue: Queue
+    ):
+        if not chats:
+            raise ValueError("At least one live chat is needed")
+        self.chats = chats
+        self.questions_control_queue = questions_control_queue
+        self.open_questions_start_time: Optional[datetime] = None
+        self.session_questions_limit = 0
+        self._stats = {
+            name: ChatIngestionStats(name, chat.live_chat_id)
+            for name, chat in chats.items()
+        }
+        # The stats are updated in the engine thread and read from the GUI thread
+        self._stats_lock = Lock()
+        self._stopped: Optional[asyncio.Event] = None
+
+    @property
+    def main_chat(self) -> "YoutubeLiveChat":
+        return next(iter(self.chats.values()))
+
+    @property
+    def ended_reason(self) -> Optional[str]:
+        """Set when the engine stopped by itself because the main broadcast ended"""
+        return self.main_chat.ended_reason
+
+    def stats_snapshot(self) -> list[ChatIngestionStats]:
+        with self._stats_lock:
+            return [replace(stats) for stats in self._stats.values()]
+
+    def _read_questions_control(self) -> None:
+        try:
+            open_questions = self.questions_control_queue.get_nowait()
+        except Empty:
+            return
+
+        if open_questions:
+            # Same clock for every chat, the main chat one (a replay has its own clock)
+            self.open_questions_start_time = self.main_chat.now()
+            log.debug(
+                f"Setting open_questions_start_time to: {self.open_questions_start_time}"
+            )
+            # Number of questions to be fetch per session
+            self.session_questions_limit = open_questions[-1]
+        else:
+            self.open_questions_start_time = None
+        log.debug(f"Open questions queue value: {open_questions}")
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleeps up to `seconds`, returns early when the engine stops"""
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _watch_controls(self, stop_event: Event) -> None:
+        last_stats_log = time.monotonic()
+        while not stop_event.is_set() and not self._stopped.is_set():
+            self._read_questions_control()
+            if time.monotonic() - last_stats_log > STATS_LOG_INTERVAL_SECONDS:
+                last_stats_log = time.monotonic()
+                self.log_stats()
+            await asyncio.sleep(CONTROL_CHECK_SECONDS)
+        self._stopped.set()
+
+    def _chat_ended(self, name: str, chat: "YoutubeLiveChat") -> None:
+        log.warning(f"Chat: {name} ended, {chat.ended_reason}, no more polling")
+        if chat is self.main_chat:
+            self._stopped.set()
+
+    async def _broadcast_is_live(self, chat: "YoutubeLiveChat") -> bool:
+        try:
+            return await asyncio.to_thread(chat.broadcast_is_live)
+        except Exception as error:
+            # Only a hint, the polling goes on
+            log.warning(f"Unable to check the broadcast status: {error!r}")
+            return True
+
+    async def _poll_chat(self, name: str, chat: "YoutubeLiveChat") -> None:
+        retry_policy = ApiRetryPolicy()
+        refresh_credentials = False
+        idle_since = time.monotonic()
+        while not self._stopped.is_set():
+            fetch_started = time.perf_counter()
+            try:
+                if refresh_credentials:
+                    await asyncio.to_thread(chat.refresh_credentials)
+                    refresh_credentials = False
+                response = await asyncio.to_thread(chat.fetch_live_chat_page)
+            except Exception as error:
+                if classify_api_error(error) is ApiErrorKind.CHAT_ENDED:
+                    chat.ended_reason = f"live chat api error: {error}"
+                    self._chat_ended(name, chat)
+                    return
+                # Raises (stopping the engine) if the error can't be retried or the retry budget is spent
+                delay = retry_policy.next_delay(error)
+                refresh_credentials = (
+                    retry_policy.last_error_kind is ApiErrorKind.AUTH_EXPIRED
+                )
+                with self._stats_lock:
+                    stats = self._stats[name]
+                    stats.consecutive_errors = retry_policy.consecutive_errors
+                    stats.last_error = repr(error)
+                await self._sleep(delay)
+                continue
+            if self._stopped.is_set():
+                break
+            time_to_recovery = retry_policy.recovered()
+            processing_started = time.perf_counter()
+            wait = chat.process_live_chat_page(
+                response, self.open_questions_start_time, self.session_questions_limit
+            )
+            processing_finished = time.perf_counter()
+
+            decision = chat.poll_scheduler.latest_decision
+            with self._stats_lock:
+                stats = self._stats[name]
+                stats.pages += 1
+                stats.messages += decision.messages_in_page
+                if decision.newest_message_lag is not None:
+                    stats.newest_message_lag = decision.newest_message_lag
+                stats.last_fetch_seconds = processing_started - fetch_started
+                stats.last_processing_seconds = processing_finished - processing_started
+                stats.last_wait = wait
+                if time_to_recovery is not None:
+                    stats.consecutive_errors = 0
+                    stats.last_recovery_seconds = time_to_recovery
+
+            if decision.messages_in_page:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > BROADCAST_IDLE_CHECK_SECONDS:
+                idle_since = time.monotonic()
+                await self._broadcast_is_live(chat)
+            if chat.ended_reason:
+                self._chat_ended(name, chat)
+                return
+            await self._sleep(chat.real_wait(wait))
+
+    async def run(self, stop_event: Event) -> None:
+        """
+        Polls every chat until `stop_event` is set or the main broadcast ends, an error in any chat (not recovered
+        by retrying) stops the whole engine
+        """
+        self._stopped = asyncio.Event()
+        tasks = [
+            asyncio.create_task(self._poll_chat(name, chat), name=f"chat-{name}")
+            for name, chat in self.chats.items()
+        ]
+        tasks.append(asyncio.create_task(self._watch_controls(stop_event)))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            self._stopped.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.log_stats()
+
+        for task in done:
+            if not task.cancelled() and task.exception():
+                raise task.exception()
+
+    def log_stats(self) -> None:
+        for stats in self.stats_snapshot():
+            log.info(
+                f"Chat: {stats.name}, pages: {stats.pages}, messages: {stats.messages} "
+                f"({stats.messages_per_second:.1f}/s), newest message lag: {stats.newest_message_lag}s, "
+                f"last fetch: {stats.last_fetch_seconds}s, last processing: {stats.last_processing_seconds}s, "
+                f"consecutive errors: {stats.consecutive_errors}, last recovery: {stats.last_recovery_seconds}s"
+            )
+            self.chats[stats.name].classifier.log_stage_timings()
+        # The extra chats share the main chat dedup cache
+        log.info(f"Dedup cache: {self.main_chat.dedup_cache.stats()}")
@@ -0,0 +1,415 @@
+"""
+Chat ingestion in its own process (INGESTION_PROCESS="yes"). The youtube pollers, the twitch reader and their
+database writer (`ingestion_bus`) run in a child process, so JSON decoding, message classification and ORM flushes
+during chat floods don't compete (GIL) with the Qt event loop.
+
+The GUI (`IngestionProcessControl`) and the child (`IngestionWorker`) talk over a `multiprocessing.Pipe`, every
+message is an (`IngestionMessage`, payload) tuple:
+- GUI -> child: QUESTIONS_CONTROL (open/close questions value, same as the questions control queues),
+  FORGET_QUESTIONS (hashes of the questions the GUI deleted, they can be asked again) and STOP.
+- child -> GUI: STARTED, START_FAILED, ACTUAL_START_TIME, CHAT_TEXT (the chat feed, printed by the live chat record
+  writer), NEW_QUESTIONS (how many questions were stored since the last notification), SNAPSHOT
+  (`IngestionSnapshot`, rates/quota/drops for the GUI labels) and STOPPED.
+
+Both processes write to the same database file (WAL, see `set_sqlite_pragmas`): the child stores the chat questions,
+the GUI its own writes (manual questions, replies, deletes, trims). Each side reloads its question counters (pending
+and per user, for LIMITED_USERS) from the database to follow the writes of the other one.
+"""
+from stream_live_chat_gui import get_log_file_name, DATABASE_NAME
+from stream_live_chat_gui.db_interactions import DBInteractions
+from stream_live_chat_gui.ingestion_bus import (
+    IngestionBus,
+    get_ingestion_bus,
+    stop_ingestion_buses,
+)
+from stream_live_chat_gui.record_files import LiveChatRecordWriter
+from enum import Enum
+from multiprocessing.connection import Connection
+from queue import Queue, SimpleQueue
+from threading import Lock
+from typing import Any, NamedTuple, Optional
+import io
+import logging
+import multiprocessing
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+# How long the child waits for a GUI message before forwarding the chat feed and the new questions
+INGESTION_LOOP_SECONDS = 0.05
+INGESTION_SNAPSHOT_SECONDS = 1.0
+# Same period as the GUI table refresh
+QUESTION_COUNTERS_RELOAD_SECONDS = 2.5
+# The GUI never reads more than this many messages at once, the event loop stays responsive
+MAX_MESSAGES_PER_RECEIVE = 100
+# The youtube poller can be in the middle of an api call when asked to stop
+INGESTION_PROCESS_STOP_TIMEOUT_SECONDS = 30.0
+
+
+class IngestionMessage(Enum):
+    QUESTIONS_CONTROL = "questions_control"
+    FORGET_QUESTIONS = "forget_questions"
+    STOP = "stop"
+    STARTED = "started"
+    START_FAILED = "start_failed"
+    ACTUAL_START_TIME = "actual_start_time"
+    CHAT_TEXT = "chat_text"
+    NEW_QUESTIONS = "new_questions"
+    SNAPSHOT = "snapshot"
+    STOPPED = "stopped"
+
+
+class IngestionSnapshot(NamedTuple):
+    """What the GUI shows about the ingestion, taken from the threads in either mode"""
+
+    youtube_alive: bool
+    # Why the youtube poller stopped by itself (the broadcast ended), None if it didn't
+    broadcast_ended: Optional[str]
+    youtube_messages_per_second: float
+    # None without a twitch reader
+    twitch_messages_per_second: Optional[float]
+    # None without a quota ledger
+    quota_text: Optional[str]
+    # Consecutive errors of the youtube poller retrying a failed call
+    retrying: int
+    dropped_questions: int
+
+
+def take_ingestion_snapshot(
+    youtube_thread, twitch_thread, ingestion_bus: IngestionBus
+) -> IngestionSnapshot:
+    """`youtube_thread` is a `YoutubeStreamThreadControl`, `twitch_thread` a `TwitchStreamThreadControl` (or None)"""
+    ingestion_stats = youtube_thread.ingestion_stats
+    quota_ledger = youtube_thread.quota_ledger
+    return IngestionSnapshot(
+        youtube_alive=youtube_thread.is_alive(),
+        broadcast_ended=youtube_thread.broadcast_ended,
+        youtube_messages_per_second=sum(
+            stats.messages_per_second for stats in ingestion_stats
+        ),
+        twitch_messages_per_second=twitch_thread.messages_per_second
+        if twitch_thread is not None
+        else None,
+        quota_text=quota_ledger.display_text() if quota_ledger else None,
+        retrying=max(
+            (stats.consecutive_errors for stats in ingestion_stats), default=0
+        ),
+        dropped_questions=ingestion_bus.stats.dropped_questions,
+    )
+
+
+class ChatFeedForwarder(io.TextIOBase):
+    """Takes the place of std.out in the child, what's printed (the chat feed) is sent to the GUI feed"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = Lock()
+        self._chunks: list[str] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self._chunks.append(text)
+        return len(text)
+
+    def take(self) -> str:
+        with self._lock:
+            text = "".join(self._chunks)
+            self._chunks.clear()
+        return text
+
+
+class IngestionWorker:
+    """Runs in the child process, owns the chat sources, the live chat record and the database writer"""
+
+    def __init__(
+        self,
+        connection: Connection,
+        db_filename: str,
+        live_chat_file: str,
+        twitch_enabled: bool,
+    ):
+        self.connection = connection
+        self.db_filename = db_filename
+        self.live_chat_file = live_chat_file
+        self.twitch_enabled = twitch_enabled
+        self.chat_feed = ChatFeedForwarder()
+        # Messages from other threads (i.e. the actual start time), a Connection isn't meant to be shared
+        self.outbox: SimpleQueue = SimpleQueue()
+        self.youtube_questions_control_queue = Queue(maxsize=1)
+        self.twitch_questions_control_queue = Queue(maxsize=1)
+        self.youtube_thread = None
+        self.twitch_thread = None
+        self.live_chat_record: Optional[LiveChatRecordWriter] = None
+        self.db = DBInteractions(db_filename=db_filename)
+        self.ingestion_bus = get_ingestion_bus(db_filename)
+        self.questions_notified = 0
+
+    def send(self, message: IngestionMessage, payload: Any = None) -> bool:
+        """Returns False once the GUI went away"""
+        try:
+            self.connection.send((message, payload))
+        except OSError:
+            return False
+        return True
+
+    def start(self) -> bool:
+        self.live_chat_record = LiveChatRecordWriter(self.live_chat_file)
+        started = time.perf_counter()
+        try:
+            # Lazy import, this module is imported by the GUI process as well
+            from stream_live_chat_gui.youtube_chat import YoutubeStreamThreadControl
+
+            self.youtube_thread = YoutubeStreamThreadControl(
+                self.youtube_questions_control_queue,
+                self.live_chat_record,
+                self.db_filename,
+            )
+        except Exception as error:
+            log.exception("Unable to start the youtube live chat ingestion")
+            self.live_chat_record.close()
+            self.send(IngestionMessage.START_FAILED, f"{type(error).__name__}: {error}")
+            return False
+
+        self.youtube_thread.actual_start_time_future.add_done_callback(
+            lambda future: self.outbox.put(
+                (IngestionMessage.ACTUAL_START_TIME, future.result())
+            )
+        )
+        self.youtube_thread.daemon = True
+        self.youtube_thread.start()
+        log.info(
+            f"Live chat ingestion process started {time.perf_counter() - started:.2f}s after Start Stream"
+        )
+        if self.twitch_enabled:
+            self.start_twitch()
+        return self.send(IngestionMessage.STARTED)
+
+    def start_twitch(self) -> None:
+        """Twitch is an extra source, youtube keeps going if it can't be reached"""
+        from stream_live_chat_gui.twitch_chat import TwitchStreamThreadControl
+
+        try:
+            self.twitch_thread = TwitchStreamThreadControl(
+                self.twitch_questions_control_queue,
+                self.live_chat_record,
+                self.db_filename,
+            )
+        except OSError:
+            log.exception("Unable to connect to the twitch chat, only youtube is read")
+            return
+        self.twitch_thread.daemon = True
+        self.twitch_thread.start()
+
+    def signal_questions_control(self, open_questions) -> None:
+        """Open (with the session limit)/close questions value, sent to every chat source running"""
+        if self.youtube_thread.is_alive():
+            self.youtube_questions_control_queue.put(open_questions)
+        if self.twitch_thread is not None and self.twitch_thread.is_alive():
+            self.twitch_questions_control_queue.put(open_questions)
+            # It only wakes up on new messages otherwise
+            self.twitch_thread.wake_up()
+
+    def forward(self) -> bool:
+        """Sends the chat feed, the new questions and whatever the other threads queued, False once the GUI left"""
+        sent = True
+        while not self.outbox.empty():
+            sent = sent and self.send(*self.outbox.get())
+        chat_text = self.chat_feed.take()
+        if chat_text:
+            sent = sent and self.send(IngestionMessage.CHAT_TEXT, chat_text)
+        committed_questions = self.ingestion_bus.stats.committed_questions
+        if committed_questions != self.questions_notified:
+            new_questions = committed_questions - self.questions_notified
+            self.questions_notified = committed_questions
+            sent = sent and self.send(IngestionMessage.NEW_QUESTIONS, new_questions)
+        return sent
+
+    def run(self) -> None:
+        if not self.start():
+            return
+        last_snapshot = last_counters_reload = time.monotonic()
+        while True:
+            if self.connection.poll(INGESTION_LOOP_SECONDS):
+                try:
+                    message, payload = self.connection.recv()
+                except EOFError:
+                    log.warning("The GUI went away, stopping the ingestion")
+                    break
+                if message is IngestionMessage.STOP:
+                    break
+                if message is IngestionMessage.QUESTIONS_CONTROL:
+                    self.signal_questions_control(payload)
+                elif message is IngestionMessage.FORGET_QUESTIONS:
+                    self.ingestion_bus.forget_questions(payload)
+
+            now = time.monotonic()
+            # The GUI replies, deletes and trims questions, the session and limited users checks follow them
+            if now - last_counters_reload >= QUESTION_COUNTERS_RELOAD_SECONDS:
+                last_counters_reload = now
+                self.db.reload_question_counters()
+            sent = self.forward()
+            if now - last_snapshot >= INGESTION_SNAPSHOT_SECONDS:
+                last_snapshot = now
+                sent = sent and self.send(
+                    IngestionMessage.SNAPSHOT,
+                    take_ingestion_snapshot(
+                        self.youtube_thread, self.twitch_thread, self.ingestion_bus
+                    ),
+                )
+            if not sent:
+                log.warning("The GUI went away, stopping the ingestion")
+                break
+        self.stop()
+
+    def stop(self) -> None:
+        if self.youtube_thread.is_alive():
+            self.youtube_thread.join()
+        if self.twitch_thread is not None:
+            self.twitch_thread.join()
+        # Once the threads are done, whatever is pending in the live chat record gets written
+        self.live_chat_record.close()
+        # And every question queued gets stored
+        stop_ingestion_buses()
+        self.forward()
+        self.send(
+            IngestionMessage.STOPPED,
+            take_ingestion_snapshot(
+                self.youtube_thread, self.twitch_thread, self.ingestion_bus
+            ),
+        )
+        log.debug(f"Ingestion process stopped, {self.ingestion_bus.stats}")
+
+
+def run_ingestion_process(
+    connection: Connection,
+    db_filename: str,
+    live_chat_file: str,
+    twitch_enabled: bool,
+) -> None:
+    """Entry point of the child process"""
+    logging.basicConfig(
+        filename=get_log_file_name(),
+        filemode="a",
+        format="%(asctime)s,%(msecs)d %(processName)s %(name)s %(levelname)s %(message)s",
+        datefmt="%H:%M:%S",
+        encoding="utf-8",
+        level=logging.DEBUG,
+        force=True,
+    )
+    worker = IngestionWorker(connection, db_filename, live_chat_file, twitch_enabled)
+    # The live chat record writer prints every page, that's the GUI chat feed
+    sys.stdout = worker.chat_feed
+    try:
+        worker.run()
+    except Exception:
+        log.exception("Ingestion process failed")
+        raise
+    finally:
+        connection.close()
+
+
+class IngestionProcessControl:
+    """GUI side of the ingestion process, nothing here blocks but `join`"""
+
+    def __init__(
+        self,
+        live_chat_file: str,
+        db_filename: str = DATABASE_NAME,
+        twitch_enabled: bool = False,
+    ):
+        # Spawn, a fork of the GUI process would carry the Qt state and the database connections
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=run_ingestion_process,
+            args=(child_connection, db_filename, live_chat_file, twitch_enabled),
+            name="IngestionProcess",
+            daemon=True,
+        )
+        self._child_connection = child_connection
+        # Deleted questions are sent from the database writer thread
+        self._send_lock = Lock()
+        self.snapshot: Optional[IngestionSnapshot] = None
+        self.start_failed: Optional[str] = None
+        self.stopped = False
+
+    def start(self) -> None:
+        self.process.start()
+        # The child holds its own copy now, EOF is seen once it exits
+        self._child_connection.close()
+
+    def is_alive(self) -> bool:
+        """Same meaning as the youtube poller thread `is_alive`, starting up counts as alive"""
+        return (
+            self.process.is_alive()
+            and self.start_failed is None
+            and (self.snapshot is None or self.snapshot.youtube_alive)
+        )
+
+    @property
+    def broadcast_ended(self) -> Optional[str]:
+        return self.snapshot.broadcast_ended if self.snapshot else None
+
+    def signal_questions_control(self, open_questions) -> None:
+        self._send(IngestionMessage.QUESTIONS_CONTROL, open_questions)
+
+    def forget_questions(self, question_hashes: list[str]) -> None:
+        self._send(IngestionMessage.FORGET_QUESTIONS, question_hashes)
+
+    def _send(self, message: IngestionMessage, payload: Any = None) -> None:
+        try:
+            with self._send_lock:
+                self.connection.send((message, payload))
+        except OSError:
+            log.warning(f"Ingestion process gone, message: {message} not sent")
+
+    def receive(
+        self, max_messages: int = MAX_MESSAGES_PER_RECEIVE
+    ) -> list[tuple[IngestionMessage, Any]]:
+        """The messages already waiting, the snapshot and start failure are kept here"""
+        messages = []
+        try:
+            while len(messages) < max_messages and self.connection.poll():
+                messages.append(self._keep(self.connection.recv()))
+        except (EOFError, OSError):
+            self.stopped = True
+        return messages
+
+    def _keep(
+        self, message: tuple[IngestionMessage, Any]
+    ) -> tuple[IngestionMessage, Any]:
+        kind, payload = message
+        if kind in (IngestionMessage.SNAPSHOT, IngestionMessage.STOPPED):
+            self.snapshot = payload
+        if kind is IngestionMessage.STOPPED:
+            self.stopped = True
+        elif kind is IngestionMessage.START_FAILED:
+            self.start_failed = payload
+        return message
+
+    def join(
+        self, timeout: float = INGESTION_PROCESS_STOP_TIMEOUT_SECONDS
+    ) -> list[tuple[IngestionMessage, Any]]:
+        """Stops the ingestion, returns the messages sent until then (the last chat feed, new questions)"""
+        self._send(IngestionMessage.STOP)
+        messages = []
+        deadline = time.monotonic() + timeout
+        while not self.stopped and time.monotonic() < deadline:
+            try:
+                if self.connection.poll(min(0.1, max(deadline - time.monotonic(), 0))):
+                    messages.append(self._keep(self.connection.recv()))
+                elif not self.process.is_alive():
+                    break
+            except (EOFError, OSError):
+                break
+        self.process.join(max(deadline - time.monotonic(), 0.1))
+        if self.process.is_alive():
+            log.error(f"Ingestion process didn't stop after {timeout}s, terminating it")
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+        return messages
@@ -0,0 +1,91 @@
+"""
+Live chat id and actualStartTime of the own channel broadcasts already looked up, per broadcast id, persisted (json)
+in the resources directory. A restart of the app during the same broadcast takes them from here, no api call at all.
+"""
+from stream_live_chat_gui import get_resource
+from threading import Lock
+from typing import NamedTuple, Optional
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+LIVE_BROADCAST_CACHE_FILENAME = "live_broadcast_cache.json"
+# Broadcasts looked up longer ago than this are not reused (nor kept in the file)
+LIVE_BROADCAST_CACHE_MAX_AGE_SECONDS = 12 * 60 * 60
+
+
+class CachedBroadcast(NamedTuple):
+    broadcast_id: str
+    live_chat_id: str
+    # As given by the api (RFC 3339)
+    actual_start_time: str
+    cached_at: float
+
+
+class LiveBroadcastCache:
+    def __init__(
+        self,
+        file_path: str = None,
+        max_age_seconds: float = LIVE_BROADCAST_CACHE_MAX_AGE_SECONDS,
+    ):
+        self.file_path = file_path or get_resource(LIVE_BROADCAST_CACHE_FILENAME)
+        self.max_age_seconds = max_age_seconds
+        self._lock = Lock()
+
+    def _load(self) -> dict[str, CachedBroadcast]:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+            return {
+                broadcast_id: CachedBroadcast(broadcast_id, **entry)
+                for broadcast_id, entry in entries.items()
+                if time.time() - entry["cached_at"] <= self.max_age_seconds
+            }
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning(f"Unreadable live broadcast cache: {self.file_path}, {e}")
+            return {}
+
+    def _save(self, broadcasts: dict[str, CachedBroadcast]) -> None:
+        entries = {
+            broadcast.broadcast_id: {
+                "live_chat_id": broadcast.live_chat_id,
+                "actual_start_time": broadcast.actual_start_time,
+                "cached_at": broadcast.cached_at,
+            }
+            for broadcast in broadcasts.values()
+        }
+        temporary_path = f"{self.file_path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as cache_file:
+                json.dump(entries, cache_file, indent=2)
+            os.replace(temporary_path, self.file_path)
+        except OSError as e:
+            log.warning(f"Unable to save the live broadcast cache: {self.file_path}, {e}")
+
+    def latest(self) -> Optional[CachedBroadcast]:
+        """The broadcast looked up most recently, if it's not too old"""
+        with self._lock:
+            broadcasts = self._load()
+        if not broadcasts:
+            return None
+        return max(broadcasts.values(), key=lambda broadcast: broadcast.cached_at)
+
+    def put(self, broadcast_id: str, live_chat_id: str, actual_start_time: str) -> None:
+        with self._lock:
+            broadcasts = self._load()
+            broadcasts[broadcast_id] = CachedBroadcast(
+                broadcast_id, live_chat_id, actual_start_time, time.time()
+            )
+            self._save(broadcasts)
+
+    def discard(self, broadcast_id: str) -> None:
+        with self._lock:
+            broadcasts = self._load()
+            if broadcasts.pop(broadcast_id, None) is not None:
+                log.debug(f"Broadcast: {broadcast_id} discarded from the cache")
+                self._save(broadcasts)
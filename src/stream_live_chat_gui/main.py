@@ -11,16 +11,20 @@ logging.basicConfig(
     level=logging.DEBUG,
 )
 
+import multiprocessing
 import sys
 from PyQt5.QtWidgets import QApplication
 from stream_live_chat_gui.reply_gui import AnswersUi
 from stream_live_chat_gui.controller import AppController
+from stream_live_chat_gui.ingestion_bus import stop_ingestion_buses
 from stream_live_chat_gui.exception_hook import QtExceptHook
 
 log = logging.getLogger(__name__)
 
 
 def main():
+    # The chat ingestion can run in a child process (INGESTION_PROCESS), needed by frozen executables
+    multiprocessing.freeze_support()
     log.debug(f"Log file name: {get_log_file_name()}")
     create_db()
 
@@ -42,7 +46,10 @@ def main():
     controller = AppController(model=model, view=win)
     controller.run()
 
-    sys.exit(gui.exec())
+    exit_code = gui.exec()
+    # Whatever is still queued to the database writer gets stored before leaving
+    stop_ingestion_buses()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
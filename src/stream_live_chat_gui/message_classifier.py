@@ -0,0 +1,144 @@
+"""
+Classification of the live chat messages (youtube and twitch): stale, chat line, question or super chat.
+
+A single regex pass (`subn`) both detects the CHAT_FILTER_WORD and cleans it out of the question. Pages are ordered
+by publishedAt, so the stale messages (published before the stream start) are skipped as a prefix found with a
+bisect. The time spent per stage is accumulated in nanoseconds, see `stage_timings`.
+"""
+from stream_live_chat_gui import CHAT_FILTER_WORD, LIMITED_USERS
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import NamedTuple, Optional, Sequence
+import logging
+import re
+import time
+
+log = logging.getLogger(__name__)
+
+# "YYYY-MM-DDTHH:MM:SS", fractions of second and utc offset (always Z for the youtube api) are dropped
+PUBLISHED_AT_LENGTH = 19
+NO_COMMENT = "NO COMMENT"
+# Stage names of the timing counters
+STALE_PREFIX_STAGE = "stale_prefix"
+TIMESTAMP_STAGE = "timestamp"
+CLASSIFY_STAGE = "classify"
+# Any of the LIMITED_USERS being part of a user name (case insensitive) makes it a limited user
+PATTERN_FOR_LIMITED_USERS = re.compile(
+    "|".join(re.escape(limited_user) for limited_user in LIMITED_USERS), re.IGNORECASE
+)
+LIMITED_USER_CACHE_SIZE = 4096
+
+
+class MessageKind(Enum):
+    CHAT_LINE = "chat_line"
+    QUESTION = "question"
+    SUPER_CHAT = "super_chat"
+
+
+class ClassifiedMessage(NamedTuple):
+    kind: MessageKind
+    user: str
+    # The message as is for chat lines, cleaned (without the filter word) for questions and super chats
+    text: str
+
+
+class StageTiming(NamedTuple):
+    calls: int
+    total_ns: int
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.calls if self.calls else 0.0
+
+
+@lru_cache(maxsize=LIMITED_USER_CACHE_SIZE)
+def is_limited_user(user: str) -> bool:
+    """The pattern is matched once per user name, chat users repeat a lot"""
+    return PATTERN_FOR_LIMITED_USERS.search(user) is not None
+
+
+def parse_published_at(published_at: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(published_at[:PUBLISHED_AT_LENGTH])
+    except ValueError:
+        return None
+
+
+class _PublishedAtView(Sequence):
+    """Parses lazily only the timestamps the bisect looks at"""
+
+    def __init__(self, published_at_values: Sequence[str]):
+        self._values = published_at_values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, index: int) -> datetime:
+        # Unreadable timestamps are not considered stale, they are dropped later on
+        return parse_published_at(self._values[index]) or datetime.max
+
+
+class MessageClassifier:
+    def __init__(self, filter_word: str = CHAT_FILTER_WORD):
+        self.pattern_for_filter_word = re.compile(
+            rf"\s?{filter_word}\s?", re.IGNORECASE
+        )
+        self._stage_calls: Counter = Counter()
+        self._stage_ns: Counter = Counter()
+
+    def record_stage(self, stage: str, elapsed_ns: int, calls: int = 1) -> None:
+        """Also used by the callers to time their own stages (record file, database...)"""
+        self._stage_calls[stage] += calls
+        self._stage_ns[stage] += elapsed_ns
+
+    def stage_timings(self) -> dict[str, StageTiming]:
+        return {
+            stage: StageTiming(self._stage_calls[stage], self._stage_ns[stage])
+            for stage in self._stage_calls
+        }
+
+    def log_stage_timings(self) -> None:
+        for stage, timing in self.stage_timings().items():
+            log.info(
+                f"Stage: {stage}, calls: {timing.calls}, total: {timing.total_ns / 1e6:.2f} ms, "
+                f"mean: {timing.mean_ns / 1e3:.2f} us"
+            )
+
+    def stale_prefix_length(
+        self, published_at_values: Sequence[str], start_time: datetime
+    ) -> int:
+        """Number of messages, at the start of an ordered page, published before `start_time`"""
+        started = time.perf_counter_ns()
+        stale_messages = bisect_left(_PublishedAtView(published_at_values), start_time)
+        self.record_stage(STALE_PREFIX_STAGE, time.perf_counter_ns() - started)
+        return stale_messages
+
+    def published_at(self, published_at: str) -> Optional[datetime]:
+        started = time.perf_counter_ns()
+        published_at_datetime = parse_published_at(published_at)
+        self.record_stage(TIMESTAMP_STAGE, time.perf_counter_ns() - started)
+        return published_at_datetime
+
+    def classify(
+        self, user: str, message: str, is_super_chat: bool = False
+    ) -> ClassifiedMessage:
+        started = time.perf_counter_ns()
+        # Detection and cleanup in one go, double spaces or leading/trailing spaces left by the filter word go away
+        cleaned_message, filter_words_found = self.pattern_for_filter_word.subn(
+            " ", message
+        )
+        if is_super_chat:
+            classified = ClassifiedMessage(
+                MessageKind.SUPER_CHAT, user, cleaned_message.strip() or NO_COMMENT
+            )
+        elif filter_words_found:
+            classified = ClassifiedMessage(
+                MessageKind.QUESTION, user, cleaned_message.strip()
+            )
+        else:
+            classified = ClassifiedMessage(MessageKind.CHAT_LINE, user, message)
+        self.record_stage(CLASSIFY_STAGE, time.perf_counter_ns() - started)
+        return classified
@@ -0,0 +1,184 @@
+"""
+Ledger of the youtube data api quota spent per day (the quota resets at midnight pacific time).
+
+Every api call made by `YoutubeLiveChat` is recorded with its cost. Out of what's left of the daily quota and the
+time left of the scheduled stream, the ledger works out the minimum wait between live chat polls that makes the
+quota last until the end of the stream, the poll scheduler stretches its floor up to it.
+The ledger is persisted (json) per quota day in the resources directory, next to the session databases.
+"""
+from stream_live_chat_gui import (
+    get_resource,
+    SAVE_FILES_DATETIME_FORMAT,
+    YOUTUBE_DAILY_QUOTA,
+    YOUTUBE_QUOTA_RESERVE,
+    SCHEDULED_STREAM_HOURS,
+)
+from stream_live_chat_gui.youtube_cassette import (
+    VIDEOS_LIST,
+    LIVE_BROADCASTS_LIST,
+    LIVE_CHAT_MESSAGES_LIST,
+    CHANNEL_LIVE_PAGE,
+)
+from collections import Counter
+from datetime import datetime, timedelta, timezone, tzinfo
+from threading import RLock
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+# https://developers.google.com/youtube/v3/determine_quota_cost
+CALL_COSTS = {
+    VIDEOS_LIST: 1,
+    LIVE_BROADCASTS_LIST: 1,
+    LIVE_CHAT_MESSAGES_LIST: 5,
+    # Plain web page, not an api call
+    CHANNEL_LIVE_PAGE: 0,
+}
+DEFAULT_CALL_COST = 1
+QUOTA_LEDGER_FILENAME_SUFFIX = "youtube_quota.json"
+# The ledger file is written at most this often (and when closed)
+QUOTA_LEDGER_SAVE_SECONDS = 10.0
+# Past the scheduled end of the stream, the remaining quota is spread over at least this long
+MIN_REMAINING_STREAM_SECONDS = 15 * 60
+# Wait between polls once the quota (minus the reserve) is used up
+EXHAUSTED_QUOTA_POLL_SECONDS = 60.0
+
+
+def get_quota_timezone() -> tzinfo:
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo("America/Los_Angeles")
+    except Exception:
+        # No tz database available (i.e. windows without tzdata), pacific standard time is close enough
+        return timezone(timedelta(hours=-8))
+
+
+QUOTA_TIMEZONE = get_quota_timezone()
+
+
+def get_quota_day(utc_now: datetime) -> str:
+    return (
+        utc_now.replace(tzinfo=timezone.utc)
+        .astimezone(QUOTA_TIMEZONE)
+        .strftime(SAVE_FILES_DATETIME_FORMAT)
+    )
+
+
+class QuotaLedger:
+    def __init__(
+        self,
+        daily_quota: int = YOUTUBE_DAILY_QUOTA,
+        reserve: int = YOUTUBE_QUOTA_RESERVE,
+        scheduled_stream_hours: float = SCHEDULED_STREAM_HOURS,
+        persist: bool = True,
+    ):
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.scheduled_stream_duration = timedelta(hours=scheduled_stream_hours)
+        self.persist = persist
+        self.stream_start_time = datetime.utcnow()
+        # Number of live chats being polled (co-streams), all of them spend from the same quota
+        self.live_chats_polled = 1
+        # Reentrant, `used_units` is read while saving
+        self._lock = RLock()
+        self._last_saved = 0.0
+        self.quota_day = get_quota_day(datetime.utcnow())
+        self.units_by_call: Counter = Counter()
+        self.calls_by_call: Counter = Counter()
+        self._load()
+
+    @property
+    def file_path(self) -> str:
+        return get_resource(f"{self.quota_day}_{QUOTA_LEDGER_FILENAME_SUFFIX}")
+
+    @property
+    def used_units(self) -> int:
+        with self._lock:
+            return sum(self.units_by_call.values())
+
+    def _load(self) -> None:
+        if not self.persist or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as ledger_file:
+                ledger = json.load(ledger_file)
+            self.units_by_call = Counter(ledger["units_by_call"])
+            self.calls_by_call = Counter(ledger["calls_by_call"])
+            log.debug(f"Quota ledger loaded: {self.file_path}, used: {self.used_units}")
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Unable to load the quota ledger: {self.file_path}, {e}")
+
+    def _save(self) -> None:
+        if not self.persist:
+            return
+        ledger = {
+            "quota_day": self.quota_day,
+            "daily_quota": self.daily_quota,
+            "used_units": self.used_units,
+            "units_by_call": self.units_by_call,
+            "calls_by_call": self.calls_by_call,
+        }
+        temporary_path = f"{self.file_path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as ledger_file:
+                json.dump(ledger, ledger_file, indent=2)
+            os.replace(temporary_path, self.file_path)
+            self._last_saved = time.monotonic()
+        except OSError as e:
+            log.warning(f"Unable to save the quota ledger: {self.file_path}, {e}")
+
+    def _roll_day_if_needed(self) -> None:
+        quota_day = get_quota_day(datetime.utcnow())
+        if quota_day != self.quota_day:
+            self._save()
+            log.info(f"Quota day changed: {self.quota_day} -> {quota_day}")
+            self.quota_day = quota_day
+            self.units_by_call = Counter()
+            self.calls_by_call = Counter()
+
+    def start_stream(self, stream_start_time: datetime) -> None:
+        """The scheduled stream length counts from here"""
+        with self._lock:
+            self.stream_start_time = stream_start_time
+
+    def record(self, call_name: str) -> None:
+        with self._lock:
+            self._roll_day_if_needed()
+            self.units_by_call[call_name] += CALL_COSTS.get(call_name, DEFAULT_CALL_COST)
+            self.calls_by_call[call_name] += 1
+            if time.monotonic() - self._last_saved > QUOTA_LEDGER_SAVE_SECONDS:
+                self._save()
+
+    def close(self) -> None:
+        with self._lock:
+            self._save()
+
+    def remaining_units(self) -> int:
+        with self._lock:
+            return self.daily_quota - self.reserve - self.used_units
+
+    def remaining_stream_seconds(self) -> float:
+        scheduled_end = self.stream_start_time + self.scheduled_stream_duration
+        return max(
+            (scheduled_end - datetime.utcnow()).total_seconds(),
+            MIN_REMAINING_STREAM_SECONDS,
+        )
+
+    def min_poll_interval(self) -> float:
+        """Seconds between polls (of each live chat) so the remaining quota lasts the rest of the stream"""
+        remaining_units = self.remaining_units()
+        if remaining_units <= 0:
+            return EXHAUSTED_QUOTA_POLL_SECONDS
+        poll_cost = CALL_COSTS[LIVE_CHAT_MESSAGES_LIST] * self.live_chats_polled
+        affordable_polls = remaining_units / poll_cost
+        return self.remaining_stream_seconds() / affordable_polls
+
+    def display_text(self) -> str:
+        return (
+            f"Quota:\n{self.used_units}/{self.daily_quota}\n"
+            f"Poll >= {self.min_poll_interval():.1f}s"
+        )
@@ -1,5 +1,8 @@
 import logging
+import os
+import time
 from datetime import datetime, timedelta
+from threading import Lock
 from stream_live_chat_gui import (
     get_resource,
     get_time_adjusted_filename,
@@ -16,16 +19,106 @@ logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 TIMESTAMP_PLACEHOLDER = "--:--:--"
 SPACERS = "=" * 20
+# Live chat record file flush policy: whatever comes first, size of the unflushed data or time since last flush
+LIVE_CHAT_RECORD_FLUSH_BYTES = 64 * 1024
+LIVE_CHAT_RECORD_FLUSH_SECONDS = 5.0
+# Periodic fsync so the record survives a crash of the application (or the machine)
+LIVE_CHAT_RECORD_FSYNC_SECONDS = 30.0
+
+
+class LiveChatRecordWriter:
+    """
+    Keeps the live chat record file open for the whole stream. Lines are buffered and written once per live chat
+    page (`end_page`), the same text block is sent to std.out, which is redirected to the GUI live chat feed.
+    The file is flushed following a size or time policy and fsync'ed periodically and when closed.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        flush_bytes: int = LIVE_CHAT_RECORD_FLUSH_BYTES,
+        flush_seconds: float = LIVE_CHAT_RECORD_FLUSH_SECONDS,
+        fsync_seconds: float = LIVE_CHAT_RECORD_FSYNC_SECONDS,
+    ):
+        self.file_path = file_path
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.fsync_seconds = fsync_seconds
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._lock = Lock()
+        self._page_lines: list[str] = []
+        self._unflushed_bytes = 0
+        self._last_flush = self._last_fsync = time.monotonic()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, line: str) -> None:
+        """Buffers a line until the end of the current page"""
+        with self._lock:
+            self._page_lines.append(line)
+
+    def end_page(self) -> None:
+        """Sends the buffered lines to the GUI feed and the record file, flushes/fsyncs following the policy"""
+        with self._lock:
+            if self._file.closed:
+                if self._page_lines:
+                    log.warning(
+                        f"Live chat record already closed, dropping {len(self._page_lines)} lines"
+                    )
+                    self._page_lines.clear()
+                return
+
+            if self._page_lines:
+                page_text = "\n".join(self._page_lines) + "\n"
+                self._page_lines.clear()
+                # std.out is redirected to a widget in the GUI (live_chat_feed_text_box)
+                print(page_text, end="")
+                self._file.write(page_text)
+                self._unflushed_bytes += len(page_text.encode("utf-8"))
+
+            now = time.monotonic()
+            if self._unflushed_bytes and (
+                self._unflushed_bytes >= self.flush_bytes
+                or now - self._last_flush >= self.flush_seconds
+            ):
+                self._flush(now)
+            if now - self._last_fsync >= self.fsync_seconds:
+                self._fsync(now)
+
+    def close(self) -> None:
+        """Writes whatever is pending, fsyncs and closes the file"""
+        self.end_page()
+        with self._lock:
+            if self._file.closed:
+                return
+            now = time.monotonic()
+            self._flush(now)
+            self._fsync(now)
+            self._file.close()
+            log.debug(f"Live chat record file closed: {self.file_path}")
+
+    def _flush(self, now: float) -> None:
+        self._file.flush()
+        self._unflushed_bytes = 0
+        self._last_flush = now
+
+    def _fsync(self, now: float) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_fsync = now
 
 
 class FileRecording:
-    def __init__(self):
+    def __init__(self, live_chat_writer: bool = True):
+        """`live_chat_writer` False: the live chat record is written by another process (see `ingestion_process`)"""
         self.record_file_name: str = None
         self.banner_file: str = None
         # This attribute needs to be set after this class is instantiated, the value initiated with is a placeholder
         self.start_time_in_utc = datetime.utcnow()
         self.create_banner_file()
-        self.create_live_chat_file()
+        self.create_live_chat_file(live_chat_writer)
         self.create_actual_timestamps_replied_questions_file()
         self.questions_open: bool = False
 
@@ -57,7 +150,7 @@ class FileRecording:
         with open(self.replied_questions_w_timestamp_file, "a", encoding="utf-8"):
             pass
 
-    def create_live_chat_file(self):
+    def create_live_chat_file(self, live_chat_writer: bool = True):
         log.debug("Searching for live chat record file")
         self.live_chat_file = get_time_adjusted_filename(
             LIVE_CHAT_RECORD_FILENAME, "txt"
@@ -65,9 +158,15 @@ class FileRecording:
         # To make the file be under resources directory
         self.live_chat_file = get_resource(self.live_chat_file)
 
-        # Creating the file
-        with open(self.live_chat_file, "a", encoding="utf-8"):
-            pass
+        # Creating the file, it stays open until the stream is stopped
+        self.live_chat_writer = (
+            LiveChatRecordWriter(self.live_chat_file) if live_chat_writer else None
+        )
+
+    def close(self) -> None:
+        """Closes the files kept open during the stream"""
+        if self.live_chat_writer is not None:
+            self.live_chat_writer.close()
 
     def generate_file_w_timestamp_synchronized_replied_questions(
         self, replied_questions_w_timestamp: list[tuple[str, datetime]]
@@ -22,6 +22,7 @@ from stream_live_chat_gui import (
 )
 from stream_live_chat_gui.alchemical_model import AlchemicalTableModel
 from stream_live_chat_gui.database_model import Question
+from stream_live_chat_gui.ingestion_bus import get_ingestion_bus
 import sys
 from typing import Optional
 
@@ -49,6 +50,8 @@ class AnswersUi(QMainWindow):
         self._create_central_layout()
         self._create_bottom_layout()
         self.table_refresh_timer = QTimer()
+        # Reads the messages of the ingestion process (INGESTION_PROCESS="yes")
+        self.ingestion_messages_timer = QTimer()
         self._create_close_dialog_box()
         self._create_camera_reset_resources()
         self._create_live_chat_worker_error_message_box()
@@ -188,6 +191,8 @@ class AnswersUi(QMainWindow):
                 - "Wait Avg:" [QLabel display]
                 - "Ans Avg:" [QLabel display]
                 - "Est. by ans:" [QLabel display]
+                - "Quota:" [QLabel display] (youtube api quota used / poll interval that fits the stream)
+                - "Msgs/s:" [QLabel display] (chat messages per second, youtube and twitch)
             - Table Right [SQLite connection/display]
             - Scrolling Area Far Right [QScrollArea] -> Live Chat Feed
         """
@@ -244,6 +249,10 @@ class AnswersUi(QMainWindow):
         self.estimated_by_answer_label = QLabel(
             f"Est. by ans:\n{self.current_question_time.toString()}"
         )
+        self.youtube_quota_label = QLabel(f"Quota:\n{QUESTIONS_COUNTER_PLACEHOLDER}")
+        self.chat_message_rate_label = QLabel(
+            f"Msgs/s:\n{QUESTIONS_COUNTER_PLACEHOLDER}"
+        )
         central_layout_column.addWidget(self.reply_auto_button)
         central_layout_column.addWidget(self.reply_button)
         central_layout_column.addWidget(self.reply_random_button)
@@ -256,6 +265,8 @@ class AnswersUi(QMainWindow):
         central_layout_column.addWidget(self.wait_average_label)
         central_layout_column.addWidget(self.answer_average_label)
         central_layout_column.addWidget(self.estimated_by_answer_label)
+        central_layout_column.addWidget(self.youtube_quota_label)
+        central_layout_column.addWidget(self.chat_message_rate_label)
 
         central_layout.addWidget(self.pending_questions_view)
         central_layout.addLayout(central_layout_column)
@@ -294,6 +305,7 @@ class AnswersUi(QMainWindow):
             model=Question,
             relationship=Question.user,
             columns=columns,
+            ingestion_bus=get_ingestion_bus(DATABASE_NAME),
         )
 
     def _get_column_index(self, column_name: str) -> Optional[int]:
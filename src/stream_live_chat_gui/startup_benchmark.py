@@ -0,0 +1,162 @@
+"""
+Startup benchmark, fails (exit code 1) if the time to first paint of the GUI regresses.
+
+Usage (from the directory holding the .env file and the resources directory):
+    python -m stream_live_chat_gui.startup_benchmark [--runs 5] [--max-import-ms 1500] [--max-first-paint-ms 3000]
+
+Two measurements are taken, each one in a fresh interpreter:
+- `python -X importtime -c "import stream_live_chat_gui.main"`: cumulative import time of the entry point, it also
+  checks that the google api client stack is not imported before the window shows up.
+- Time from interpreter start until the first event loop iteration after the window (and controller) are created.
+"""
+from typing import NamedTuple
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+log = logging.getLogger(__name__)
+
+ENTRY_POINT_MODULE = "stream_live_chat_gui.main"
+# These modules must only be imported after the window is shown (on the first Start Stream or in the background)
+LAZY_MODULES = (
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "google.auth",
+    "stream_live_chat_gui.youtube_chat",
+)
+DEFAULT_RUNS = 5
+DEFAULT_MAX_IMPORT_MS = 1500.0
+DEFAULT_MAX_FIRST_PAINT_MS = 3000.0
+FIRST_PAINT_MARKER = "FIRST_PAINT_MS="
+FIRST_PAINT_SNIPPET = f"""
+import time
+start = time.perf_counter()
+import sys
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+from stream_live_chat_gui import create_db
+from stream_live_chat_gui.reply_gui import AnswersUi
+from stream_live_chat_gui.controller import AppController
+
+create_db()
+gui = QApplication(sys.argv)
+win = AnswersUi()
+AppController(model=None, view=win).run()
+
+
+def first_paint():
+    # sys.stdout is redirected to the GUI live chat feed
+    print(f"{FIRST_PAINT_MARKER}{{(time.perf_counter() - start) * 1000:.1f}}", file=sys.__stdout__)
+    # Otherwise the exit flush hits the deleted feed widget stream (exit code 120)
+    sys.stdout = sys.__stdout__
+    gui.quit()
+
+
+QTimer.singleShot(0, first_paint)
+gui.exec()
+"""
+
+
+class ImportTimeResult(NamedTuple):
+    cumulative_ms: float
+    lazy_modules_imported: list[str]
+
+
+def parse_import_time_output(stderr: str, module_name: str) -> ImportTimeResult:
+    """Parses the `-X importtime` output: `import time: self [us] | cumulative | imported package`"""
+    cumulative_us = None
+    imported_modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, package = line.split(":", 1)[1].split("|")
+        package = package.strip()
+        imported_modules.add(package)
+        if package == module_name:
+            cumulative_us = int(cumulative.strip())
+
+    if cumulative_us is None:
+        raise RuntimeError(f"Module: {module_name} not found in -X importtime output")
+
+    lazy_modules_imported = sorted(
+        module
+        for module in imported_modules
+        if any(
+            module == lazy or module.startswith(lazy + ".") for lazy in LAZY_MODULES
+        )
+    )
+    return ImportTimeResult(cumulative_us / 1000, lazy_modules_imported)
+
+
+def measure_import_time() -> ImportTimeResult:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT_MODULE}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_time_output(completed.stderr, ENTRY_POINT_MODULE)
+
+
+def measure_first_paint() -> float:
+    environment = dict(os.environ)
+    # No display needed
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    completed = subprocess.run(
+        [sys.executable, "-c", FIRST_PAINT_SNIPPET],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=environment,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(FIRST_PAINT_MARKER):
+            return float(line[len(FIRST_PAINT_MARKER) :])  # noqa: E203
+    raise RuntimeError(f"No first paint measurement found in: {completed.stdout}")
+
+
+def run_benchmark(runs: int, max_import_ms: float, max_first_paint_ms: float) -> bool:
+    import_results = [measure_import_time() for _ in range(runs)]
+    first_paint_results = [measure_first_paint() for _ in range(runs)]
+
+    import_ms = statistics.median(result.cumulative_ms for result in import_results)
+    first_paint_ms = statistics.median(first_paint_results)
+    lazy_modules_imported = sorted(
+        {module for result in import_results for module in result.lazy_modules_imported}
+    )
+
+    print(f"Import of {ENTRY_POINT_MODULE} (median of {runs}): {import_ms:.1f} ms")
+    print(f"Time to first paint (median of {runs}): {first_paint_ms:.1f} ms")
+
+    passed = True
+    if lazy_modules_imported:
+        print(f"FAIL: modules that should be lazy were imported: {lazy_modules_imported}")
+        passed = False
+    if import_ms > max_import_ms:
+        print(f"FAIL: import time over budget: {import_ms:.1f} > {max_import_ms} ms")
+        passed = False
+    if first_paint_ms > max_first_paint_ms:
+        print(
+            f"FAIL: time to first paint over budget: {first_paint_ms:.1f} > {max_first_paint_ms} ms"
+        )
+        passed = False
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--max-import-ms", type=float, default=DEFAULT_MAX_IMPORT_MS)
+    parser.add_argument(
+        "--max-first-paint-ms", type=float, default=DEFAULT_MAX_FIRST_PAINT_MS
+    )
+    args = parser.parse_args()
+    passed = run_benchmark(args.runs, args.max_import_ms, args.max_first_paint_ms)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
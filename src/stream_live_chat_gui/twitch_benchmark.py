@@ -0,0 +1,121 @@
+"""
+Twitch reader throughput benchmark, drives `TwitchStreamThreadControl` against the local stand-in irc chat
+(`fake_twitch_irc`) and reports messages/s, drops, framing errors, invalid lines, CPU per 1k messages and latency.
+
+Usage (from the directory holding the .env file and the resources directory):
+    python -m stream_live_chat_gui.twitch_benchmark [--messages 20000] [--rate 5000] [--split-ratio 0.2]
+
+Questions are open during the whole run, so every question goes all the way to the database (TEST_DB_FILENAME, or
+twitch_benchmark.db inside resources). The chat lines printed by the reader are discarded.
+"""
+from stream_live_chat_gui import TEST_DB_FILENAME
+from stream_live_chat_gui.fake_twitch_irc import (
+    add_config_arguments,
+    config_from_arguments,
+    create_server,
+)
+from stream_live_chat_gui.ingestion_bus import stop_ingestion_buses
+from stream_live_chat_gui.twitch_chat import TwitchStreamThreadControl
+from contextlib import redirect_stdout
+from queue import Queue
+from threading import Thread
+import argparse
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+BENCHMARK_DB_FILENAME = "twitch_benchmark.db"
+DEFAULT_MESSAGES = 20000
+DEFAULT_RATE = 5000.0
+# The run ends this long after the last message received, if some never arrive
+DEFAULT_IDLE_TIMEOUT_SECONDS = 5.0
+WAIT_STEP_SECONDS = 0.05
+
+
+def run_benchmark(args: argparse.Namespace) -> dict[str, float]:
+    config = config_from_arguments(args)
+    server = create_server(config, port=0)
+    host, port = server.server_address
+    Thread(target=server.serve_forever, name="FakeTwitchIrc", daemon=True).start()
+    fake_irc_chat = server.RequestHandlerClass.fake_irc_chat
+
+    questions_control_queue = Queue(maxsize=1)
+    twitch = TwitchStreamThreadControl(
+        questions_control_queue,
+        None,
+        db_filename=TEST_DB_FILENAME or BENCHMARK_DB_FILENAME,
+        server=host,
+        port=port,
+    )
+    # Questions open, no session limit
+    questions_control_queue.put((True, 0))
+    twitch.wake_up()
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        twitch.start()
+        last_received = twitch.messages_received
+        last_progress = time.perf_counter()
+        while time.perf_counter() - last_progress < args.idle_timeout_seconds:
+            time.sleep(WAIT_STEP_SECONDS)
+            if twitch.messages_received != last_received:
+                last_received = twitch.messages_received
+                last_progress = time.perf_counter()
+            if (
+                fake_irc_chat.done
+                and twitch.messages_received >= fake_irc_chat.stats.unique_privmsgs_sent
+            ):
+                break
+        elapsed = time.perf_counter() - started
+        twitch.join()
+    # Everything queued to the database writer gets stored
+    stop_ingestion_buses()
+    server.shutdown()
+    server.server_close()
+
+    stats = fake_irc_chat.stats
+    bus_stats = twitch.ingestion_bus.stats
+    messages = twitch.messages_received
+    return {
+        "messages_sent": stats.privmsgs_sent,
+        "duplicates_sent": stats.duplicates_sent,
+        "messages_received": messages,
+        "drops": stats.unique_privmsgs_sent - messages,
+        "messages_per_second": messages / elapsed if elapsed > 0 else 0.0,
+        "framing_errors": twitch.line_buffer.framing_errors,
+        "invalid_lines": twitch.invalid_lines,
+        "packets_sent": stats.packets_sent,
+        "split_packets": stats.split_packets,
+        "pings_sent": stats.pings_sent,
+        "pongs_received": stats.pongs_received,
+        "cpu_ms_per_1k_messages": (twitch.cpu_seconds or 0.0) * 1000 * 1000 / messages
+        if messages
+        else 0.0,
+        "latency_mean_ms": twitch.latency_total_seconds * 1000 / messages
+        if messages
+        else 0.0,
+        "latency_max_ms": twitch.latency_max_seconds * 1000,
+        "db_commits": bus_stats.commits,
+        "db_dropped_questions": bus_stats.dropped_questions,
+        "db_max_commit_ms": bus_stats.max_commit_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Twitch irc reader benchmark")
+    add_config_arguments(parser)
+    parser.add_argument(
+        "--idle-timeout-seconds", type=float, default=DEFAULT_IDLE_TIMEOUT_SECONDS
+    )
+    parser.set_defaults(messages=DEFAULT_MESSAGES, rate=DEFAULT_RATE)
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    for name, value in results.items():
+        print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
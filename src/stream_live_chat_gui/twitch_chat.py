@@ -1,98 +1,375 @@
-from socket import socket, AF_INET, SOCK_STREAM
+"""
+Twitch irc chat reader, a source of questions beside the youtube live chat.
+
+Messages come with IRCv3 tags (`CAP REQ`): the display name, the message id (re-delivered messages are dropped) and
+the bits of a cheer, taken as the twitch analogue of a super chat. Questions follow the same rules as the youtube
+ones (CHAT_FILTER_WORD, LIMITED_USERS, session limit, open/close questions) and every read is queued at once to
+the database writer (`ingestion_bus`).
+"""
+from socket import socket, socketpair, AF_INET, SOCK_STREAM
+from collections import Counter
+from datetime import datetime
+from queue import Empty, Queue
+from typing import Optional
 import logging
-import os
 import re
-from dotenv import load_dotenv
+import selectors
+import time
 
 from stream_live_chat_gui.db_interactions import DBInteractions
-from stream_live_chat_gui import StreamerThreadControl
+from stream_live_chat_gui.dedup_cache import MessageDedupCache, question_text_hash
+from stream_live_chat_gui.ingestion_bus import get_ingestion_bus
+from stream_live_chat_gui.message_classifier import MessageClassifier, MessageKind
+from stream_live_chat_gui.record_files import LiveChatRecordWriter
+from stream_live_chat_gui import (
+    StreamerThreadControl,
+    NewQuestion,
+    DEDUP_CACHE_SIZE,
+    TWITCH_SERVER,
+    TWITCH_PORT,
+    TWITCH_NICKNAME,
+    TWITCH_TOKEN,
+    TWITCH_CHANNEL,
+    TWITCH_MSGBUFFSIZE,
+)
 
-# TODO: All environmental variables should be passed through __init__
-load_dotenv()
-FORMAT = "%(asctime)s %(message)s"
-logging.basicConfig(format=FORMAT, datefmt="%Y-%m-%d %H:%M:%S", level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
-SERVER = os.getenv("SERVER")
-PORT = int(os.getenv("PORT"))
-NICKNAME = os.getenv("NICKNAME")
-# Set at .env file in the root folder
-TOKEN = os.getenv("TOKEN")
-CHANNEL = os.getenv("CHANNEL")
-MSGBUFFSIZE = int(os.getenv("MSGBUFFSIZE"))
-MESSAGEREGEX = r"^:(?P<user>\w+)!.*\#(?P<channel>\w+)?\s:(?P<message>.*)"
+# https://dev.twitch.tv/docs/irc/tags#privmsg-tags
+PATTERN_FOR_PRIVMSG = re.compile(
+    r"^(?:@(?P<tags>\S+) )?:(?P<user>[^!\s]+)!\S* PRIVMSG #(?P<channel>\S+) :(?P<message>.*)$"
+)
+PATTERN_FOR_TAG_ESCAPE = re.compile(r"\\(.)")
+TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+IRC_LINE_DELIMITER = b"\r\n"
+# IRCv3: 8191 bytes of tags plus the 512 bytes of the message itself
+IRC_MAX_LINE_LENGTH = 8191 + 512
+TWITCH_CHAT_LABEL = "twitch"
 
 
-def log_in(socket_: socket) -> None:
-    starting_strings = [f"PASS {TOKEN}\n", f"NICK {NICKNAME}\n", f"JOIN {CHANNEL}\n"]
+def log_in(socket_: socket, nickname: str, token: str, channel: str) -> None:
+    starting_strings = [
+        # Tags (display name, message id, bits...) on every message
+        "CAP REQ :twitch.tv/tags twitch.tv/commands\r\n",
+        f"PASS {token}\r\n",
+        f"NICK {nickname}\r\n",
+        f"JOIN {channel}\r\n",
+    ]
     for string_ in starting_strings:
-        socket_.send(string_.encode("utf-8"))
+        socket_.sendall(string_.encode("utf-8"))
     log.debug("INITIALIZING THE CONNECTION TO TWITCH IRC")
     return
 
 
+def parse_irc_tags(tags: Optional[str]) -> dict[str, str]:
+    if not tags:
+        return {}
+    parsed_tags = {}
+    for tag in tags.split(";"):
+        key, _, value = tag.partition("=")
+        parsed_tags[key] = PATTERN_FOR_TAG_ESCAPE.sub(
+            lambda match: TAG_ESCAPES.get(match.group(1), match.group(1)), value
+        )
+    return parsed_tags
+
+
+class IrcLineBuffer:
+    """
+    Frames the bytes received from the irc socket into complete lines. A read can hold many lines and end in the
+    middle of one (even in the middle of a multi-byte character), the incomplete tail waits for the next read.
+    """
+
+    def __init__(self, max_line_length: int = IRC_MAX_LINE_LENGTH):
+        self.max_line_length = max_line_length
+        self._pending = b""
+        # Lines longer than the irc limit, dropped
+        self.framing_errors = 0
+
+    def feed(self, data: bytes) -> list[str]:
+        *lines, self._pending = (self._pending + data).split(IRC_LINE_DELIMITER)
+        if len(self._pending) > self.max_line_length:
+            log.warning(f"Dropping {len(self._pending)} bytes without a line delimiter")
+            self._pending = b""
+            self.framing_errors += 1
+
+        framed_lines = []
+        for line in lines:
+            if len(line) > self.max_line_length:
+                self.framing_errors += 1
+                continue
+            if line:
+                framed_lines.append(line.decode("utf-8", errors="replace"))
+        return framed_lines
+
+
 class TwitchStreamThreadControl(StreamerThreadControl):
-    """Setting initial variabels"""
+    """
+    Reads the twitch irc chat as data arrives (selectors), nothing runs between messages. Stopping the thread, or
+    a new value in the open/close questions queue (see `wake_up`), wakes it up right away through a socket pair
+    registered in the same selector.
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        questions_control_queue: Queue,
+        live_chat_record: Optional[LiveChatRecordWriter],
+        db_filename: str = None,
+        server: str = TWITCH_SERVER,
+        port: int = TWITCH_PORT,
+    ):
         super().__init__(name="TwitchStreamThread")
-        self.set_twitch_thread_control_variables()
+        self.set_twitch_thread_control_variables(
+            questions_control_queue, live_chat_record, db_filename, server, port
+        )
 
-    def set_twitch_thread_control_variables(self):
+    def set_twitch_thread_control_variables(
+        self, questions_control_queue, live_chat_record, db_filename, server, port
+    ):
+        self.questions_control_queue = questions_control_queue
+        self.live_chat_record = live_chat_record
         self.socket = socket(AF_INET, SOCK_STREAM)
-        self.socket.connect((SERVER, PORT))
-        self.socket.setblocking(0)  # non-blocking mode
-        self.db = DBInteractions()
+        self.socket.connect((server, port))
+        self.socket.setblocking(False)
+        self._wakeup_reader, self._wakeup_writer = socketpair()
+        self._wakeup_reader.setblocking(False)
+        self.line_buffer = IrcLineBuffer()
+        # Reads (limits checks), the questions are stored by the database writer
+        self.db = DBInteractions(db_filename=db_filename)
+        self.ingestion_bus = get_ingestion_bus(db_filename)
+        self.classifier = MessageClassifier()
+        self.dedup_cache = MessageDedupCache(DEDUP_CACHE_SIZE)
+        self.ingestion_bus.add_dedup_cache(self.dedup_cache)
+        self.open_questions_start_time: Optional[datetime] = None
+        self.session_questions_limit = 0
+        # Counters, read by the GUI (messages per second) and the benchmark (see `twitch_benchmark`)
+        self.lines_received = 0
+        self.messages_received = 0
+        # PRIVMSG lines that couldn't be parsed
+        self.invalid_lines = 0
+        # Seconds between a message being sent (tmi-sent-ts) and handled, total and max
+        self.latency_total_seconds = 0.0
+        self.latency_max_seconds = 0.0
+        # CPU time used by the thread, set when it ends
+        self.cpu_seconds: Optional[float] = None
+        self.started_at = time.monotonic()
+        # Questions of the read being handled, queued all at once to the database writer after the read
+        self._read_questions: list[NewQuestion] = []
+        self._read_questions_by_user: Counter = Counter()
+        self._read_regular_questions = 0
+
+    @property
+    def messages_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.messages_received / elapsed if elapsed > 0 else 0.0
+
+    def wake_up(self) -> None:
+        try:
+            self._wakeup_writer.send(b"\0")
+        except OSError:
+            # Already closed, the thread is done
+            pass
+
+    def join(self, timeout: Optional[float] = None):
+        """Stops the thread, without waiting for the next message to arrive"""
+        self._stopevent.set()
+        self.wake_up()
+        super().join(timeout)
 
     def run(self):
         """Main control loop"""
-        log_in(self.socket)
-        log.debug(f"{self.getName} starts")
-        response = ""
-        while not self._stopevent.is_set():
+        log_in(self.socket, TWITCH_NICKNAME, TWITCH_TOKEN, TWITCH_CHANNEL)
+        log.debug(f"{self.name} starts")
+        started_cpu = time.thread_time()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            selector.register(self._wakeup_reader, selectors.EVENT_READ)
             try:
-                response = self.socket.recv(MSGBUFFSIZE).decode("utf-8")
-            except BlockingIOError:
-                continue
-            log.debug("END OF socket RECV operation")
-
-            if response.startswith("PING"):
-                self.socket.send("PONG\n".encode("utf-8"))
-            elif (
-                "PRIVMSG" in response
-            ):  # IRC msgs have the string PRIVMSG in it, the rest are server side gibberish
-                response = response.rstrip()
-                log.debug(f"{response}")
-                matches = re.search(MESSAGEREGEX, response)
-                if matches:
-                    user = matches.group("user")
-                    message = matches.group("message")
-                    log.debug(f"{user} {message}")
-                    self.db.add_new_question(user_name=user, question_msg=message)
-                else:
-                    log.debug(f"NOT_VALID_MSG: {response}")
-            else:
-                pass  # ignore the response
+                while not self._stopevent.is_set():
+                    for key, _ in selector.select():
+                        if key.fileobj is self._wakeup_reader:
+                            self._read_wakeups()
+                        elif not self._read_socket():
+                            return
+            finally:
+                self.cpu_seconds = time.thread_time() - started_cpu
+                self.socket.close()
+                self._wakeup_reader.close()
+                self._wakeup_writer.close()
+
+    def _read_wakeups(self) -> None:
+        try:
+            self._wakeup_reader.recv(TWITCH_MSGBUFFSIZE)
+        except (BlockingIOError, InterruptedError):
+            pass
+        self._read_questions_control()
+
+    def _read_questions_control(self) -> None:
+        try:
+            open_questions = self.questions_control_queue.get_nowait()
+        except Empty:
+            return
+
+        if open_questions:
+            self.open_questions_start_time = datetime.utcnow()
+            # Number of questions to be fetch per session
+            self.session_questions_limit = open_questions[-1]
+        else:
+            self.open_questions_start_time = None
+        log.debug(f"Twitch open questions queue value: {open_questions}")
 
-            # Make the thread sleep so the main thread (controller) gets to run as well.
-            self._stopevent.wait(self._sleepperiod)
+    def _read_socket(self) -> bool:
+        """Handles every complete line received, returns False once the server closed the connection"""
+        try:
+            data = self.socket.recv(TWITCH_MSGBUFFSIZE)
+        except (BlockingIOError, InterruptedError):
+            return True
+        if not data:
+            log.warning("Twitch irc connection closed by the server")
+            return False
+
+        lines = self.line_buffer.feed(data)
+        self.lines_received += len(lines)
+        for line in lines:
+            self.handle_line(line)
+        self._end_read()
+        return True
+
+    def _end_read(self) -> None:
+        if self.live_chat_record is not None:
+            self.live_chat_record.end_page()
+        if self._read_questions:
+            dropped = self.ingestion_bus.submit_questions(self._read_questions)
+            # Never stored, they can be asked again
+            self.dedup_cache.forget_questions(
+                question_text_hash(question.question) for question in dropped
+            )
+            self._read_questions = []
+            self._read_questions_by_user.clear()
+            self._read_regular_questions = 0
+
+    def _record_chat_line(self, line: str) -> None:
+        line = f"[{TWITCH_CHAT_LABEL}] {line}"
+        if self.live_chat_record is None:
+            # std.out is redirected to a widget in the GUI (live_chat_feed_text_box)
+            print(line)
+            return
+        self.live_chat_record.write(line)
+
+    def handle_line(self, line: str) -> None:
+        if line.startswith("PING"):
+            # The same parameter (:tmi.twitch.tv) goes back
+            self.socket.sendall(f"PONG{line[4:]}\r\n".encode("utf-8"))
+        elif (
+            "PRIVMSG" in line
+        ):  # IRC msgs have the string PRIVMSG in it, the rest are server side gibberish
+            self.handle_privmsg(line)
+        else:
+            pass  # ignore the response
+
+    def handle_privmsg(self, line: str) -> None:
+        matches = PATTERN_FOR_PRIVMSG.match(line)
+        if not matches:
+            log.debug(f"NOT_VALID_MSG: {line}")
+            self.invalid_lines += 1
+            return
+
+        tags = parse_irc_tags(matches.group("tags"))
+        # Re-delivered messages (i.e. after a reconnection) are dropped altogether
+        message_id = tags.get("id")
+        if message_id and self.dedup_cache.seen_message_id(message_id):
+            log.debug(f"Message: {message_id} already processed")
+            return
+        self.messages_received += 1
+        sent_at = self._record_latency(tags.get("tmi-sent-ts"))
+        user = tags.get("display-name") or matches.group("user")
+        message = matches.group("message")
+        log.debug(f"{user} {message}")
+
+        bits = tags.get("bits")
+        if bits:
+            self.register_cheer(user, message, bits)
+            return
+
+        classified = self.classifier.classify(user, message)
+        if classified.kind is MessageKind.CHAT_LINE:
+            self._record_chat_line(f"{user}: {message}")
+            return
+
+        if self.open_questions_start_time is None:
+            log.debug("Questions are not open...")
+            return
+
+        if sent_at is not None and sent_at <= self.open_questions_start_time:
+            return
+
+        if self.db.has_limited_user_exceeded_question_count(
+            user,
+            questions_not_stored_yet=self._read_questions_by_user[user]
+            + self.ingestion_bus.queued_questions_by(user),
+        ):
+            return
+
+        if (
+            self.session_questions_limit
+            and self.db.counters.pending_questions()
+            + self.ingestion_bus.queued_regular_questions
+            + self._read_regular_questions
+            >= self.session_questions_limit
+        ):
+            log.debug(
+                f"The limit for the open_questions session has been reached: {self.session_questions_limit}, "
+                f"not registering: {message}"
+            )
+            return
+
+        if classified.text and not self.dedup_cache.seen_question(
+            question_text_hash(classified.text)
+        ):
+            self._read_questions.append(NewQuestion(user, classified.text))
+            self._read_questions_by_user[user] += 1
+            self._read_regular_questions += 1
+
+    def _record_latency(self, sent_ts: Optional[str]) -> Optional[datetime]:
+        """Returns when the message was sent (utc) out of its tmi-sent-ts tag (epoch milliseconds)"""
+        if not sent_ts or not sent_ts.isdigit():
+            return None
+        sent_at_seconds = int(sent_ts) / 1000
+        latency = time.time() - sent_at_seconds
+        self.latency_total_seconds += latency
+        self.latency_max_seconds = max(self.latency_max_seconds, latency)
+        return datetime.utcfromtimestamp(sent_at_seconds)
+
+    def register_cheer(self, user: str, message: str, bits: str) -> None:
+        """Cheers are the twitch super chats, the message goes without the filter word, "NO COMMENT" if empty"""
+        cheer_msg = self.classifier.classify(user, message, is_super_chat=True).text
+        cheer_msg = f"{user}: {cheer_msg}"
+        self._record_chat_line(f"[CHEER], bits: {bits}. Message: {cheer_msg}")
+        self._read_questions.append(NewQuestion(user, cheer_msg, is_super_chat=True))
+        self._read_questions_by_user[user] += 1
 
 
 # This function is for pure local testing
 def chat_streamer() -> None:
     sock: socket = socket()
-    sock.connect((SERVER, PORT))
-    log_in(sock)
-    response = ""
+    sock.connect((TWITCH_SERVER, TWITCH_PORT))
+    log_in(sock, TWITCH_NICKNAME, TWITCH_TOKEN, TWITCH_CHANNEL)
+    line_buffer = IrcLineBuffer()
     while True:
-        response = sock.recv(MSGBUFFSIZE).decode("utf-8")
-        if response.startswith("PING"):
-            sock.send("PONG\n".encode("utf-8"))
-        else:
-            log.debug(f"{response.rstrip()}")
+        data = sock.recv(TWITCH_MSGBUFFSIZE)
+        if not data:
+            break
+        for line in line_buffer.feed(data):
+            if line.startswith("PING"):
+                sock.sendall(f"PONG{line[4:]}\r\n".encode("utf-8"))
+            else:
+                log.debug(f"{line}")
 
     sock.close()
 
 
 if __name__ == "__main__":
+    FORMAT = "%(asctime)s %(message)s"
+    logging.basicConfig(
+        format=FORMAT, datefmt="%Y-%m-%d %H:%M:%S", level=logging.DEBUG
+    )
     chat_streamer()
@@ -0,0 +1,221 @@
+"""
+Record and replay of the youtube api calls made by `YoutubeLiveChat`, stored as a JSONL cassette.
+
+- record: every request (call name + params) and response is appended to the cassette while streaming normally.
+  Each Start Stream appends its recording (start time first) after the previous ones, nothing is overwritten.
+- replay: the cassette responses are fed back without any network access, at real or accelerated speed.
+
+Headless replay, useful to benchmark the ingestion path (per page processing cost):
+    python -m stream_live_chat_gui.youtube_cassette <cassette.jsonl> [--speed 360] [--open-questions] [--db name.db]
+"""
+from stream_live_chat_gui import (
+    get_resource,
+    YOUTUBE_CHANNEL_ID,
+    YOUTUBE_CASSETTE_MODE,
+    YOUTUBE_CASSETTE_FILE,
+    YOUTUBE_REPLAY_SPEED,
+)
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional, Union
+import argparse
+import json
+import logging
+import statistics
+import time
+
+log = logging.getLogger(__name__)
+
+CASSETTE_RECORD_MODE = "record"
+CASSETTE_REPLAY_MODE = "replay"
+START_TIME_ENTRY = "start_time"
+CALL_ENTRY = "call"
+# Call names, one per api call type made by `YoutubeLiveChat`
+VIDEOS_LIST = "videos.list"
+LIVE_BROADCASTS_LIST = "liveBroadcasts.list"
+LIVE_CHAT_MESSAGES_LIST = "liveChatMessages.list"
+CHANNEL_LIVE_PAGE = "channel.live_page"
+
+
+class CassetteExhausted(Exception):
+    pass
+
+
+class CassetteRecorder:
+    """Appends every api call (request params and response) to a JSONL file, closed once the poller stops"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        # Append, a second Start Stream must not wipe the recording of the first one
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._lock = Lock()
+        log.debug(f"Recording youtube api calls into: {self.file_path}")
+
+    def _write(self, entry: dict) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps(entry) + "\n")
+            # One line per call at most every few seconds, flushing keeps the cassette usable after a crash
+            self._file.flush()
+
+    def record_start_time(self, start_time: datetime) -> None:
+        self._write({"type": START_TIME_ENTRY, "start_time": start_time.isoformat()})
+
+    def record(self, call_name: str, params: dict, response: dict) -> None:
+        self._write(
+            {
+                "type": CALL_ENTRY,
+                "call": call_name,
+                "at": datetime.utcnow().isoformat(),
+                "params": params,
+                "response": response,
+            }
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            log.debug(f"Cassette recording closed: {self.file_path}")
+
+
+class CassettePlayer:
+    """
+    Feeds the recorded responses back, in order, per call name. The replay has its own clock (`now`), it follows
+    the recorded time of the last replayed liveChatMessages page, advanced `speed` times faster than real time.
+    A cassette holding several recordings starts at the first start time and goes through their pages in order.
+    """
+
+    def __init__(self, file_path: str, speed: float = 1.0):
+        if speed <= 0:
+            raise ValueError(f"Replay speed must be positive, given: {speed}")
+        self.file_path = file_path
+        self.speed = speed
+        self.start_time: Optional[datetime] = None
+        self._responses: dict[str, deque] = defaultdict(deque)
+        self._clock_reference: Optional[tuple[datetime, float]] = None
+
+        with open(self.file_path, "r", encoding="utf-8") as cassette:
+            for line in cassette:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["type"] == START_TIME_ENTRY and self.start_time is None:
+                    self.start_time = datetime.fromisoformat(entry["start_time"])
+                elif entry["type"] == CALL_ENTRY:
+                    self._responses[entry["call"]].append(entry)
+
+        log.debug(
+            f"Replaying cassette: {self.file_path} at speed: {self.speed}, recorded calls: "
+            f"{ {call: len(entries) for call, entries in self._responses.items()} }"
+        )
+
+    def next_response(self, call_name: str) -> dict:
+        if not self._responses[call_name]:
+            raise CassetteExhausted(
+                f"No more recorded responses for: {call_name} in {self.file_path}"
+            )
+        entry = self._responses[call_name].popleft()
+        if call_name == LIVE_CHAT_MESSAGES_LIST:
+            self._clock_reference = (
+                datetime.fromisoformat(entry["at"]),
+                time.monotonic(),
+            )
+        return entry["response"]
+
+    def now(self) -> datetime:
+        if self._clock_reference is None:
+            return self.start_time or datetime.utcnow()
+        recorded_at, replayed_at = self._clock_reference
+        return recorded_at + timedelta(
+            seconds=(time.monotonic() - replayed_at) * self.speed
+        )
+
+    def scale_wait(self, seconds: float) -> float:
+        return seconds / self.speed
+
+
+Cassette = Union[CassetteRecorder, CassettePlayer]
+
+
+def open_cassette_from_env() -> Optional[Cassette]:
+    """Cassette set through the YOUTUBE_CASSETTE_* env vars, if any"""
+    if not YOUTUBE_CASSETTE_MODE:
+        return None
+    if not YOUTUBE_CASSETTE_FILE:
+        raise ValueError("YOUTUBE_CASSETTE_FILE needs to be set to use a cassette")
+
+    cassette_path = get_resource(YOUTUBE_CASSETTE_FILE)
+    if YOUTUBE_CASSETTE_MODE == CASSETTE_RECORD_MODE:
+        return CassetteRecorder(cassette_path)
+    if YOUTUBE_CASSETTE_MODE == CASSETTE_REPLAY_MODE:
+        return CassettePlayer(cassette_path, speed=YOUTUBE_REPLAY_SPEED)
+    raise ValueError(
+        f"YOUTUBE_CASSETTE_MODE value is incorrect: {YOUTUBE_CASSETTE_MODE}, "
+        f"it needs to be either '{CASSETTE_RECORD_MODE}' or '{CASSETTE_REPLAY_MODE}'"
+    )
+
+
+def replay_headless(
+    cassette_path: str, speed: float, open_questions: bool, db_filename: str = None
+) -> None:
+    """Replays a whole cassette through `YoutubeLiveChat` (no GUI) and prints the per page processing cost"""
+    # Imported here, youtube_chat imports this module
+    from stream_live_chat_gui.youtube_chat import YoutubeLiveChat
+
+    player = CassettePlayer(cassette_path, speed=speed)
+    youtube_chat = YoutubeLiveChat(
+        live_chat_record=None,
+        channel_id=YOUTUBE_CHANNEL_ID,
+        db_filename=db_filename,
+        cassette=player,
+    )
+    open_questions_start_time = youtube_chat.now() if open_questions else None
+
+    # The poll scheduler history is bounded, the whole replay is collected here
+    processing_ms: list[float] = []
+    messages = 0
+    replay_started = time.monotonic()
+    while True:
+        try:
+            wait = youtube_chat.get_live_chat_messages_threaded(
+                open_questions_start_time, session_questions_limit=0
+            )
+        except CassetteExhausted:
+            break
+        decision = youtube_chat.poll_scheduler.latest_decision
+        processing_ms.append(decision.page_processing_ns / 1e6)
+        messages += decision.messages_in_page
+        time.sleep(youtube_chat.real_wait(wait))
+    replay_duration = time.monotonic() - replay_started
+
+    print(f"Replayed: {cassette_path} in {replay_duration:.1f}s (speed: {speed})")
+    print(f"Pages: {len(processing_ms)}, messages: {messages}")
+    if processing_ms:
+        print(
+            f"Page processing ms, mean: {statistics.mean(processing_ms):.2f}, "
+            f"max: {max(processing_ms):.2f}, total: {sum(processing_ms):.1f}"
+        )
+    print(f"Dedup cache: {youtube_chat.dedup_cache.stats()}")
+    for stage, timing in youtube_chat.classifier.stage_timings().items():
+        print(
+            f"Stage: {stage}, calls: {timing.calls}, total ms: {timing.total_ns / 1e6:.1f}, "
+            f"mean us: {timing.mean_ns / 1e3:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless replay of a cassette")
+    parser.add_argument("cassette", help="Path to the JSONL cassette")
+    parser.add_argument("--speed", type=float, default=YOUTUBE_REPLAY_SPEED)
+    parser.add_argument("--open-questions", action="store_true")
+    parser.add_argument("--db", default=None, help="Database filename (resources)")
+    args = parser.parse_args()
+    replay_headless(args.cassette, args.speed, args.open_questions, args.db)
+
+
+if __name__ == "__main__":
+    main()
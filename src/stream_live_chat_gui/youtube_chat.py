@@ -1,27 +1,83 @@
 from stream_live_chat_gui import (
     get_client_creds,
+    get_resource,
     get_token,
     StreamerThreadControl,
     YOUTUBE_CHANNEL_ID,
     DATABASE_NAME,
     CREDS_AUTH_PORT,
-    CHAT_FILTER_WORD,
-    LIMITED_USERS,
     PRIVATE_TESTING,
     LIVE_VIDEO_ID,
-    QUESTIONS_LIMIT,
+    NewQuestion,
+    LiveChatStateTuple,
+    LIVE_CHAT_RESUME_MAX_AGE_MINUTES,
+    DEDUP_CACHE_SIZE,
+    YOUTUBE_POLL_FLOOR_SECONDS,
+    YOUTUBE_POLL_CEILING_SECONDS,
+    YOUTUBE_POLL_OPEN_QUESTIONS_CEILING_SECONDS,
+    DISCOVERY_CACHE_TTL_DAYS,
+    YOUTUBE_LEAN_TRANSPORT,
+    YOUTUBE_API_ROOT_URL,
+    YOUTUBE_EXTRA_LIVE_VIDEO_IDS,
+    YOUTUBE_ARMED_POLL_SECONDS,
 )
 from stream_live_chat_gui.db_interactions import DBInteractions
+from stream_live_chat_gui.ingestion_bus import get_ingestion_bus
+from stream_live_chat_gui.message_classifier import MessageClassifier, MessageKind
+from stream_live_chat_gui.dedup_cache import MessageDedupCache, question_text_hash
+from stream_live_chat_gui.quota_ledger import QuotaLedger
+from stream_live_chat_gui.live_broadcast_cache import LiveBroadcastCache
+from stream_live_chat_gui.api_errors import ApiErrorKind, classify_api_error
+from stream_live_chat_gui.ingestion_engine import (
+    ChatIngestionStats,
+    LiveChatIngestionEngine,
+    MAIN_CHAT_NAME,
+)
+from stream_live_chat_gui.record_files import LiveChatRecordWriter
+from stream_live_chat_gui.youtube_transport import (
+    LeanLiveChatTransport,
+    get_http_session,
+    search_streamed_response,
+    HTTP_TIMEOUT_SECONDS,
+)
+from stream_live_chat_gui.youtube_cassette import (
+    Cassette,
+    CassettePlayer,
+    CassetteRecorder,
+    open_cassette_from_env,
+    VIDEOS_LIST,
+    LIVE_BROADCASTS_LIST,
+    LIVE_CHAT_MESSAGES_LIST,
+    CHANNEL_LIVE_PAGE,
+)
 from queue import Queue
-from datetime import datetime
+from threading import Lock
+from collections import Counter, deque
+from concurrent.futures import Future
+from itertools import islice
+from datetime import datetime, timedelta
 from google.auth.transport.requests import Request
+from google.auth.credentials import AnonymousCredentials
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery_cache.base import Cache
-from typing import Optional, Any
-import requests
+
+try:
+    from googleapiclient.version import __version__ as googleapiclient_version
+except ImportError:
+    # Older googleapiclient releases keep the version in the package itself
+    from googleapiclient import __version__ as googleapiclient_version
+try:
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:
+    # googleapiclient < 2.0 doesn't bundle the discovery documents
+    get_static_doc = None
+from typing import Callable, NamedTuple, Optional, Any
+import asyncio
 import os
 import re
+import json
+import hashlib
 import pickle
 import logging
 import time
@@ -34,12 +90,30 @@ log = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.readonly"]
 API_SERVICE_NAME, API_VERSION = "youtube", "v3"
-LIVE_STREAM_TARGET_URL = f"https://www.youtube.com/channel/{YOUTUBE_CHANNEL_ID}/live"
-PATTERN_TO_FIND_VIDEO_ID_USING_REQUESTS = r'"videoId":"(?P<video_id>.*)","broadcastId"'
-LIVE_BROADCASTS_LIST_MAX_RESULTS = 50
-PATTERN_FOR_CHAT_FILTER_WORD = re.compile(
-    f"\s?{CHAT_FILTER_WORD}\s?", re.IGNORECASE  # noqa: W605
+LIVE_STREAM_TARGET_URL = (
+    f"{(YOUTUBE_API_ROOT_URL or 'https://www.youtube.com').rstrip('/')}"
+    f"/channel/{YOUTUBE_CHANNEL_ID}/live"
+)
+PATTERN_TO_FIND_VIDEO_ID_USING_REQUESTS = re.compile(
+    r'"videoId":"(?P<video_id>[^"]+)","broadcastId"'
 )
+# Longer than any match of the pattern above (video ids are 11 characters), overlap kept between streamed chunks
+VIDEO_ID_MATCH_MAX_LENGTH = 256
+LIVE_BROADCASTS_LIST_MAX_RESULTS = 50
+# Directory (inside resources) where the api discovery documents are persisted
+DISCOVERY_CACHE_DIRECTORY = "discovery_cache"
+# Each consecutive empty page (with questions closed) stretches the wait by this factor, up to the ceiling
+IDLE_POLL_BACKOFF_FACTOR = 1.5
+IDLE_POLL_BACKOFF_MAX_STEPS = 5
+POLL_DECISIONS_HISTORY_SIZE = 500
+# Stages of the page processing timed along the classifier ones
+RECORD_STAGE = "record"
+DATABASE_STAGE = "database"
+
+
+def parse_actual_start_time(actual_start_time: str) -> datetime:
+    """RFC 3339 (always utc, Z) without the fractions of second"""
+    return datetime.fromisoformat(actual_start_time.strip("Z").split(".")[0])
 
 
 class UnableToGetVideoId(Exception):
@@ -50,6 +124,117 @@ class UnableToGetLiveChatId(Exception):
     pass
 
 
+class PollDecision(NamedTuple):
+    decided_at: datetime
+    server_hint: Optional[float]
+    wait: float
+    reason: str
+    messages_in_page: int
+    questions_open: bool
+    # Seconds between the newest message of the page being published and it being processed
+    newest_message_lag: Optional[float]
+    # Time spent processing the page (classification, record file, database)
+    page_processing_ns: Optional[int]
+
+
+class PollScheduler:
+    """
+    Decides how long to wait before the next liveChatMessages().list call.
+    It follows the `pollingIntervalMillis` hint given by the api, bounded by a floor and a ceiling. While questions
+    are open the ceiling gets lowered so questions reach the table faster, while questions are closed consecutive
+    empty pages stretch the wait towards the ceiling to save quota.
+    Every decision is kept in `decisions` (bounded) so the end to end latency can be charted.
+    """
+
+    def __init__(
+        self,
+        floor: float = YOUTUBE_POLL_FLOOR_SECONDS,
+        ceiling: float = YOUTUBE_POLL_CEILING_SECONDS,
+        open_questions_ceiling: float = YOUTUBE_POLL_OPEN_QUESTIONS_CEILING_SECONDS,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        min_wait: Optional[Callable[[], float]] = None,
+    ):
+        """`min_wait` (i.e. the quota ledger) can raise the floor, over the ceiling if needed"""
+        if floor > ceiling:
+            raise ValueError(
+                f"Poll floor: {floor} can't be greater than ceiling: {ceiling}"
+            )
+        self.floor = floor
+        self.ceiling = ceiling
+        self.open_questions_ceiling = max(floor, min(open_questions_ceiling, ceiling))
+        self.decisions: deque[PollDecision] = deque(maxlen=POLL_DECISIONS_HISTORY_SIZE)
+        self._consecutive_empty_pages = 0
+        self.clock = clock
+        self.min_wait = min_wait
+
+    @property
+    def latest_decision(self) -> Optional[PollDecision]:
+        return self.decisions[-1] if self.decisions else None
+
+    def next_wait(
+        self,
+        polling_interval_millis: Optional[int],
+        messages_in_page: int,
+        questions_open: bool,
+        newest_published_at: Optional[datetime] = None,
+        page_processing_ns: Optional[int] = None,
+    ) -> float:
+        ceiling = self.open_questions_ceiling if questions_open else self.ceiling
+
+        if polling_interval_millis is None:
+            server_hint = None
+            wait = ceiling
+            reason = "no server hint"
+        else:
+            server_hint = int(polling_interval_millis) / 1000
+            wait = server_hint
+            reason = "server hint"
+
+        if messages_in_page:
+            self._consecutive_empty_pages = 0
+        else:
+            self._consecutive_empty_pages += 1
+
+        if not questions_open and self._consecutive_empty_pages:
+            wait *= IDLE_POLL_BACKOFF_FACTOR ** min(
+                self._consecutive_empty_pages, IDLE_POLL_BACKOFF_MAX_STEPS
+            )
+            reason += f", idle backoff ({self._consecutive_empty_pages} empty pages)"
+
+        if wait < self.floor:
+            wait = self.floor
+            reason += ", raised to floor"
+        elif wait > ceiling:
+            wait = ceiling
+            reason += ", lowered to ceiling"
+
+        if self.min_wait is not None:
+            min_wait = self.min_wait()
+            if wait < min_wait:
+                wait = min_wait
+                reason += ", stretched to fit the quota"
+
+        decided_at = self.clock()
+        newest_message_lag = (
+            (decided_at - newest_published_at).total_seconds()
+            if newest_published_at
+            else None
+        )
+        decision = PollDecision(
+            decided_at=decided_at,
+            server_hint=server_hint,
+            wait=wait,
+            reason=reason,
+            messages_in_page=messages_in_page,
+            questions_open=questions_open,
+            newest_message_lag=newest_message_lag,
+            page_processing_ns=page_processing_ns,
+        )
+        self.decisions.append(decision)
+        log.debug(f"Poll decision: {decision}")
+        return wait
+
+
 # Workaround https://bit.ly/3pu44bx
 class MemoryCache(Cache):
     _CACHE = {}
@@ -61,64 +246,272 @@ class MemoryCache(Cache):
         MemoryCache._CACHE[url] = content
 
 
+def has_static_discovery_document() -> bool:
+    """Whether the installed googleapiclient bundles the youtube discovery document (no network needed)"""
+    return (
+        get_static_doc is not None
+        and get_static_doc(API_SERVICE_NAME, API_VERSION) is not None
+    )
+
+
+class DiskCache(MemoryCache):
+    """
+    Discovery documents persisted under the resources directory so `build` doesn't fetch them on every app launch,
+    only used by googleapiclient versions that don't bundle the document (see `has_static_discovery_document`).
+    Entries are discarded when older than `ttl_seconds` or when they were stored by a different googleapiclient
+    version. The in-process dict (MemoryCache) is still used in front of the disk.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        ttl_seconds: float = DISCOVERY_CACHE_TTL_DAYS * 24 * 60 * 60,
+    ):
+        self.directory = directory or get_resource(DISCOVERY_CACHE_DIRECTORY)
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, url: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def get(self, url):
+        content = super().get(url)
+        if content is not None:
+            return content
+
+        entry_path = self._entry_path(url)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except FileNotFoundError:
+            log.debug(f"Discovery document not cached on disk for: {url}")
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Unreadable discovery cache entry: {entry_path}, {e}")
+            return None
+
+        if (
+            entry.get("url") != url
+            or entry.get("version") != googleapiclient_version
+            or time.time() - entry.get("stored_at", 0) > self.ttl_seconds
+        ):
+            log.debug(f"Discovery cache entry for: {url} is stale, discarding it")
+            return None
+
+        log.debug(f"Discovery document for: {url} loaded from: {entry_path}")
+        content = entry["content"]
+        super().set(url, content)
+        return content
+
+    def set(self, url, content):
+        super().set(url, content)
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        entry = {
+            "url": url,
+            "version": googleapiclient_version,
+            "stored_at": time.time(),
+            "content": content,
+        }
+        entry_path = self._entry_path(url)
+        temporary_path = entry_path + ".tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as entry_file:
+                json.dump(entry, entry_file)
+            # Atomic, a crash while writing never leaves a half written entry behind
+            os.replace(temporary_path, entry_path)
+        except OSError as e:
+            log.warning(f"Unable to persist discovery document for: {url}, {e}")
+
+
 class YoutubeStreamThreadControl(StreamerThreadControl):
     def __init__(
         self,
         questions_control_queue: Queue,
-        live_chat_record_file: str,
+        live_chat_record: LiveChatRecordWriter,
         db_filename=None,
+        armed_chat: Optional["YoutubeLiveChat"] = None,
     ):
+        """`armed_chat` is a main chat already looked up (see `LiveChatArmer`), there's no lookup then"""
         super().__init__(name="YoutubeStreamThread")
-        # Controls the periodicity of the call to get the live chat comments/questions
-        self._sleepperiod = 7.0
         self.set_youtube_thread_control_variables(
-            questions_control_queue, live_chat_record_file, db_filename
+            questions_control_queue, live_chat_record, db_filename, armed_chat
         )
 
     def set_youtube_thread_control_variables(
-        self, questions_control_queue, live_chat_record_file, db_filename
+        self, questions_control_queue, live_chat_record, db_filename, armed_chat=None
     ):
-        self.youtube_service = YoutubeLiveChat(
-            live_chat_record_file=live_chat_record_file,
-            channel_id=YOUTUBE_CHANNEL_ID,
-            db_filename=db_filename,
-        )
-        self.questions_control_queue = questions_control_queue
+        if armed_chat is not None:
+            armed_chat.start_armed(live_chat_record)
+            self.youtube_service = armed_chat
+        else:
+            self.youtube_service = YoutubeLiveChat(
+                live_chat_record=live_chat_record,
+                channel_id=YOUTUBE_CHANNEL_ID,
+                db_filename=db_filename,
+            )
+        chats = {MAIN_CHAT_NAME: self.youtube_service}
+        if YOUTUBE_EXTRA_LIVE_VIDEO_IDS and self.youtube_service.cassette:
+            # A cassette holds the calls of a single chat
+            log.warning("Extra live chats are ignored while using a cassette")
+        else:
+            for video_id in YOUTUBE_EXTRA_LIVE_VIDEO_IDS:
+                chat = self.create_extra_live_chat(live_chat_record, video_id)
+                if chat is not None:
+                    chats[video_id] = chat
+        if self.youtube_service.quota_ledger:
+            self.youtube_service.quota_ledger.live_chats_polled = len(chats)
+        self.ingestion_engine = LiveChatIngestionEngine(chats, questions_control_queue)
+
+    def create_extra_live_chat(
+        self, live_chat_record: LiveChatRecordWriter, video_id: str
+    ) -> Optional["YoutubeLiveChat"]:
+        """Extra chats share the database of the main one, one not being live doesn't stop the streaming"""
+        try:
+            chat = YoutubeLiveChat(
+                live_chat_record=live_chat_record,
+                channel_id=YOUTUBE_CHANNEL_ID,
+                video_id=video_id,
+                db_filename=self.youtube_service.db_filename,
+                db=self.youtube_service.db,
+                chat_label=video_id,
+                dedup_cache=self.youtube_service.dedup_cache,
+                quota_ledger=self.youtube_service.quota_ledger,
+            )
+        except Exception:
+            log.exception(f"Unable to set up the extra live chat of video: {video_id}")
+            return None
+        if not chat.live_chat_id:
+            log.warning(f"No active live chat found for extra video: {video_id}")
+            return None
+        return chat
+
+    def run(self):
+        """Main control loop, every live chat is polled by the ingestion engine"""
+        try:
+            asyncio.run(self.ingestion_engine.run(self._stopevent))
+        finally:
+            if self.quota_ledger:
+                self.quota_ledger.close()
+            # The tail of the recording gets written
+            if self.youtube_service.cassette_recorder:
+                self.youtube_service.cassette_recorder.close()
+
+    @property
+    def quota_ledger(self) -> Optional[QuotaLedger]:
+        return self.youtube_service.quota_ledger
+
+    @property
+    def poll_scheduler(self) -> PollScheduler:
+        return self.youtube_service.poll_scheduler
+
+    @property
+    def actual_start_time_future(self) -> "Future[datetime]":
+        return self.youtube_service.actual_start_time_future
+
+    @property
+    def broadcast_ended(self) -> Optional[str]:
+        """Why the thread stopped by itself (the broadcast ended), None if it didn't"""
+        return self.ingestion_engine.ended_reason
+
+    @property
+    def ingestion_stats(self) -> list[ChatIngestionStats]:
+        """Per chat throughput and lag"""
+        return self.ingestion_engine.stats_snapshot()
+
+
+class LiveChatArmer(StreamerThreadControl):
+    """
+    Armed mode: right after launch the youtube client is set up and the live chat is looked up in the background,
+    every `poll_seconds` until the broadcast goes live. Start Stream then takes the armed chat, no lookup.
+    """
+
+    def __init__(
+        self, db_filename: str = None, poll_seconds: float = YOUTUBE_ARMED_POLL_SECONDS
+    ):
+        super().__init__(name="YoutubeLiveChatArmer")
+        self.db_filename = db_filename
+        self.poll_seconds = poll_seconds
+        # Seconds the client set up and the successful lookup took, what Start Stream doesn't have to wait for
+        self.time_saved_seconds: Optional[float] = None
+        self.armed_at: Optional[float] = None
+        self._armed_chat: Optional[YoutubeLiveChat] = None
+        self._lock = Lock()
 
     def run(self):
-        """Main control loop"""
-        open_questions_start_time = None
-        session_questions_limit = 0
+        setup_started = time.perf_counter()
+        try:
+            chat = YoutubeLiveChat(
+                live_chat_record=None,
+                channel_id=YOUTUBE_CHANNEL_ID,
+                db_filename=self.db_filename,
+                lookup_live_chat=False,
+            )
+        except Exception:
+            log.exception("Armed mode: unable to set up the youtube client")
+            return
+        setup_seconds = time.perf_counter() - setup_started
+
         while not self._stopevent.is_set():
-            if self.questions_control_queue.empty():
-                log.debug("No value in queue")
-            else:
-                open_questions = self.questions_control_queue.get()
-                if open_questions:
-                    open_questions_start_time = datetime.utcnow()
-                    log.debug(
-                        f"Setting open_questions_start_time to: {open_questions_start_time}"
+            lookup_started = time.perf_counter()
+            try:
+                chat.lookup_live_chat()
+            except (UnableToGetVideoId, UnableToGetLiveChatId) as error:
+                log.debug(f"Armed mode: the broadcast is not live yet, {error}")
+            except Exception:
+                log.exception("Armed mode: live chat lookup failed")
+
+            if chat.live_chat_id:
+                with self._lock:
+                    self.time_saved_seconds = (
+                        setup_seconds + time.perf_counter() - lookup_started
                     )
-                    # Number of questions to be fetch per session
-                    session_questions_limit = open_questions[-1]
-                else:
-                    open_questions_start_time = None
-
-                log.debug(f"Open questions queue value: {open_questions}")
-            self.youtube_service.get_live_chat_messages_threaded(
-                open_questions_start_time, session_questions_limit
-            )
-            # Make the thread sleep so the main thread (gui `controller`) gets to run as well.
-            self._stopevent.wait(self._sleepperiod)
+                    self.armed_at = time.monotonic()
+                    self._armed_chat = chat
+                log.info(
+                    f"Armed mode: live chat: {chat.live_chat_id} ready (resumed: {chat.resumed}), "
+                    f"set up and lookup took: {self.time_saved_seconds:.2f}s"
+                )
+                return
+            self._stopevent.wait(self.poll_seconds)
+
+        if chat.quota_ledger:
+            chat.quota_ledger.close()
+        if chat.cassette_recorder:
+            chat.cassette_recorder.close()
+
+    def take(self) -> Optional["YoutubeLiveChat"]:
+        """The armed chat, None if the live chat wasn't found (yet), the lookup stops either way"""
+        self._stopevent.set()
+        with self._lock:
+            armed_chat, self._armed_chat = self._armed_chat, None
+        return armed_chat
 
 
 class YoutubeLiveChat:
     def __init__(
         self,
-        live_chat_record_file: str,
+        live_chat_record: Optional[LiveChatRecordWriter],
         channel_id: str = None,
         db_filename: str = None,
+        cassette: Optional[Cassette] = None,
+        video_id: str = None,
+        db: Optional[DBInteractions] = None,
+        chat_label: str = None,
+        dedup_cache: Optional[MessageDedupCache] = None,
+        quota_ledger: Optional[QuotaLedger] = None,
+        lookup_live_chat: bool = True,
     ):
+        """
+        `cassette` (record or replay of the api calls) defaults to the one set through env vars, if any.
+        `video_id` (a live video) takes precedence over LIVE_VIDEO_ID and the channel lookup.
+        `db`, `dedup_cache` and `quota_ledger` allow several chats to share the database counters, duplicates filter
+        and quota (the database writer is shared per file anyway), `chat_label` prefixes the chat lines of this chat
+        in the feed.
+        `lookup_live_chat` False leaves the live chat lookup to a later `lookup_live_chat()` call (armed mode).
+        """
         log.debug(f"PRIVATE_TESTING envvar is set to {PRIVATE_TESTING}")
 
         is_own_channel = True if PRIVATE_TESTING == "yes" else False
@@ -127,36 +520,198 @@ class YoutubeLiveChat:
             raise ValueError(
                 "channel_id nor own_channel where set.." "set one at least"
             )
-        log.debug(f"Passed live_chat_record_file: {live_chat_record_file}")
+        log.debug(f"Passed live_chat_record: {live_chat_record}")
         self.live_stream_actual_start_time: datetime = None
+        # Resolved with the live stream actualStartTime as soon as it's known, while looking for the live_chat_id
+        self.actual_start_time_future: "Future[datetime]" = Future()
         db_file = db_filename if db_filename else DATABASE_NAME
-        self.service = self.get_authenticated_service_using_oath()
+        self.cassette = cassette if cassette is not None else open_cassette_from_env()
+        self.cassette_player: Optional[CassettePlayer] = (
+            self.cassette if isinstance(self.cassette, CassettePlayer) else None
+        )
+        self.cassette_recorder: Optional[CassetteRecorder] = (
+            self.cassette if isinstance(self.cassette, CassetteRecorder) else None
+        )
+        # Shared by the chats of a co-stream (one quota per project), no quota is spent when replaying a cassette
+        # nor against the stand-in api (load tests, the quota day ledger only holds real calls)
+        self.quota_ledger: Optional[QuotaLedger] = (
+            None
+            if self.cassette_player or YOUTUBE_API_ROOT_URL
+            else quota_ledger
+            if quota_ledger is not None
+            else QuotaLedger()
+        )
+        self.credentials = None
+        # When replaying a cassette there is no network access at all (no authentication either)
+        self.service = (
+            None if self.cassette_player else self.get_authenticated_service_using_oath()
+        )
+        # Only used (optionally) for the live chat polling, the rest of the calls go through `self.service`
+        self.lean_transport: Optional[LeanLiveChatTransport] = (
+            LeanLiveChatTransport(self.credentials)
+            if YOUTUBE_LEAN_TRANSPORT and not self.cassette_player
+            else None
+        )
         self.channel_id = channel_id
+        self.chat_label = chat_label
+        # Key of the persisted polling state of this chat (session db)
+        self.chat_key = chat_label or MAIN_CHAT_NAME
+        self.video_id = video_id or LIVE_VIDEO_ID
+        self.is_own_channel = is_own_channel
+        self.db_filename = db_file
+        # Reads (resume state, limits checks), the questions are stored by the database writer
+        self.db = db if db is not None else DBInteractions(db_filename=db_file)
+        self.ingestion_bus = get_ingestion_bus(db_file)
+        self.live_chat_id: Optional[str] = None
+        # Video id of the broadcast the live chat belongs to, known once the live chat id is looked up
+        self.broadcast_video_id: Optional[str] = None
+        # Set once the broadcast is over (offlineAt, liveChatEnded, no activeLiveChatId), the polling stops
+        self.ended_reason: Optional[str] = None
+        self.live_messages_page_token: str = None
+        # Id of the last message read, persisted with the page token
+        self.last_message_id: Optional[str] = None
+        # Set when resuming: messages up to this id (included) were already processed before the restart
+        self.resumed_last_message_id: Optional[str] = None
+        self._resumed_actual_start_time: Optional[datetime] = None
+        # Own channel broadcasts already looked up, not used with a cassette (every call has to be there)
+        self.live_broadcast_cache: Optional[LiveBroadcastCache] = (
+            None if self.cassette or YOUTUBE_API_ROOT_URL else LiveBroadcastCache()
+        )
+        # Set while the live chat id in use comes from the cache, until its first page is fetched
+        self.cached_broadcast_id: Optional[str] = None
+
+        self.resumed = False
+        self.start_time = datetime.utcnow()
+        if lookup_live_chat:
+            self.lookup_live_chat()
+        if self.cassette_recorder:
+            self.cassette_recorder.record_start_time(self.start_time)
+        log.debug(f"YoutubeLiveChat start time: {self.start_time}")
+        # Chat lines (not questions) go to the GUI feed and the record file through this writer
+        self.live_chat_record = live_chat_record
+        if self.quota_ledger and not self.chat_label:
+            # The main chat sets when the stream started (kept when resuming)
+            self.quota_ledger.start_stream(self.start_time)
+        self.poll_scheduler = PollScheduler(
+            clock=self.now,
+            min_wait=self.quota_ledger.min_poll_interval if self.quota_ledger else None,
+        )
+        self.classifier = MessageClassifier()
+        self.dedup_cache = (
+            dedup_cache if dedup_cache is not None else MessageDedupCache(DEDUP_CACHE_SIZE)
+        )
+        self.ingestion_bus.add_dedup_cache(self.dedup_cache)
+
+    def lookup_live_chat(self) -> None:
+        """Resumes the saved polling state, otherwise looks for the live chat id (messages count from now)"""
+        # A cassette has its own sequence of calls, it never resumes
+        self.resumed = self.cassette is None and self.resume_live_chat_state()
+        if not self.resumed:
+            self.resolve_live_chat_id()
+            if self.cassette_player and self.cassette_player.start_time:
+                self.start_time = self.cassette_player.start_time
+            else:
+                self.start_time = datetime.utcnow()
+
+    def start_armed(self, live_chat_record: Optional[LiveChatRecordWriter]) -> None:
+        """
+        A chat armed (live chat looked up) before Start Stream is clicked: the messages count from now, unless the
+        polling was resumed
+        """
+        self.live_chat_record = live_chat_record
+        if not self.resumed:
+            self.start_time = datetime.utcnow()
+        log.debug(f"YoutubeLiveChat (armed) start time: {self.start_time}")
+        if self.quota_ledger and not self.chat_label:
+            self.quota_ledger.start_stream(self.start_time)
 
-        if LIVE_VIDEO_ID:
+    def resolve_live_chat_id(self, use_cache: bool = True) -> None:
+        if self.video_id:
             try:
                 log.warning(
-                    f"Trying to find chat id using the manually given live video id: {LIVE_VIDEO_ID}"
+                    f"Trying to find chat id using the manually given live video id: {self.video_id}"
                 )
                 self.live_chat_id = self.get_active_live_chat_id_via_channel_id(
-                    video_id=LIVE_VIDEO_ID
+                    video_id=self.video_id
                 )
             except Exception:
                 log.exception(
-                    f"Not live_chat_id was found with the ENV VAR given live_video_id: {LIVE_VIDEO_ID}"
+                    f"Not live_chat_id was found with the given live_video_id: {self.video_id}"
                 )
         else:
             self.live_chat_id = (
-                self.get_unlisted_video_live_chat_id()
-                if is_own_channel
+                self.get_unlisted_video_live_chat_id(use_cache)
+                if self.is_own_channel
                 else self.get_active_live_chat_id_via_channel_id()
             )
 
-        self.start_time = datetime.utcnow()
-        log.debug(f"YoutubeLiveChat start time: {self.start_time}")
-        self.live_chat_record_file = live_chat_record_file
-        self.live_messages_page_token: str = None
-        self.db = DBInteractions(db_filename=db_file)
+    def resume_live_chat_state(self) -> bool:
+        """
+        Picks up the polling where a previous run left it (same session db), if it was saved recently enough.
+        The live chat id lookup is skipped and the next page is the one following the last page processed.
+        """
+        if not LIVE_CHAT_RESUME_MAX_AGE_MINUTES:
+            return False
+        state = self.db.get_live_chat_state(self.chat_key)
+        if state is None:
+            return False
+
+        saved_ago = datetime.utcnow() - state.updated_ts
+        if saved_ago > timedelta(minutes=LIVE_CHAT_RESUME_MAX_AGE_MINUTES):
+            log.debug(f"Not resuming live chat: {state.live_chat_id}, saved {saved_ago} ago")
+            return False
+
+        log.info(
+            f"Resuming live chat: {state.live_chat_id} (saved {saved_ago} ago), "
+            f"page token: {state.page_token}, last message id: {state.last_message_id}"
+        )
+        self.live_chat_id = state.live_chat_id
+        self.live_messages_page_token = state.page_token
+        self.start_time = state.start_time
+        self.last_message_id = state.last_message_id
+        self.resumed_last_message_id = state.last_message_id
+        # Only trusted once the first resumed page is fetched
+        self._resumed_actual_start_time = state.actual_start_time
+        return True
+
+    def live_chat_state(self) -> Optional[LiveChatStateTuple]:
+        """Where the polling is, saved along every page processed (not while replaying a cassette)"""
+        if self.cassette_player or not self.live_chat_id:
+            return None
+        return LiveChatStateTuple(
+            chat_key=self.chat_key,
+            live_chat_id=self.live_chat_id,
+            page_token=self.live_messages_page_token,
+            start_time=self.start_time,
+            actual_start_time=self.live_stream_actual_start_time,
+            last_message_id=self.last_message_id,
+            updated_ts=datetime.utcnow(),
+        )
+
+    def now(self) -> datetime:
+        """Current utc time, when replaying a cassette it's the replay clock"""
+        if self.cassette_player:
+            return self.cassette_player.now()
+        return datetime.utcnow()
+
+    def real_wait(self, seconds: float) -> float:
+        """Seconds to actually wait for a given wait, accelerated when replaying a cassette"""
+        if self.cassette_player:
+            return self.cassette_player.scale_wait(seconds)
+        return seconds
+
+    def _execute_api_call(
+        self, call_name: str, params: dict, execute: Callable[[], dict]
+    ) -> dict:
+        """Single point every youtube call goes through, so it can be recorded, replayed and its cost accounted"""
+        if self.cassette_player:
+            return self.cassette_player.next_response(call_name)
+        if self.quota_ledger:
+            self.quota_ledger.record(call_name)
+        response = execute()
+        if self.cassette_recorder:
+            self.cassette_recorder.record(call_name, params, response)
+        return response
 
     # TODO: move this method to a different class or make it a module's method
     # (no need to be inside YoutubeLiveChat)
@@ -180,6 +735,9 @@ class YoutubeLiveChat:
     # TODO: move this method to a different class or make it a module's method
     # (no need to be inside YoutubeLiveChat)
     def get_authenticated_service_using_oath(self):
+        if YOUTUBE_API_ROOT_URL:
+            return self.get_stand_in_service()
+
         credentials = self.get_credentials()
         if not credentials or not credentials.valid:
             if credentials and credentials.expired and credentials.refresh_token:
@@ -200,8 +758,43 @@ class YoutubeLiveChat:
                 credentials = flow.credentials
                 self.save_credentials(credentials)
 
+        self.credentials = credentials
+        if has_static_discovery_document():
+            # The document bundled with googleapiclient, nothing is fetched
+            return build(
+                API_SERVICE_NAME,
+                API_VERSION,
+                credentials=credentials,
+                static_discovery=True,
+            )
+        # Older clients fetch the document, the disk cache spares the fetch on the next launches
         return build(
-            API_SERVICE_NAME, API_VERSION, credentials=credentials, cache=MemoryCache()
+            API_SERVICE_NAME, API_VERSION, credentials=credentials, cache=DiskCache()
+        )
+
+    def refresh_credentials(self) -> None:
+        """
+        Refreshes the access token in place after an authorization error, the service and the lean transport hold
+        the same credentials object so they are kept (no new authentication flow, no rebuild)
+        """
+        if self.cassette_player or YOUTUBE_API_ROOT_URL or self.credentials is None:
+            return
+        log.warning("Refreshing access token after an authorization error...")
+        self.credentials.refresh(Request())
+        self.save_credentials(self.credentials)
+
+    def get_stand_in_service(self):
+        """Service pointing to YOUTUBE_API_ROOT_URL, no authentication and the discovery document bundled with
+        googleapiclient (static), so nothing reaches google"""
+        log.warning(f"Using the youtube api stand-in at: {YOUTUBE_API_ROOT_URL}")
+        self.credentials = AnonymousCredentials()
+        return build(
+            API_SERVICE_NAME,
+            API_VERSION,
+            credentials=self.credentials,
+            # The method paths of the discovery document already start with youtube/v3
+            client_options={"api_endpoint": f"{YOUTUBE_API_ROOT_URL.rstrip('/')}/"},
+            static_discovery=True,
         )
 
     # Not currently used
@@ -226,19 +819,32 @@ class YoutubeLiveChat:
 
     def get_video_id_no_api(self) -> str:
         log.debug("Getting video_id NOT using youtube api")
-        youtube_live_stream_reply = requests.get(LIVE_STREAM_TARGET_URL)
-        match = re.search(
-            PATTERN_TO_FIND_VIDEO_ID_USING_REQUESTS, youtube_live_stream_reply.text
+        response = self._execute_api_call(
+            CHANNEL_LIVE_PAGE,
+            {"url": LIVE_STREAM_TARGET_URL},
+            YoutubeLiveChat._scrape_video_id_from_live_page,
         )
-        if match:
-            video_id = match.group("video_id")
-        else:
+        video_id = response["video_id"]
+        if not video_id:
             raise UnableToGetVideoId(
                 f"For channel ID: {self.channel_id} no live video_id was detected using the NO api method"
                 "\nMAKE SURE YOU ARE:\n1.- Live streaming already\n2.- The live stream video is SET to PUBLIC."
             )
         return video_id
 
+    @staticmethod
+    def _scrape_video_id_from_live_page() -> dict:
+        # The html is streamed, the download stops as soon as the video id shows up
+        with get_http_session().get(
+            LIVE_STREAM_TARGET_URL, stream=True, timeout=HTTP_TIMEOUT_SECONDS
+        ) as youtube_live_stream_reply:
+            match = search_streamed_response(
+                youtube_live_stream_reply,
+                PATTERN_TO_FIND_VIDEO_ID_USING_REQUESTS,
+                VIDEO_ID_MATCH_MAX_LENGTH,
+            )
+        return {"video_id": match.group("video_id") if match else None}
+
     def get_active_live_chat_id_via_channel_id(self, video_id: str = None) -> str:
         """Since live chat """
         # This works for unlisted videos too
@@ -250,37 +856,130 @@ class YoutubeLiveChat:
         log.debug(f"video_id: {video_id}")
         # https://developers.google.com/youtube/v3/determine_quota_cost
         # Quota: videos().list(...) == 1
-        search_for_active_live_chat_id = self.service.videos().list(
-            part="snippet, liveStreamingDetails", id=video_id
+        params = dict(part="snippet, liveStreamingDetails", id=video_id)
+        response = self._execute_api_call(
+            VIDEOS_LIST, params, lambda: self.service.videos().list(**params).execute()
         )
-        response = search_for_active_live_chat_id.execute()
         log.debug(f"Search for active live chat id response: {response}")
 
         item_of_interest = response["items"][0]
         log.debug(f"Item of interest: {item_of_interest}")
 
-        live_chat_id = item_of_interest["liveStreamingDetails"]["activeLiveChatId"]
+        live_streaming_details = item_of_interest["liveStreamingDetails"]
+        # Only there while the broadcast is live
+        live_chat_id = live_streaming_details.get("activeLiveChatId")
+        if not live_chat_id:
+            raise UnableToGetLiveChatId(
+                f"The video: {video_id} has no active live chat, the broadcast is over or didn't start yet"
+            )
         log.debug(f"live chat id: {live_chat_id}")
-        actual_start_time = item_of_interest["liveStreamingDetails"]["actualStartTime"]
+        self.broadcast_video_id = video_id
+        actual_start_time = live_streaming_details["actualStartTime"]
         self._set_actual_start_time(actual_start_time)
 
         return live_chat_id
 
-    def get_unlisted_video_live_chat_id(self) -> str:
+    def broadcast_is_live(self) -> bool:
+        """
+        Checks the broadcast the live chat belongs to (videos.list, 1 unit), sets `ended_reason` if it's over.
+        Always live when replaying a cassette or when the video id is not known (i.e. resumed polling).
+        """
+        if self.cassette_player or not self.broadcast_video_id:
+            return True
+        params = dict(part="liveStreamingDetails", id=self.broadcast_video_id)
+        response = self._execute_api_call(
+            VIDEOS_LIST, params, lambda: self.service.videos().list(**params).execute()
+        )
+        items = response.get("items")
+        live_streaming_details = items[0].get("liveStreamingDetails", {}) if items else {}
+        if not live_streaming_details.get("activeLiveChatId"):
+            self.ended_reason = (
+                f"no active live chat for video: {self.broadcast_video_id}"
+                f" (ended at: {live_streaming_details.get('actualEndTime')})"
+            )
+            return False
+        return True
+
+    def get_unlisted_video_live_chat_id(self, use_cache: bool = True) -> str:
+        """
+        Own channel live chat id: the broadcast cache first (no api call), then the active broadcasts only
+        (1 call) and, if none is found that way, paging through all the broadcasts of the channel
+        """
+        if use_cache and self.live_broadcast_cache:
+            cached_broadcast = self.live_broadcast_cache.latest()
+            if cached_broadcast:
+                log.info(
+                    f"Using the cached broadcast: {cached_broadcast.broadcast_id}, "
+                    f"live chat id: {cached_broadcast.live_chat_id}"
+                )
+                self.cached_broadcast_id = cached_broadcast.broadcast_id
+                self.broadcast_video_id = cached_broadcast.broadcast_id
+                # Only trusted once the first page of the cached live chat is fetched
+                self._resumed_actual_start_time = parse_actual_start_time(
+                    cached_broadcast.actual_start_time
+                )
+                return cached_broadcast.live_chat_id
+
+        live_broadcast = (
+            self.get_active_live_broadcast() or self.find_live_broadcast_paging()
+        )
+        if live_broadcast is None:
+            raise UnableToGetLiveChatId(
+                "No live_chat_id was detected for api call youtube#liveBroadcastListResponse."
+                "\nMAKE SURE YOU ARE: \n1.- Live streaming already\n2.- The live stream video is SET to PUBLIC."
+            )
+
+        live_chat_id = live_broadcast["snippet"]["liveChatId"]
+        actual_start_time = live_broadcast["snippet"]["actualStartTime"]
+        self.broadcast_video_id = live_broadcast["id"]
+        self._set_actual_start_time(actual_start_time)
+        if self.live_broadcast_cache:
+            self.live_broadcast_cache.put(
+                self.broadcast_video_id, live_chat_id, actual_start_time
+            )
+        return live_chat_id
+
+    def get_active_live_broadcast(self) -> Optional[dict]:
+        # https://developers.google.com/youtube/v3/live/docs/liveBroadcasts/list
+        # Quota: liveBroadcasts().list(...) == 1, `broadcastStatus` implies the authenticated user's broadcasts
+        params = dict(
+            part="id, snippet, status",
+            broadcastStatus="active",
+            broadcastType="all",
+            maxResults=LIVE_BROADCASTS_LIST_MAX_RESULTS,
+        )
+        response = self._execute_api_call(
+            LIVE_BROADCASTS_LIST,
+            params,
+            lambda: self.service.liveBroadcasts().list(**params).execute(),
+        )
+        log.debug(f"Active broadcasts response was: \n{response}")
+        for item in response.get("items", []):
+            if item["snippet"].get("liveChatId"):
+                log.debug(f"Active broadcast found: {item['id']}")
+                return item
+        log.warning("No active broadcast found, looking through all the broadcasts")
+        return None
+
+    def find_live_broadcast_paging(self) -> Optional[dict]:
         # https://developers.google.com/youtube/v3/live/docs/liveBroadcasts#resource
         live_broadcast_next_token = None
         number_of_executions = 1
         log.debug("Getting own channel live chat id for private testing")
 
         while True:
-            request = self.service.liveBroadcasts().list(
+            params = dict(
                 part="snippet, status",
                 mine=True,
                 broadcastType="all",
                 maxResults=LIVE_BROADCASTS_LIST_MAX_RESULTS,
                 pageToken=live_broadcast_next_token,
             )
-            response = request.execute()
+            response = self._execute_api_call(
+                LIVE_BROADCASTS_LIST,
+                params,
+                lambda: self.service.liveBroadcasts().list(**params).execute(),
+            )
             total_results_pagination = int(response["pageInfo"]["totalResults"])
             log.debug(f"Response was: \n{response}")
 
@@ -289,18 +988,12 @@ class YoutubeLiveChat:
 
             live_broadcast_next_token = response["nextPageToken"]
             log.debug(f"Next token: {live_broadcast_next_token}")
-            if response["items"] and any(
-                item["status"]["lifeCycleStatus"] == "live"
-                for item in response["items"]
-            ):
-                log.debug(
-                    "Item with lifeCycleStatus `live` inside liveBroadcasts list found!}"
-                )
-                for item in response["items"]:
-                    if item["status"]["lifeCycleStatus"] == "live":
-                        live_chat_id = item["snippet"]["liveChatId"]
-                        self._set_actual_start_time(item["snippet"]["actualStartTime"])
-                        return live_chat_id
+            for item in response["items"]:
+                if item["status"]["lifeCycleStatus"] == "live":
+                    log.debug(
+                        "Item with lifeCycleStatus `live` inside liveBroadcasts list found!"
+                    )
+                    return item
 
             if (
                 LIVE_BROADCASTS_LIST_MAX_RESULTS * number_of_executions
@@ -310,20 +1003,19 @@ class YoutubeLiveChat:
             number_of_executions += 1
             time.sleep(0.3)
 
-        raise UnableToGetLiveChatId(
-            f"No live_chat_id was detected for api call {response['kind']}."
-            "\nMAKE SURE YOU ARE: \n1.- Live streaming already\n2.- The live stream video is SET to PUBLIC."
-        )
+        return None
 
     def _set_actual_start_time(self, actual_start_time: str) -> None:
         log.debug(f"Given actual_start_time: {actual_start_time}")
-        actual_start_time = actual_start_time.strip("Z").split(".")[0]
-        self.live_stream_actual_start_time: datetime = datetime.fromisoformat(
-            actual_start_time
-        )
+        self._resolve_actual_start_time(parse_actual_start_time(actual_start_time))
+
+    def _resolve_actual_start_time(self, actual_start_time: datetime) -> None:
+        self.live_stream_actual_start_time: datetime = actual_start_time
         log.debug(
             f"live_stream_actual_start_time (sanitized): {self.live_stream_actual_start_time}"
         )
+        if not self.actual_start_time_future.done():
+            self.actual_start_time_future.set_result(self.live_stream_actual_start_time)
 
     def get_actual_start_time(self) -> datetime:
         return self.live_stream_actual_start_time
@@ -332,101 +1024,249 @@ class YoutubeLiveChat:
         self,
         open_questions_start_time: Optional[datetime],
         session_questions_limit: int,
-    ) -> None:
+    ) -> float:
+        """Fetches and processes one page of live chat messages, returns the seconds to wait before the next call"""
+        return self.process_live_chat_page(
+            self.fetch_live_chat_page(),
+            open_questions_start_time,
+            session_questions_limit,
+        )
+
+    def fetch_live_chat_page(self) -> dict:
+        """Only the api call (network), no database access, it can run in a worker thread"""
+        # A live chat id just looked up is trusted, a resumed or cached one is checked with its first page
+        if not self.resumed and not self.cached_broadcast_id:
+            return self._fetch_live_chat_page()
+
+        try:
+            response = self._fetch_live_chat_page()
+        except Exception as error:
+            # Transient errors are retried by the caller with the same (resumed) page token
+            if classify_api_error(error) not in (
+                ApiErrorKind.CHAT_ENDED,
+                ApiErrorKind.FATAL,
+            ):
+                raise
+            # i.e. the resumed live chat ended or the page token is no longer valid, start over
+            log.exception(
+                f"Unable to resume live chat: {self.live_chat_id}, looking for the live chat again"
+            )
+            return self._start_over()
+
+        if self.cached_broadcast_id and response.get("offlineAt"):
+            log.warning(
+                f"Cached broadcast: {self.cached_broadcast_id} is over, looking for the live chat again"
+            )
+            return self._start_over()
+
+        self.resumed = False
+        self.cached_broadcast_id = None
+        if self._resumed_actual_start_time is not None:
+            self._resolve_actual_start_time(self._resumed_actual_start_time)
+        return response
+
+    def _start_over(self) -> dict:
+        """Drops the resumed/cached live chat, looks it up again (no cache) and fetches its first page"""
+        if self.cached_broadcast_id:
+            self.live_broadcast_cache.discard(self.cached_broadcast_id)
+            self.cached_broadcast_id = None
+        if self.resumed:
+            self.resumed = False
+            self.live_messages_page_token = None
+            self.last_message_id = None
+            self.resumed_last_message_id = None
+            self.start_time = datetime.utcnow()
+        self._resumed_actual_start_time = None
+        self.resolve_live_chat_id(use_cache=False)
+        return self._fetch_live_chat_page()
+
+    def _fetch_live_chat_page(self) -> dict:
         # https://developers.google.com/youtube/v3/live/docs/liveChatMessages/list
         # Quota == 1 (?)
-        # TODO: add try-except clause here for the client call
-        request = self.service.liveChatMessages().list(
+        # Errors are retried by the ingestion engine, see `api_errors.ApiRetryPolicy`
+        params = dict(
             liveChatId=self.live_chat_id,
             part="snippet, authorDetails",
             pageToken=self.live_messages_page_token,
         )
-        response = request.execute()
-        if not response["items"]:
+        if self.lean_transport:
+            response = self._execute_api_call(
+                LIVE_CHAT_MESSAGES_LIST,
+                params,
+                lambda: self.lean_transport.list_live_chat_messages(
+                    self.live_chat_id, self.live_messages_page_token
+                ),
+            )
+        else:
+            response = self._execute_api_call(
+                LIVE_CHAT_MESSAGES_LIST,
+                params,
+                lambda: self.service.liveChatMessages().list(**params).execute(),
+            )
+        return response
+
+    def process_live_chat_page(
+        self,
+        response: dict,
+        open_questions_start_time: Optional[datetime],
+        session_questions_limit: int,
+    ) -> float:
+        """Classifies and stores one fetched page, returns the seconds to wait before the next call"""
+        page_processing_started = time.perf_counter_ns()
+        questions_open = open_questions_start_time is not None
+        polling_interval_millis = response.get("pollingIntervalMillis")
+        # With a `fields` mask (lean transport) an empty list of items is not part of the response
+        items: list[dict] = response.get("items", [])
+        # Empty pages also move the page token forward
+        self.live_messages_page_token = response.get(
+            "nextPageToken", self.live_messages_page_token
+        )
+        # Only part of the response once the live chat went offline, what's left in the page is still processed
+        offline_at: Optional[str] = response.get("offlineAt")
+        if offline_at:
+            self.ended_reason = f"live chat offline at: {offline_at}"
+        if items and self.resumed_last_message_id:
+            items = self._skip_already_processed(items)
+        if items:
+            self.last_message_id = items[-1].get("id", self.last_message_id)
+        if not items:
             log.debug("No messages where found in this query")
-            return
+            self._end_record_page()
+            self.ingestion_bus.submit_questions([], self.live_chat_state())
+            return self.poll_scheduler.next_wait(
+                polling_interval_millis,
+                0,
+                questions_open,
+                page_processing_ns=time.perf_counter_ns() - page_processing_started,
+            )
+
+        newest_published_at: Optional[datetime] = None
+        # Accepted questions of this page, they are stored all at once (single transaction) after the page is read
+        page_questions: list[NewQuestion] = []
+        # Questions of this page per user, and how many of them are not super chats
+        page_questions_by_user: Counter = Counter()
+        page_regular_questions = 0
+        # Pages are ordered by publishedAt, messages older than the datetime on which the Start Stream button was
+        # clicked can only be at the start of the page
+        stale_messages = self.classifier.stale_prefix_length(
+            [message["snippet"]["publishedAt"] for message in items], self.start_time
+        )
+        if stale_messages:
+            log.debug(f"Skipping {stale_messages} stale messages")
 
-        self.live_messages_page_token = response["nextPageToken"]
         # each item = https://developers.google.com/youtube/v3/live/docs/liveChatMessages#resource
-        for message in response["items"]:
-            msg: str = message["snippet"]["displayMessage"]
+        for message in islice(items, stale_messages, None):
+            snippet: dict = message["snippet"]
+            msg: str = snippet["displayMessage"]
             user: str = message["authorDetails"]["displayName"]
-            msg_type: str = message["snippet"]["type"]
-            published_at: str = message["snippet"]["publishedAt"]
+            published_at: str = snippet["publishedAt"]
 
-            # To avoid datetime formatting problems, miliseconds and beyond (+xx:yy | Z) characters get dropped
-            published_at_sanitized = published_at.split(".")[0]
+            # Re-delivered messages (i.e. a page fetched again) are dropped altogether
+            message_id: Optional[str] = message.get("id")
+            if message_id and self.dedup_cache.seen_message_id(message_id):
+                log.debug(f"Message: {message_id} already processed")
+                continue
 
-            try:
-                published_at_datetime: datetime = datetime.fromisoformat(
-                    published_at_sanitized
-                )
-            except ValueError:
+            published_at_datetime = self.classifier.published_at(published_at)
+            if published_at_datetime is None:
                 log.debug(
-                    f"Couldn't read correctly the message: {msg}, with the next datetime: {published_at}. "
-                    f"Sanitized version looks like: {published_at_sanitized}"
+                    f"Couldn't read correctly the message: {msg}, with the next datetime: {published_at}"
                 )
                 continue
 
             log.debug(f"Message: {msg}, published_at: {published_at_datetime}")
-            # If the next is True it means that the published message from the live chat is older than the datetime
-            # on which the Start Stream button was clicked
-            if self.start_time > published_at_datetime:
-                log.debug(f"stale message: {msg}, published_at: {published_at}")
-                continue
+            newest_published_at = published_at_datetime
 
-            if "superchat" in msg_type.lower():
+            if "superchat" in snippet["type"].lower():
                 # Temporarily catching all exceptions here to test super chat implementation without breaking the thread
                 try:
-                    self.register_superchat(user, message)
+                    page_questions.append(self.register_superchat(user, message))
+                    page_questions_by_user[user] += 1
                 except Exception as e:
                     log.exception(f"Register super chat function failed with: {e}")
                 continue
 
-            if not PATTERN_FOR_CHAT_FILTER_WORD.search(msg):
-                live_chat_comment = f"{user}: {msg}"
-                # std.out is redirected to a widget in the GUI (live_chat_feed_text_box)
-                print(live_chat_comment)
-                with open(
-                    self.live_chat_record_file, "a", encoding="utf-8"
-                ) as live_chat_file:
-                    live_chat_file.write(f"{live_chat_comment}\n")
+            classified = self.classifier.classify(user, msg)
+            if classified.kind is MessageKind.CHAT_LINE:
+                self._record_chat_line(f"{user}: {msg}")
+                continue
 
             if open_questions_start_time is None:
                 log.debug("Questions are not open...")
                 continue
 
+            if published_at_datetime <= open_questions_start_time:
+                continue
+
+            log.debug(f" User: {user}, sent a question: {msg}, at {published_at}")
+
+            # Questions waiting in the database writer count as already stored
+            if self.db.has_limited_user_exceeded_question_count(
+                user,
+                questions_not_stored_yet=page_questions_by_user[user]
+                + self.ingestion_bus.queued_questions_by(user),
+            ):
+                continue
+
+            # Pending questions come from the in memory counters (shared with the GUI), no COUNT query
             if (
-                PATTERN_FOR_CHAT_FILTER_WORD.search(msg)
-                and published_at_datetime > open_questions_start_time
+                session_questions_limit
+                and self.db.counters.pending_questions()
+                + self.ingestion_bus.queued_regular_questions
+                + page_regular_questions
+                >= session_questions_limit
             ):
-                log.debug(f" User: {user}, sent a question: {msg}, at {published_at}")
-                # TODO: Add superchat event handling here (register the question, since it's priority)
+                # If the number of open questions has surpassed the limit for the session, stop adding questions
+                log.debug(
+                    f"The limit for the open_questions session has been reached: {session_questions_limit}, "
+                    f"not registering: {msg}"
+                )
+                continue
 
-                if self.has_limited_user_exceeded_question_count(user):
-                    continue
+            # If after cleaning it (no CHAT_FILTER_WORD), the msg is not an empty string and it wasn't asked
+            # already (the database has the final say), then register it
+            if classified.text and not self.dedup_cache.seen_question(
+                question_text_hash(classified.text)
+            ):
+                page_questions.append(NewQuestion(user, classified.text))
+                page_questions_by_user[user] += 1
+                page_regular_questions += 1
 
-                if (
-                    session_questions_limit
-                    and self.db.count_all_pending_questions() >= session_questions_limit
-                ):
-                    # If the number of open questions has surpassed the limit for the session, stop adding questions
-                    log.debug(
-                        f"The limit for the open_questions session has been reached: {session_questions_limit}, "
-                        f"not registering: {msg}"
-                    )
-                    continue
+        record_started = time.perf_counter_ns()
+        self._end_record_page()
+        database_started = time.perf_counter_ns()
+        self.classifier.record_stage(RECORD_STAGE, database_started - record_started)
+        # The polling state goes along the questions of the page, in the same transaction (queued, not waited for)
+        dropped = self.ingestion_bus.submit_questions(
+            page_questions, self.live_chat_state()
+        )
+        # Never stored, they can be asked again
+        self.dedup_cache.forget_questions(
+            question_text_hash(question.question) for question in dropped
+        )
+        self.classifier.record_stage(
+            DATABASE_STAGE, time.perf_counter_ns() - database_started
+        )
 
-                # Gets rid of the CHAT_FILTER_WORD in the captured msg and cleans up
-                # double spaces or leading/trailing spaces
-                cleaned_msg = re.sub(PATTERN_FOR_CHAT_FILTER_WORD, " ", msg).strip()
-                # If after cleaning it, the msg is not an empty string, then register it
-                if cleaned_msg:
-                    self.db.add_new_question(user_name=user, question_msg=cleaned_msg)
+        return self.poll_scheduler.next_wait(
+            polling_interval_millis,
+            len(items),
+            questions_open,
+            newest_published_at,
+            page_processing_ns=time.perf_counter_ns() - page_processing_started,
+        )
 
-        return
+    def _skip_already_processed(self, items: list[dict]) -> list[dict]:
+        """First page after resuming, drops the messages up to the last one processed before the restart"""
+        last_message_id = self.resumed_last_message_id
+        self.resumed_last_message_id = None
+        for index, message in enumerate(items):
+            if message.get("id") == last_message_id:
+                log.debug(f"Skipping {index + 1} messages already processed")
+                return items[index + 1 :]  # noqa: E203
+        return items
 
-    def register_superchat(self, user: str, message: str) -> None:
+    def register_superchat(self, user: str, message: str) -> NewQuestion:
         # TODO: ADD SUPER CHAT exception handling
         log.warning("Pending Super Chat implementation testing")
         log.debug(f"Super chat message contents: {message}")
@@ -435,36 +1275,29 @@ class YoutubeLiveChat:
         currency: str = message["snippet"]["superChatDetails"]["currency"]
         amount: str = message["snippet"]["superChatDetails"]["amountDisplayString"]
 
-        # Gets rid of the CHAT_FILTER_WORD in the captured msg and cleans up
-        # double spaces or leading/trailing spaces
-        if PATTERN_FOR_CHAT_FILTER_WORD.search(super_chat_msg):
-            super_chat_msg = re.sub(
-                PATTERN_FOR_CHAT_FILTER_WORD, " ", super_chat_msg
-            ).strip()
-
-        if not super_chat_msg:
-            log.debug(f"For super chat event, user: {user}, left No Comment")
-            super_chat_msg = "NO COMMENT"
+        # Without the CHAT_FILTER_WORD, "NO COMMENT" if nothing is left
+        super_chat_msg = self.classifier.classify(
+            user, super_chat_msg, is_super_chat=True
+        ).text
         super_chat_msg = f"{user}: {super_chat_msg}"
         # For super chat, we append the user name to the message for now and print it as well
-        print(
+        self._record_chat_line(
             f"[SUPER CHAT], currency: {currency}, amount: {amount}. Message: {super_chat_msg}"
         )
-        self.db.add_new_question(
-            user_name=user, question_msg=super_chat_msg, is_super_chat=True
-        )
+        return NewQuestion(user, super_chat_msg, is_super_chat=True)
 
-    def has_limited_user_exceeded_question_count(self, user: str) -> bool:
-        if any(limited_user in user.lower() for limited_user in LIMITED_USERS):
-            questions_already_asked_by_user: int = (
-                self.db.count_questions_asked_by_user(user=user)
-            )
-            if questions_already_asked_by_user >= QUESTIONS_LIMIT:
-                log.debug(
-                    f"The user: {user}, has already asked {questions_already_asked_by_user}, questions"
-                )
-                return True
-        return False
+    def _record_chat_line(self, line: str) -> None:
+        if self.chat_label:
+            line = f"[{self.chat_label}] {line}"
+        if self.live_chat_record is None:
+            # std.out is redirected to a widget in the GUI (live_chat_feed_text_box)
+            print(line)
+            return
+        self.live_chat_record.write(line)
+
+    def _end_record_page(self) -> None:
+        if self.live_chat_record is not None:
+            self.live_chat_record.end_page()
 
 
 if __name__ == "__main__":
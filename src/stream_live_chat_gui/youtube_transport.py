@@ -0,0 +1,130 @@
+from stream_live_chat_gui import YOUTUBE_API_ROOT_URL
+from google.auth.transport.requests import Request
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from typing import Optional
+import codecs
+import json
+import logging
+import re
+import requests
+
+try:
+    # Optional, noticeably faster decoding of big live chat pages
+    import orjson
+
+    def json_loads(content: bytes):
+        return orjson.loads(content)
+
+except ImportError:
+
+    def json_loads(content: bytes):
+        return json.loads(content)
+
+
+log = logging.getLogger(__name__)
+
+# The root can be overridden to point to a stand-in server (load testing)
+YOUTUBE_API_BASE_URL = (
+    f"{(YOUTUBE_API_ROOT_URL or 'https://youtube.googleapis.com').rstrip('/')}/youtube/v3"
+)
+HTTP_TIMEOUT_SECONDS = 10
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
+STREAMED_RESPONSE_CHUNK_SIZE = 16 * 1024
+# Google apis only send gzip'ed responses if the user agent contains "gzip" as well
+HTTP_HEADERS = {
+    "Accept-Encoding": "gzip",
+    "User-Agent": "stream_live_chat_gui (gzip)",
+}
+# Only the values used out of each liveChatMessages resource are requested
+# https://developers.google.com/youtube/v3/getting-started#fields
+LIVE_CHAT_MESSAGES_FIELDS = (
+    "nextPageToken,pollingIntervalMillis,offlineAt,"
+    "items(id,snippet(type,displayMessage,publishedAt,superChatDetails),authorDetails(displayName))"
+)
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process wide session, its connection pool keeps the connections (keep-alive) between calls"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(HTTP_HEADERS)
+            _http_session = session
+        return _http_session
+
+
+def search_streamed_response(
+    response: requests.Response, pattern: re.Pattern, max_match_length: int
+) -> Optional[re.Match]:
+    """
+    Searches the body of a `stream=True` response while it's being downloaded, the download stops at the first
+    match. Only the last `max_match_length` characters already searched are kept and searched again along each new
+    chunk (a match cut between two chunks), so the cost stays linear in the page size. No match of `pattern` can
+    be longer than `max_match_length`.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(
+        errors="replace"
+    )
+    overlap = ""
+    downloaded = 0
+    for chunk in response.iter_content(STREAMED_RESPONSE_CHUNK_SIZE):
+        text = decoder.decode(chunk)
+        downloaded += len(text)
+        text = overlap + text
+        match = pattern.search(text)
+        if match:
+            log.debug(f"Pattern found after downloading {downloaded} characters")
+            return match
+        overlap = text[-max_match_length:]
+    return pattern.search(overlap + decoder.decode(b"", final=True))
+
+
+class LeanLiveChatTransport:
+    """
+    Calls liveChatMessages.list straight through the pooled http session instead of the discovery object model.
+    The response is gzip'ed and reduced with a `fields` mask, decoded with orjson if installed.
+    """
+
+    def __init__(self, credentials, base_url: str = YOUTUBE_API_BASE_URL):
+        self.credentials = credentials
+        self.base_url = base_url.rstrip("/")
+        self.session = get_http_session()
+
+    def _authorization_headers(self) -> dict:
+        headers = dict()
+        if not self.credentials.valid:
+            log.debug("Refreshing access token for the lean transport...")
+            self.credentials.refresh(Request(self.session))
+        self.credentials.apply(headers)
+        return headers
+
+    def list_live_chat_messages(
+        self, live_chat_id: str, page_token: Optional[str]
+    ) -> dict:
+        params = {
+            "liveChatId": live_chat_id,
+            "part": "snippet,authorDetails",
+            "fields": LIVE_CHAT_MESSAGES_FIELDS,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+
+        response = self.session.get(
+            f"{self.base_url}/liveChat/messages",
+            params=params,
+            headers=self._authorization_headers(),
+            timeout=HTTP_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        return json_loads(response.content)